@@ -5,12 +5,12 @@ from livekit import agents
 from livekit.agents import AgentSession, Agent, RoomInputOptions, RoomOutputOptions
 from livekit.plugins import google, silero, deepgram, elevenlabs
 import asyncio
-import pymupdf
+import threading
 from flask import Flask, ctx, request, jsonify, session
 from flask_cors import CORS
 from prompts import (
     WELCOME_PROMPT, 
-    ROOM_TYPES_INFO, 
+    room_types_info,
     MEETING_PROMPT,
     RESERVATION_START_PROMPT,
     ADDITIONAL_SERVICES_PROMPT,
@@ -21,11 +21,14 @@ from api import (
     check_room_availability,
     get_room_pricing,
     book_room,
+    book_group_rooms,
     get_room_details,
     suggest_room_for_occasion,
     calculate_discount,
     get_booking_summary,
     convert_to_pdf,
+    init_database,
+    get_db,
 )
 from dbdriver import MeetingDatabase
 import logging
@@ -40,9 +43,6 @@ except ImportError:
 
 import jwt
 
-# Google Generative AI for direct API calls
-import google.generativeai as genai
-
 app = Flask(__name__)
 CORS(app)
 logger = logging.getLogger("agent")
@@ -52,12 +52,9 @@ load_dotenv(dotenv_path=".env")
 
 meeting_id = "default_meeting"
 
-# Configure Gemini API
+# Gemini API key; the client library is imported and configured when the agent is built
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-if GOOGLE_API_KEY:
-    genai.configure(api_key=GOOGLE_API_KEY)
-    logger.info(" Gemini API configured successfully")
-else:
+if not GOOGLE_API_KEY:
     logger.warning(" GOOGLE_API_KEY not found in .env file")
 
 class HotelReceptionistAgent(Agent):
@@ -67,17 +64,19 @@ class HotelReceptionistAgent(Agent):
         Initializes the HotelReceptionistAgent with instructions and tools.
 
         The instructions are comprised of the welcome prompt, room types and pricing information, and the meeting prompt.
-        The tools are comprised of the functions for searching available rooms, checking room availability, getting room pricing, booking a room, getting room details, suggesting a room for an occasion, calculating discounts, getting a booking summary, and converting to a PDF.
+        The tools are comprised of the functions for searching available rooms, checking room availability, getting room pricing, booking a room, booking rooms for a group, getting room details, suggesting a room for an occasion, calculating discounts, getting a booking summary, and converting to a PDF.
 
         If the GOOGLE_API_KEY is set, the Gemini model is initialized with the full system context and a chat session is started.
         """
+        rooms_info = room_types_info(get_db().db.get_discount_rules())
         super().__init__(
-            instructions=WELCOME_PROMPT + "\n\n" + ROOM_TYPES_INFO + "\n\n" + MEETING_PROMPT,
+            instructions=WELCOME_PROMPT + "\n\n" + rooms_info + "\n\n" + MEETING_PROMPT,
             tools=[
                 search_available_rooms,
                 check_room_availability,
                 get_room_pricing,
                 book_room,
+                book_group_rooms,
                 get_room_details,
                 suggest_room_for_occasion,
                 calculate_discount,
@@ -85,14 +84,20 @@ class HotelReceptionistAgent(Agent):
                 convert_to_pdf,
             ]
         )
-        self.meeting_db = MeetingDatabase()
+        # One agent serves every session in the process; concurrent searches share an encode
+        self.meeting_db = MeetingDatabase(query_batch_size=16)
         self.conversation_history = []
         
         # Initialize Gemini model with full system context
         if GOOGLE_API_KEY:
+            # Google Generative AI for direct API calls
+            import google.generativeai as genai
+            genai.configure(api_key=GOOGLE_API_KEY)
+            logger.info(" Gemini API configured successfully")
+
             self.system_context = (
                 f"{WELCOME_PROMPT}\n\n"
-                f"{ROOM_TYPES_INFO}\n\n"
+                f"{rooms_info}\n\n"
                 f"{MEETING_PROMPT}\n\n"
                 "Additional Context:\n"
                 "- Respond conversationally and warmly\n"
@@ -117,6 +122,7 @@ class HotelReceptionistAgent(Agent):
     async def async_handle_byte_stream(self, reader, participant_identity):
         try:
             info = reader.info
+            import pymupdf
             file_bytes = bytes()
             with open(info["name"], mode="wb") as f:
                 async for chunk in reader:
@@ -170,7 +176,7 @@ class HotelReceptionistAgent(Agent):
         if re.search(r'\b(search|find|lookup|show)\b.*\b(meeting file|meeting|transcript|notes)\b', text):
             query_match = re.search(r'(?:about|for|on|:)\s*(.*)', text)
             query = query_match.group(1) if query_match else message
-            return self.search_meeting_files(query)
+            return await asyncio.to_thread(self.search_meeting_files, query)
 
         if re.search(r'\b(get|show|retrieve|read)\b.*\b(meeting file|transcript|meeting)\b', text):
             filename_match = re.search(r"filename\s*[:=]\s*(\S+)", message, re.IGNORECASE)
@@ -234,13 +240,13 @@ class HotelReceptionistAgent(Agent):
         )
 
     def search_meeting_files(self, query: str, top_k: int = 5) -> str:
-        results = self.meeting_db.vector_search(query, top_k)
+        results = self.meeting_db.hybrid_search(query, top_k)
         if not results:
             return "No meeting files found matching your query. Would you like to add a new meeting file?"
         response = "📋 Meeting files matching your query:\n\n"
         for r in results:
-            snippet = r["content"][:200].replace('\n', ' ')
-            response += f"• **{r['filename']}** (Similarity: {r['similarity']:.3f}, Date: {r['created_at']})\n  {snippet}...\n\n"
+            passage = r["content"].replace('\n', ' ')
+            response += f"• **{r['filename']}** (Similarity: {r['similarity']:.3f}, Date: {r['created_at']})\n  {passage}\n\n"
         return response
 
     def retrieve_meeting_file(self, filename: str) -> str:
@@ -252,12 +258,34 @@ class HotelReceptionistAgent(Agent):
         return "✅ All meeting files have been deleted successfully."
 
 
-print("=" * 70)
-print("Initializing HotelReceptionistAgent...")
-print("=" * 70)
-agent_instance = HotelReceptionistAgent()
-print(" Agent initialized successfully with full Gemini integration!")
-print("=" * 70)
+_agent_instance = None
+_agent_lock = threading.Lock()
+
+
+def get_agent() -> HotelReceptionistAgent:
+    """The process-wide HotelReceptionistAgent, built on first use"""
+    global _agent_instance
+    with _agent_lock:
+        if _agent_instance is None:
+            print("=" * 70)
+            print("Initializing HotelReceptionistAgent...")
+            print("=" * 70)
+            _agent_instance = HotelReceptionistAgent()
+            print(" Agent initialized successfully with full Gemini integration!")
+            print("=" * 70)
+    return _agent_instance
+
+
+def agent_ready() -> bool:
+    """Whether the shared agent has been built yet"""
+    return _agent_instance is not None
+
+
+def prewarm(proc: agents.JobProcess):
+    """Worker startup hook: load VAD, the hotel database and the agent before the first job"""
+    proc.userdata["vad"] = silero.VAD.load()
+    init_database()
+    get_agent().meeting_db.warmup()
 
 @app.route('/api/agent', methods=['POST'])
 def agent_endpoint():
@@ -268,7 +296,7 @@ def agent_endpoint():
     try:
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
-        response = loop.run_until_complete(agent_instance.handle_user_message(user_message))
+        response = loop.run_until_complete(get_agent().handle_user_message(user_message))
         loop.close()
         logger.info(f" Generated response: {response[:100]}...")
     except Exception as e:
@@ -344,7 +372,7 @@ async def entrypoint(ctx: agents.JobContext):
         stt=deepgram.STT(api_key=os.getenv("DEEPGRAM_API_KEY")),
         llm=google.LLM(model="gemini-2.0-flash", api_key=os.getenv("GOOGLE_API_KEY")),
         tts=deepgram.TTS(api_key=os.getenv("DEEPGRAM_API_KEY")),
-        vad=silero.VAD.load()
+        vad=ctx.proc.userdata.get("vad") or silero.VAD.load()
     )
 
     # Create log file
@@ -386,7 +414,7 @@ async def entrypoint(ctx: agents.JobContext):
     def on_speech_committed(message):
         logger.info(f"💬 Agent said: {message.content[:100]}...")
 
-    agent = agent_instance
+    agent = get_agent()
 
     # Register byte stream handler
     ctx.room.register_byte_stream_handler(
@@ -437,4 +465,4 @@ async def entrypoint(ctx: agents.JobContext):
     # Keep the agent running
     await asyncio.Event().wait()
 if __name__ == "__main__":
-    agents.cli.run_app(agents.WorkerOptions(entrypoint_fnc=entrypoint))
+    agents.cli.run_app(agents.WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm))
@@ -0,0 +1,134 @@
+"""
+Materialized booking analytics.
+
+`daily_room_type_stats` holds room-nights booked, revenue and discount per
+stay date and room type; `room_type_totals` holds the same over all time.
+Both are updated by `apply_bookings` inside the transaction that inserts
+the bookings, so reading them never touches the `bookings` table and costs
+the same however much history there is. A booking's total_amount and
+discount_amount are spread evenly over the nights of the stay.
+"""
+
+import logging
+import sqlite3
+from typing import Dict, List, Optional
+
+from records import DailyStats, RoomTypeTotals, rows_as
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS_DDL = [
+    '''
+    CREATE TABLE IF NOT EXISTS daily_room_type_stats (
+        stay_date TEXT NOT NULL,
+        room_type TEXT NOT NULL,
+        rooms_booked INTEGER NOT NULL DEFAULT 0,
+        revenue REAL NOT NULL DEFAULT 0,
+        discount REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (stay_date, room_type)
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS room_type_totals (
+        room_type TEXT PRIMARY KEY,
+        bookings INTEGER NOT NULL DEFAULT 0,
+        revenue REAL NOT NULL DEFAULT 0,
+        discount REAL NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+    ''',
+]
+
+# Expands bookings with booking_id in [?, ?] into one row per night and adds
+# them to the daily table. Bookings with unparseable or empty stays are skipped.
+APPLY_DAILY_STATS_SQL = '''
+    INSERT INTO daily_room_type_stats (stay_date, room_type, rooms_booked, revenue, discount)
+    WITH RECURSIVE
+        stays(check_in, last_night, room_type, total_amount, discount_amount, nights) AS (
+            SELECT date(b.check_in_date), date(b.check_out_date, '-1 day'), r.room_type,
+                   b.total_amount, b.discount_amount,
+                   CAST(julianday(date(b.check_out_date)) - julianday(date(b.check_in_date)) AS INTEGER)
+            FROM bookings b
+            JOIN rooms r ON r.room_id = b.room_id
+            WHERE b.booking_id BETWEEN ? AND ?
+        ),
+        nights(stay_date, last_night, room_type, revenue, discount) AS (
+            SELECT check_in, last_night, room_type,
+                   total_amount / nights, COALESCE(discount_amount, 0) / nights
+            FROM stays WHERE nights > 0
+            UNION ALL
+            SELECT date(stay_date, '+1 day'), last_night, room_type, revenue, discount
+            FROM nights WHERE stay_date < last_night
+        )
+    SELECT stay_date, room_type, COUNT(*), SUM(revenue), SUM(discount)
+    FROM nights
+    WHERE true
+    GROUP BY stay_date, room_type
+    ON CONFLICT (stay_date, room_type) DO UPDATE SET
+        rooms_booked = rooms_booked + excluded.rooms_booked,
+        revenue = revenue + excluded.revenue,
+        discount = discount + excluded.discount
+'''
+
+APPLY_TOTALS_SQL = '''
+    INSERT INTO room_type_totals (room_type, bookings, revenue, discount)
+    SELECT r.room_type, COUNT(*), SUM(b.total_amount), SUM(COALESCE(b.discount_amount, 0))
+    FROM bookings b
+    JOIN rooms r ON r.room_id = b.room_id
+    WHERE b.booking_id BETWEEN ? AND ?
+    GROUP BY r.room_type
+    ON CONFLICT (room_type) DO UPDATE SET
+        bookings = bookings + excluded.bookings,
+        revenue = revenue + excluded.revenue,
+        discount = discount + excluded.discount
+'''
+
+SELECT_DAILY_STATS_SQL = '''
+    SELECT stay_date, room_type, rooms_booked, revenue, discount
+    FROM daily_room_type_stats
+    WHERE stay_date BETWEEN ? AND ?
+    ORDER BY stay_date, room_type
+'''
+
+SELECT_TOTALS_SQL = '''
+    SELECT room_type, bookings, revenue, discount
+    FROM room_type_totals
+    ORDER BY room_type
+'''
+
+
+def apply_bookings(cursor: sqlite3.Cursor, first_booking_id: int, last_booking_id: int):
+    """Add bookings first_booking_id..last_booking_id to the aggregates; call inside their transaction"""
+    cursor.execute(APPLY_DAILY_STATS_SQL, (first_booking_id, last_booking_id))
+    cursor.execute(APPLY_TOTALS_SQL, (first_booking_id, last_booking_id))
+
+
+def rebuild(cursor: sqlite3.Cursor):
+    """Recompute both tables from the full bookings history"""
+    cursor.execute("DELETE FROM daily_room_type_stats")
+    cursor.execute("DELETE FROM room_type_totals")
+    apply_bookings(cursor, 0, 2 ** 63 - 1)
+
+
+def daily_stats(conn: sqlite3.Connection, start_date: str, end_date: str, total_rooms: Dict[str, int],
+                room_type: Optional[str] = None) -> List[DailyStats]:
+    """Aggregates for stay dates in [start_date, end_date], optionally for one room type.
+
+    `total_rooms` maps lower-cased room type to its room count, for the
+    occupancy rate. Dates with no bookings are left out.
+    """
+    key = room_type.lower() if room_type else None
+    stats = []
+    for stay_date, booked_type, rooms_booked, revenue, discount in conn.execute(
+            SELECT_DAILY_STATS_SQL, (start_date, end_date)):
+        type_key = booked_type.lower()
+        if key and type_key != key:
+            continue
+        capacity = total_rooms.get(type_key, 0)
+        stats.append(DailyStats(stay_date, booked_type, rooms_booked, capacity,
+                                rooms_booked / capacity if capacity else 0.0, revenue, discount))
+    return stats
+
+
+def totals(conn: sqlite3.Connection) -> List[RoomTypeTotals]:
+    """All-time bookings, revenue and discount per room type"""
+    return rows_as(RoomTypeTotals, conn.execute(SELECT_TOTALS_SQL))
@@ -0,0 +1,213 @@
+"""
+Approximate nearest-neighbour search for large meeting corpora.
+
+`IVFIndex` is an inverted-file index built in-process with NumPy: spherical
+k-means splits the normalized embeddings into `nlist` clusters, the rows
+are stored grouped by cluster, and a query only scores the rows of the
+`nprobe` clusters whose centroids are closest to it. Raising `nprobe`
+trades latency for recall; `nprobe = nlist` is an exact search. By default
+`nprobe` grows with `nlist` (a fifth of the lists), so recall holds
+as the corpus, and with it `nlist`, grows.
+
+It has the same `clear` / `add` / `search` interface as
+`vectors.VectorIndex`, so `MeetingDatabase` can use either. Rows added
+after the clusters were built go to a small exact index that every query
+also scans, and are folded into the clusters once there are enough of
+them. `save` / `load` persist the whole index as an .npz file (no
+pickles), so a restart skips both the table scan and the k-means.
+"""
+
+import logging
+import math
+import os
+import threading
+import time
+from typing import Dict, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from vectors import VectorIndex, normalize_rows
+
+logger = logging.getLogger(__name__)
+
+
+class IVFParams(NamedTuple):
+    """Tuning knobs of IVFIndex.
+
+    `nlist` defaults to about sqrt(rows), fixed when the clusters are
+    trained. `nprobe` defaults to `nprobe_fraction` of `nlist`, but at
+    least `min_nprobe`; set it to pin the probe count instead. Below
+    `min_rows` rows the index stays exact. Pending rows are
+    folded into the clusters once there are `max_pending` of them, and the
+    clusters are retrained when the index has grown `retrain_growth` times
+    since they were trained.
+    """
+    nlist: Optional[int] = None
+    nprobe: Optional[int] = None
+    nprobe_fraction: float = 0.2
+    min_nprobe: int = 16
+    min_rows: int = 4096
+    max_pending: int = 2048
+    train_iterations: int = 10
+    train_sample_per_list: int = 64
+    retrain_growth: float = 4.0
+    seed: int = 0
+
+
+def _nearest_centroids(rows: np.ndarray, centroids: np.ndarray, chunk_rows: int = 16384) -> np.ndarray:
+    """Index of the closest centroid for every row, in chunks to bound the score matrix"""
+    labels = np.empty(len(rows), dtype=np.int64)
+    for start in range(0, len(rows), chunk_rows):
+        labels[start:start + chunk_rows] = np.argmax(rows[start:start + chunk_rows] @ centroids.T, axis=1)
+    return labels
+
+
+def train_centroids(rows: np.ndarray, nlist: int, iterations: int, sample_size: int, seed: int) -> np.ndarray:
+    """Spherical k-means over a sample of unit-length `rows`"""
+    rng = np.random.default_rng(seed)
+    if len(rows) > sample_size:
+        rows = rows[rng.choice(len(rows), sample_size, replace=False)]
+    centroids = rows[rng.choice(len(rows), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        labels = _nearest_centroids(rows, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, rows)
+        counts = np.bincount(labels, minlength=nlist)
+        # Re-seed empty clusters with random rows instead of dropping them
+        empty = np.flatnonzero(counts == 0)
+        sums[empty] = rows[rng.choice(len(rows), len(empty))]
+        centroids = normalize_rows(sums)
+    return centroids
+
+
+class IVFIndex:
+    """Inverted-file approximate cosine-similarity search, a drop-in for VectorIndex"""
+
+    def __init__(self, params: Optional[IVFParams] = None, dim: Optional[int] = None):
+        self.params = params or IVFParams()
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.clear(dim)
+
+    def clear(self, dim: Optional[int] = None):
+        """Drop every row and the clusters; `dim` fixes the embedding length of the rows to come"""
+        with self._lock:
+            self.dim = dim
+            self._centroids: Optional[np.ndarray] = None
+            self._trained_rows = 0
+            self._matrix = np.zeros((0, dim or 0), dtype=np.float32)
+            self._ids = np.zeros(0, dtype=np.int64)
+            self._offsets = np.zeros(1, dtype=np.int64)
+            self._pending = VectorIndex(dim)
+
+    def __len__(self) -> int:
+        return len(self._ids) + len(self._pending)
+
+    @property
+    def trained(self) -> bool:
+        return self._centroids is not None
+
+    @property
+    def nlist(self) -> int:
+        return 0 if self._centroids is None else len(self._centroids)
+
+    def add(self, ids: Sequence[int], embeddings):
+        """Append rows; they are searched exactly until the next rebuild folds them in"""
+        if len(ids) == 0:
+            return
+        with self._lock:
+            self._pending.add(ids, embeddings)
+            if self.dim is None:
+                self.dim = self._pending.dim
+                self._matrix = self._matrix.reshape(0, self.dim)
+            total = len(self._ids) + len(self._pending)
+            if total < self.params.min_rows:
+                return
+            retrain = (self._centroids is None
+                       or total >= self.params.retrain_growth * self._trained_rows)
+            if retrain or len(self._pending) >= self.params.max_pending:
+                self._rebuild(retrain)
+
+    def _rebuild(self, retrain: bool):
+        began = time.perf_counter()
+        pending_ids, pending_rows = self._pending.rows()
+        rows = np.concatenate([self._matrix, pending_rows])
+        ids = np.concatenate([self._ids, pending_ids])
+        if retrain:
+            nlist = self.params.nlist or max(1, int(round(math.sqrt(len(rows)))))
+            nlist = min(nlist, len(rows))
+            self._centroids = train_centroids(rows, nlist, self.params.train_iterations,
+                                              nlist * self.params.train_sample_per_list, self.params.seed)
+            self._trained_rows = len(rows)
+            labels = _nearest_centroids(rows, self._centroids)
+        else:
+            # Rows already in lists keep their cluster; only the pending ones are assigned
+            known = np.repeat(np.arange(self.nlist), np.diff(self._offsets))
+            labels = np.concatenate([known, _nearest_centroids(pending_rows, self._centroids)])
+        order = np.argsort(labels, kind="stable")
+        # Fresh arrays, so searches holding the old snapshot are unaffected
+        self._matrix = rows[order]
+        self._ids = ids[order]
+        self._offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=self.nlist))])
+        self._pending = VectorIndex(self.dim)
+        self.builds += 1
+        logger.info(f"{'Trained' if retrain else 'Rebuilt'} IVF index: {len(rows)} rows in {self.nlist} lists "
+                    f"({(time.perf_counter() - began) * 1000:.0f} ms)")
+
+    def default_nprobe(self, nlist: int) -> int:
+        """Lists probed when neither the call nor the params fix `nprobe`"""
+        return max(self.params.min_nprobe, math.ceil(self.params.nprobe_fraction * nlist))
+
+    def search(self, query, top_k: int, nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Ids and cosine similarities of the (approximately) `top_k` closest rows, best first"""
+        with self._lock:
+            centroids, matrix, ids, offsets, pending = (self._centroids, self._matrix, self._ids,
+                                                        self._offsets, self._pending)
+        pending_ids, pending_scores = pending.search(query, top_k)
+        if centroids is None or top_k <= 0:
+            return pending_ids, pending_scores
+        q = normalize_rows(query)[0]
+        nprobe = min(nprobe or self.params.nprobe or self.default_nprobe(len(centroids)), len(centroids))
+        centroid_scores = centroids @ q
+        probe = (np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+                 if nprobe < len(centroids) else np.arange(len(centroids)))
+        # Each probed list is a contiguous slice, so scoring it is a view, not a gather
+        scores = [pending_scores] + [matrix[offsets[l]:offsets[l + 1]] @ q for l in probe.tolist()]
+        candidates = [pending_ids] + [ids[offsets[l]:offsets[l + 1]] for l in probe.tolist()]
+        scores, candidates = np.concatenate(scores), np.concatenate(candidates)
+        k = min(top_k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return candidates[best], scores[best]
+
+    def save(self, path: str, **metadata: int):
+        """Write the index, plus integer `metadata`, to `path` atomically"""
+        with self._lock:
+            pending_ids, pending_rows = self._pending.rows()
+            arrays = {
+                "dim": np.int64(self.dim or 0),
+                "trained_rows": np.int64(self._trained_rows),
+                "centroids": self._centroids if self._centroids is not None else np.zeros((0, self.dim or 0), np.float32),
+                "matrix": self._matrix, "ids": self._ids, "offsets": self._offsets,
+                "pending_ids": pending_ids, "pending_matrix": pending_rows,
+            }
+        arrays.update({f"meta_{key}": np.int64(value) for key, value in metadata.items()})
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+        logger.info(f"Saved IVF index with {len(self)} rows to {path}")
+
+    @classmethod
+    def load(cls, path: str, params: Optional[IVFParams] = None) -> Tuple["IVFIndex", Dict[str, int]]:
+        """Index saved by `save`, and the metadata it was saved with"""
+        with np.load(path, allow_pickle=False) as data:
+            index = cls(params, int(data["dim"]) or None)
+            if len(data["centroids"]):
+                index._centroids = data["centroids"]
+            index._trained_rows = int(data["trained_rows"])
+            index._matrix, index._ids, index._offsets = data["matrix"], data["ids"], data["offsets"]
+            index._pending.add(data["pending_ids"], data["pending_matrix"])
+            metadata = {key[len("meta_"):]: int(data[key]) for key in data.files if key.startswith("meta_")}
+        logger.info(f"Loaded IVF index with {len(index)} rows from {path}")
+        return index, metadata
@@ -1,14 +1,14 @@
+import asyncio
 import logging
-from typing import Dict
+import threading
+from typing import Dict, List, Optional
 
-from dbdriver import HotelDatabase
+from dbdriver import AsyncHotelDatabase, HotelDatabase
+from excel_export import ExcelExporter
 from datetime import datetime, timedelta
 from livekit.agents import function_tool, RunContext
 import os 
 import random
-from google.genai import Client
-from playwright.async_api import async_playwright
-from api2 import pdf_parser
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -20,19 +20,59 @@ if os.path.exists(f"user_speech_log_{meeting_id}.txt"):
     meeting_id=random.randint(1, 999)
     
 
-# Initialize database
-db = HotelDatabase()
-# initialize google genai client
+# The database, its async facade and the Excel exporter are built on first use
+# (or from a worker/server startup hook via init_database), not at import time.
+_db: Optional[HotelDatabase] = None
+_adb: Optional[AsyncHotelDatabase] = None
+_exporter: Optional[ExcelExporter] = None
+_init_lock = threading.Lock()
 
-def  ingest_text(pdf_path: str) -> None:
-    from agent import ingest_pdf_cli 
-    ingest_pdf_cli(pdf_path)
+
+def init_database(db: Optional[HotelDatabase] = None,
+                  export_filename: str = "hotel_bookings.xlsx") -> AsyncHotelDatabase:
+    """Build the hotel database used by the tools, or install `db` in its place"""
+    global _db, _adb, _exporter
+    with _init_lock:
+        if db is not None or _db is None:
+            if _exporter is not None:
+                _exporter.close()
+            # Reinstalling the current database keeps its facade; closing that would close the database
+            if _adb is None or db is not _db:
+                if _adb is not None:
+                    _adb.close()
+                _db = db or HotelDatabase()
+                # Tools go through the async facade so queries run off the event loop
+                _adb = AsyncHotelDatabase(_db)
+            # Bookings only schedule an export; the workbook is written in the background
+            _exporter = ExcelExporter(_db, filename=export_filename)
+    return _adb
+
+
+def get_db() -> AsyncHotelDatabase:
+    """The async hotel database, built on first use"""
+    return _adb or init_database()
+
+
+def get_exporter() -> ExcelExporter:
+    """The background Excel exporter, built on first use"""
+    get_db()
+    return _exporter
+
+
+def ingest_text(pdf_path: str) -> bool:
+    """Add a generated PDF to the agent's meeting database so it can be searched"""
+    from agent import get_agent
+    return get_agent().meeting_db.ingest_pdf_file(pdf_path)
 
 
 @function_tool
 async def convert_to_pdf() :
  """Convert a text file to PDF."""
 
+ # Imported here so loading the tools module does not pay for the browser and Gemini clients
+ from playwright.async_api import async_playwright
+ from api2 import pdf_parser
+
  if os.path.exists(f"user_speech_log_{meeting_id}.txt"):
       logger.info(f"Converting user_speech_log_{meeting_id}.txt to PDF")
       file=f"user_speech_log_{meeting_id}.txt"
@@ -124,7 +164,8 @@ async def convert_to_pdf() :
 
         await browser.close()
 
-      ingest_text(pdf_path=os.path.abspath(f"meeting_summary_{meeting_id}.pdf"))
+      # Extraction and encoding block, so keep them off the event loop
+      await asyncio.to_thread(ingest_text, os.path.abspath(f"meeting_summary_{meeting_id}.pdf"))
       logger.info("Successfully converted TXT to PDF.")
  else:
         logger.error(f"File user_speech_log_{meeting_id}.html does not exist.")
@@ -146,7 +187,7 @@ async def search_available_rooms(
     logger.info(f"API: Searching for available rooms - type: {room_type}")
     
     if room_type:
-        rooms = db.get_available_rooms_by_type(room_type)
+        rooms = await get_db().get_available_rooms_by_type(room_type)
         return {
             "success": True,
             "room_type": room_type,
@@ -154,7 +195,7 @@ async def search_available_rooms(
             "rooms": rooms
         }
     else:
-        room_types = db.get_all_room_types()
+        room_types = await get_db().get_all_room_types()
         return {
             "success": True,
             "total_room_types": len(room_types),
@@ -164,56 +205,86 @@ async def search_available_rooms(
 @function_tool()
 async def check_room_availability(
     context: RunContext,
-    room_type: str
+    room_type: str,
+    check_in_date: str = None,
+    check_out_date: str = None
 ) -> Dict:
     """
-    Check if a specific room type is available.
+    Check if a specific room type is available, optionally for a date range.
+    
+    With dates, the rooms listed have no booking on any night of the stay
+    and can be booked for exactly those dates with book_room. Without
+    dates, they are the rooms not occupied right now.
     
     Args:
         room_type: Room type to check availability for.
+        check_in_date: Check-in date (YYYY-MM-DD format, optional).
+        check_out_date: Check-out date (YYYY-MM-DD format, optional). Required if check_in_date is given.
         
     Returns:
         Dictionary containing availability status and details.
     """
-    logger.info(f"API: Checking availability for {room_type}")
+    logger.info(f"API: Checking availability for {room_type} ({check_in_date} to {check_out_date})")
     
-    rooms = db.get_available_rooms_by_type(room_type)
+    if check_in_date or check_out_date:
+        try:
+            rooms = await get_db().get_available_rooms_for_dates(room_type, check_in_date, check_out_date)
+        except ValueError as e:
+            return {
+                "success": False,
+                "error": str(e)
+            }
+    else:
+        rooms = await get_db().get_available_rooms_by_type(room_type)
     is_available = len(rooms) > 0
     
     return {
         "success": True,
         "room_type": room_type,
+        "check_in_date": check_in_date,
+        "check_out_date": check_out_date,
         "is_available": is_available,
         "available_count": len(rooms),
-        "rooms": rooms if is_available else []
+        "rooms": rooms
     }
 
 @function_tool()
 async def get_room_pricing(
     context: RunContext,
-    room_type: str
+    room_type: str,
+    check_in_date: str = None,
+    check_out_date: str = None
 ) -> Dict:
     """
-    Get pricing information for a specific room type.
+    Get pricing information for a specific room type, optionally for a stay.
     
     Args:
         room_type: Room type to get pricing for.
+        check_in_date: Check-in date (YYYY-MM-DD format, optional).
+        check_out_date: Check-out date (YYYY-MM-DD format, optional). Required if check_in_date is given.
         
     Returns:
-        Dictionary containing pricing information including min/max prices and availability.
+        Dictionary containing pricing information including min/max prices, the current price and availability.
     """
-    logger.info(f"API: Getting pricing for {room_type}")
+    logger.info(f"API: Getting pricing for {room_type} ({check_in_date} to {check_out_date})")
     
-    room_types = db.get_all_room_types()
-    for rt in room_types:
-        if rt['room_type'].lower() == room_type.lower():
+    rt = await get_db().get_room_type(room_type)
+    if rt:
+        try:
+            quote = await get_db().quote_room_type(room_type, check_in_date, check_out_date)
+        except ValueError as e:
             return {
-                "success": True,
-                "room_type": rt['room_type'],
-                "min_price": rt['min_price'],
-                "max_price": rt['max_price'],
-                "available_rooms": rt['available_rooms']
+                "success": False,
+                "error": str(e)
             }
+        return {
+            "success": True,
+            "room_type": rt.room_type,
+            "min_price": rt.min_price,
+            "max_price": rt.max_price,
+            "current_price": quote.final_price,
+            "available_rooms": rt.available_rooms
+        }
     
     return {
         "success": False,
@@ -244,14 +315,14 @@ async def book_room(
     """
     logger.info(f"API: Booking room {room_id} for {guest_name}")
     
-    success, message, final_price = db.book_room(
+    success, message, final_price = await get_db().book_room(
         room_id, guest_name, check_in_date, check_out_date, special_occasion
     )
     
     if success:
-        # Export to Excel after successful booking
-        db.export_to_excel()
-        logger.info("API: Booking successful, exported to Excel")
+        # Schedule a debounced background Excel export
+        get_exporter().request_export()
+        logger.info("API: Booking successful, Excel export scheduled")
     
     return {
         "success": success,
@@ -261,6 +332,59 @@ async def book_room(
         "guest_name": guest_name
     }
 
+@function_tool()
+async def book_group_rooms(
+    context: RunContext,
+    room_types: List[str],
+    quantities: List[int],
+    guest_name: str,
+    check_in_date: str,
+    check_out_date: str,
+    special_occasion: str = None
+) -> Dict:
+    """
+    Book several rooms at once for a group or event. Either every room is booked or none is.
+    
+    Args:
+        room_types: Room types to book, e.g. ["Deluxe Suite", "Normal"].
+        quantities: Number of rooms wanted for each entry in room_types, in the same order.
+        guest_name: Name of the guest or group lead.
+        check_in_date: Check-in date (YYYY-MM-DD format).
+        check_out_date: Check-out date (YYYY-MM-DD format).
+        special_occasion: Special occasion for potential discount (optional).
+        
+    Returns:
+        Dictionary containing booking result with success status, message, booked rooms and total price.
+    """
+    logger.info(f"API: Group booking {list(zip(room_types, quantities))} for {guest_name}")
+    
+    if len(room_types) != len(quantities):
+        return {
+            "success": False,
+            "error": "room_types and quantities must have the same length"
+        }
+    
+    room_requests = {}
+    for room_type, quantity in zip(room_types, quantities):
+        room_requests[room_type] = room_requests.get(room_type, 0) + quantity
+    
+    success, message, rooms = await get_db().book_rooms(
+        room_requests, guest_name, check_in_date, check_out_date, special_occasion
+    )
+    
+    if success:
+        # One export for the whole group
+        get_exporter().request_export()
+        logger.info("API: Group booking successful, Excel export scheduled")
+    
+    return {
+        "success": success,
+        "message": message,
+        "total_price": sum(room.final_price for room in rooms),
+        "rooms": rooms,
+        "guest_name": guest_name
+    }
+
 @function_tool()
 async def get_room_details(
     context: RunContext,
@@ -277,7 +401,7 @@ async def get_room_details(
     """
     logger.info(f"API: Getting details for room {room_id}")
     
-    room_status = db.get_room_status(room_id)
+    room_status = await get_db().get_room_status(room_id)
     if room_status:
         return {
             "success": True,
@@ -307,22 +431,26 @@ async def suggest_room_for_occasion(
     """
     logger.info(f"API: Suggesting rooms for {occasion} with budget {budget}")
     
-    room_types = db.get_all_room_types()
+    room_types = await get_db().get_all_room_types()
+    quotes = {quote.room_type: quote for quote in await get_db().quote_room_types(special_occasion=occasion)}
     suggestions = []
     
     for rt in room_types:
-        if rt['available_rooms'] > 0:
-            # Check if within budget
-            if budget is None or rt['max_price'] <= budget:
+        quote = quotes.get(rt.room_type)
+        if rt.available_rooms > 0 and quote:
+            # Check if the discounted price is within budget
+            if budget is None or quote.final_price <= budget:
                 suggestions.append({
-                    "room_type": rt['room_type'],
-                    "max_price": rt['max_price'],
-                    "available_rooms": rt['available_rooms'],
+                    "room_type": rt.room_type,
+                    "max_price": rt.max_price,
+                    "price": quote.final_price,
+                    "discount_percentage": quote.discount_percentage,
+                    "available_rooms": rt.available_rooms,
                     "suitable_for": occasion
                 })
     
     # Sort by price (lowest first)
-    suggestions.sort(key=lambda x: x['max_price'])
+    suggestions.sort(key=lambda x: x['price'])
     
     return {
         "success": True,
@@ -335,7 +463,9 @@ async def suggest_room_for_occasion(
 async def calculate_discount(
     context: RunContext,
     room_type: str,
-    occasion: str
+    occasion: str,
+    check_in_date: str = None,
+    check_out_date: str = None
 ) -> Dict:
     """
     Calculate potential discount for a room type and occasion.
@@ -343,30 +473,31 @@ async def calculate_discount(
     Args:
         room_type: Room type to calculate discount for.
         occasion: Special occasion for discount calculation.
+        check_in_date: Check-in date (YYYY-MM-DD format, optional).
+        check_out_date: Check-out date (YYYY-MM-DD format, optional). Required if check_in_date is given.
         
     Returns:
         Dictionary containing discount information including original price, discount amount, and final price.
     """
     logger.info(f"API: Calculating discount for {room_type} - {occasion}")
     
-    room_types = db.get_all_room_types()
-    for rt in room_types:
-        if rt['room_type'].lower() == room_type.lower():
-            # Calculate discount percentage
-            discount_percentage = db._calculate_discount(occasion)
-            max_price = rt['max_price']
-            discount_amount = max_price * (discount_percentage / 100)
-            final_price = max_price - discount_amount
-            
-            return {
-                "success": True,
-                "room_type": rt['room_type'],
-                "original_price": max_price,
-                "discount_percentage": discount_percentage,
-                "discount_amount": discount_amount,
-                "final_price": final_price,
-                "occasion": occasion
-            }
+    try:
+        quote = await get_db().quote_room_type(room_type, check_in_date, check_out_date, occasion)
+    except ValueError as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }
+    if quote:
+        return {
+            "success": True,
+            "room_type": quote.room_type,
+            "original_price": quote.base_price,
+            "discount_percentage": quote.discount_percentage,
+            "discount_amount": quote.discount_amount,
+            "final_price": quote.final_price,
+            "occasion": occasion
+        }
     
     return {
         "success": False,
@@ -381,13 +512,14 @@ async def get_booking_summary(
     Get a summary of all bookings and room status.
     
     Returns:
-        Dictionary containing booking summary with total rooms, available rooms, occupied rooms, and occupancy rate.
+        Dictionary containing booking summary with total rooms, available rooms, occupied rooms, occupancy rate, and all-time bookings, revenue and discounts.
     """
     logger.info("API: Getting booking summary")
     
-    room_types = db.get_all_room_types()
-    total_rooms = sum(rt['total_rooms'] for rt in room_types)
-    total_available = sum(rt['available_rooms'] for rt in room_types)
+    room_types = await get_db().get_all_room_types()
+    booking_totals = await get_db().get_booking_totals()
+    total_rooms = sum(rt.total_rooms for rt in room_types)
+    total_available = sum(rt.available_rooms for rt in room_types)
     total_occupied = total_rooms - total_available
     
     return {
@@ -396,7 +528,10 @@ async def get_booking_summary(
             "total_rooms": total_rooms,
             "available_rooms": total_available,
             "occupied_rooms": total_occupied,
-            "occupancy_rate": (total_occupied / total_rooms * 100) if total_rooms > 0 else 0
+            "occupancy_rate": (total_occupied / total_rooms * 100) if total_rooms > 0 else 0,
+            "total_bookings": sum(totals.bookings for totals in booking_totals),
+            "total_revenue": sum(totals.revenue for totals in booking_totals),
+            "total_discounts": sum(totals.discount for totals in booking_totals)
         },
         "room_types": room_types
     } 
\ No newline at end of file
@@ -0,0 +1,255 @@
+"""
+Date-range availability backed by a room x day occupancy bitmap.
+
+`OccupancyCalendar` keeps one boolean matrix with a row per room and a
+column per night, built from the `bookings` table. Rows are grouped by room
+type, so "which Deluxe Suites are free from the 12th to the 15th" is a single
+`any()` over a contiguous slice of the matrix. Stays more than
+`MAX_STAY_DISTANCE_DAYS` from today are refused, which bounds the matrix.
+"""
+
+import logging
+import threading
+from datetime import date, timedelta
+from itertools import repeat
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from records import Room, rows_as
+
+logger = logging.getLogger(__name__)
+
+MAX_STAY_DISTANCE_DAYS = 2 * 366
+
+SELECT_CALENDAR_ROOMS_SQL = '''
+    SELECT room_id, room_number, room_type, price_min, price_max
+    FROM rooms
+    ORDER BY lower(room_type), room_id
+'''
+
+SELECT_BOOKINGS_SINCE_SQL = '''
+    SELECT booking_id, room_id, check_in_date, check_out_date
+    FROM bookings
+    WHERE booking_id > ?
+    ORDER BY booking_id
+'''
+
+SELECT_CALENDAR_VERSIONS_SQL = '''
+    SELECT name, version FROM data_versions WHERE name IN ('room_set', 'bookings_rewrite')
+'''
+
+
+class RoomArrays(NamedTuple):
+    """Snapshot of the calendar's rooms; `type_index` maps each room to `type_names`/`type_keys`"""
+    type_names: List[str]
+    type_keys: List[str]
+    type_index: np.ndarray
+    room_ids: np.ndarray
+    room_numbers: np.ndarray
+    price_min: np.ndarray
+    price_max: np.ndarray
+
+
+def parse_stay(check_in_date: str, check_out_date: str, bounded: bool = True) -> Optional[Tuple[date, date]]:
+    """Parse a stay into [check_in, check_out) dates, or None if the dates are unusable.
+
+    A `bounded` stay reaching more than MAX_STAY_DISTANCE_DAYS before or
+    after today raises ValueError.
+    """
+    try:
+        check_in = date.fromisoformat(check_in_date)
+        check_out = date.fromisoformat(check_out_date)
+    except (TypeError, ValueError):
+        return None
+    if check_out <= check_in:
+        return None
+    if bounded and not _earliest_day() <= check_in < check_out <= _latest_day():
+        raise ValueError(f"Stay {check_in_date} to {check_out_date} is too far off; "
+                         f"bookings are taken up to {MAX_STAY_DISTANCE_DAYS} days either side of today")
+    return check_in, check_out
+
+
+def _earliest_day() -> date:
+    return date.today() - timedelta(days=MAX_STAY_DISTANCE_DAYS)
+
+
+def _latest_day() -> date:
+    return date.today() + timedelta(days=MAX_STAY_DISTANCE_DAYS)
+
+
+class OccupancyCalendar:
+    """Room x day occupancy bitmap for date-range availability queries.
+
+    The window starts today and covers `horizon_days` nights; it is rebuilt
+    with a wider window when a query or booking falls outside it. New
+    bookings are applied incrementally, either directly by `record_booking`
+    or by reading bookings past the last seen booking_id, so writes from
+    other processes are picked up too. Room inserts/deletes and booking
+    updates/deletes bump data_versions rows and force a full rebuild.
+    """
+
+    def __init__(self, pool, horizon_days: int = 366):
+        self.pool = pool
+        self.horizon_days = horizon_days
+        self._lock = threading.RLock()
+        self._built = False
+        self._start = date.today()
+        self._days = horizon_days
+        self._occupied = np.zeros((0, horizon_days), dtype=bool)
+        self._room_ids = np.zeros(0, dtype=np.int64)
+        self._room_numbers = np.zeros(0, dtype=np.int64)
+        self._price_min = np.zeros(0, dtype=np.float64)
+        self._price_max = np.zeros(0, dtype=np.float64)
+        self._row_of_room: Dict[int, int] = {}
+        self._type_slices: Dict[str, Tuple[str, int, int]] = {}
+        self._high_water = 0
+        self._versions: Dict[str, int] = {}
+        self.rebuilds = 0
+
+    def _read_versions(self, conn) -> Dict[str, int]:
+        return dict(conn.execute(SELECT_CALENDAR_VERSIONS_SQL).fetchall())
+
+    def _rebuild(self, start: date, days: int):
+        with self.pool.transaction() as cursor:
+            versions = self._read_versions(cursor)
+            rooms = cursor.execute(SELECT_CALENDAR_ROOMS_SQL).fetchall()
+            bookings = cursor.execute(SELECT_BOOKINGS_SINCE_SQL, (0,)).fetchall()
+
+        self._start = start
+        self._days = days
+        self._occupied = np.zeros((len(rooms), days), dtype=bool)
+        self._room_ids = np.array([r[0] for r in rooms], dtype=np.int64)
+        self._room_numbers = np.array([r[1] for r in rooms], dtype=np.int64)
+        self._price_min = np.array([r[3] for r in rooms], dtype=np.float64)
+        self._price_max = np.array([r[4] for r in rooms], dtype=np.float64)
+        self._row_of_room = {room_id: row for row, room_id in enumerate(self._room_ids.tolist())}
+
+        self._type_slices = {}
+        for row, (_, _, room_type, _, _) in enumerate(rooms):
+            key = room_type.lower()
+            if key in self._type_slices:
+                name, first, _ = self._type_slices[key]
+                self._type_slices[key] = (name, first, row + 1)
+            else:
+                self._type_slices[key] = (room_type, row, row + 1)
+
+        self._high_water = 0
+        for booking_id, room_id, check_in_date, check_out_date in bookings:
+            self._mark(room_id, check_in_date, check_out_date, grow=False)
+            self._high_water = booking_id
+        self._versions = versions
+        self._built = True
+        self.rebuilds += 1
+        logger.info(f"Built occupancy calendar: {len(rooms)} rooms x {days} days from {start}")
+
+    def _offsets(self, first: date, last: date) -> Tuple[int, int]:
+        return (first - self._start).days, (last - self._start).days
+
+    def _mark(self, room_id: int, check_in_date: str, check_out_date: str, grow: bool = True):
+        # Stored bookings are not bounded; the window never grows past the
+        # latest bookable day, so the part of a stay beyond it is dropped
+        stay = parse_stay(check_in_date, check_out_date, bounded=False)
+        row = self._row_of_room.get(room_id)
+        if stay is None or row is None:
+            return
+        begin, end = self._offsets(*stay)
+        limit = (_latest_day() - self._start).days
+        if grow and end > self._days and self._days < limit:
+            # A booking past the window: widen it and re-read everything
+            self._rebuild(self._start, min(end + self.horizon_days // 4, limit))
+            return
+        begin, end = max(begin, 0), min(end, self._days)
+        if begin < end:
+            self._occupied[row, begin:end] = True
+
+    def _refresh(self):
+        if not self._built:
+            self._rebuild(self._start, self._days)
+            return
+        conn = self.pool.connection()
+        if self._read_versions(conn) != self._versions:
+            self._rebuild(self._start, self._days)
+            return
+        for booking_id, room_id, check_in_date, check_out_date in conn.execute(
+                SELECT_BOOKINGS_SINCE_SQL, (self._high_water,)).fetchall():
+            self._mark(room_id, check_in_date, check_out_date)
+            self._high_water = max(self._high_water, booking_id)
+
+    def record_booking(self, booking_id: int, room_id: int, check_in_date: str, check_out_date: str):
+        """Apply a booking this process just committed"""
+        with self._lock:
+            if not self._built:
+                return
+            self._mark(room_id, check_in_date, check_out_date)
+            # Only advance past contiguous ids; a gap means another writer's
+            # booking that the next refresh still has to read.
+            if booking_id == self._high_water + 1:
+                self._high_water = booking_id
+
+    def _window(self, check_in: date, check_out: date) -> Tuple[int, int]:
+        """Refresh, widen the window to cover the stay if needed, and return its column range"""
+        self._refresh()
+        begin, end = self._offsets(check_in, check_out)
+        if begin < 0 or end > self._days:
+            start = min(self._start, check_in)
+            # Stays are bounded by parse_stay, so this stays within the bookable range
+            days = max((self._start + timedelta(days=self._days) - start).days,
+                       min((check_out - start).days + self.horizon_days // 4, (_latest_day() - start).days))
+            self._rebuild(start, days)
+            begin, end = self._offsets(check_in, check_out)
+        return begin, end
+
+    def free_rows(self, room_type: str, check_in: date, check_out: date) -> Tuple[Optional[str], np.ndarray]:
+        """Canonical type name and matrix rows of that type free for every night of the stay"""
+        with self._lock:
+            begin, end = self._window(check_in, check_out)
+            entry = self._type_slices.get(room_type.lower())
+            if entry is None:
+                return None, np.zeros(0, dtype=np.int64)
+            name, first, last = entry
+            busy = self._occupied[first:last, begin:end].any(axis=1)
+            return name, np.flatnonzero(~busy) + first
+
+    def room_is_free(self, room_id: int, check_in: date, check_out: date) -> bool:
+        """Whether no known booking of the room overlaps the stay; unknown rooms count as free"""
+        with self._lock:
+            begin, end = self._window(check_in, check_out)
+            row = self._row_of_room.get(room_id)
+            return row is None or not self._occupied[row, begin:end].any()
+
+    def type_occupancy(self, check_in: date, check_out: date) -> Dict[str, float]:
+        """Fraction of room-nights already booked over the stay, per lower-cased room type"""
+        with self._lock:
+            begin, end = self._window(check_in, check_out)
+            if not self._type_slices:
+                return {}
+            keys = list(self._type_slices)
+            firsts = np.array([first for _, first, _ in self._type_slices.values()])
+            sizes = np.array([last - first for _, first, last in self._type_slices.values()])
+            booked = np.add.reduceat(self._occupied[:, begin:end].sum(axis=1), firsts)
+            return dict(zip(keys, (booked / (sizes * (end - begin))).tolist()))
+
+    def room_arrays(self) -> RoomArrays:
+        """Every room as parallel arrays, grouped by room type"""
+        with self._lock:
+            self._refresh()
+            keys = list(self._type_slices)
+            sizes = [last - first for _, first, last in self._type_slices.values()]
+            return RoomArrays(
+                [name for name, _, _ in self._type_slices.values()], keys,
+                np.repeat(np.arange(len(keys)), sizes),
+                self._room_ids, self._room_numbers, self._price_min, self._price_max
+            )
+
+    def available_rooms(self, room_type: str, check_in_date: str, check_out_date: str) -> List[Room]:
+        """Rooms of `room_type` free for the whole stay [check_in_date, check_out_date)"""
+        stay = parse_stay(check_in_date, check_out_date)
+        if stay is None:
+            raise ValueError(f"Invalid stay {check_in_date} to {check_out_date}; use YYYY-MM-DD with check-out after check-in")
+        with self._lock:
+            name, rows = self.free_rows(room_type, *stay)
+            return rows_as(Room, zip(
+                self._room_ids[rows].tolist(), self._room_numbers[rows].tolist(), repeat(name),
+                self._price_min[rows].tolist(), self._price_max[rows].tolist()
+            ))
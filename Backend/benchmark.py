@@ -0,0 +1,1748 @@
+"""
+Performance benchmarks for the hotel backend.
+
+Run from the Backend directory, e.g.:
+
+    python benchmark.py pool --iterations 2000
+    python benchmark.py loop-lag --rooms 50000 --max-lag-ms 50
+    python benchmark.py export --history 1000 10000 100000
+    python benchmark.py book-stress --processes 8 --rooms 2000
+    python benchmark.py availability --rooms 5000 --bookings 200000
+    python benchmark.py query-plans --rooms 50000 --bookings 5000000
+    python benchmark.py import-time --budget-ms 1000
+    python benchmark.py listing --rooms 10000 50000
+    python benchmark.py pricing --rooms 10000 50000
+    python benchmark.py discounts --words 10 1000 50000
+    python benchmark.py analytics --bookings 10000 100000 1000000
+    python benchmark.py embeddings --rows 10000 100000
+    python benchmark.py meeting-search --files 1000 10000 100000
+    python benchmark.py ann --files 100000 --nprobe 1 4 16 64
+    python benchmark.py passages --doc-words 200 2000 20000
+    python benchmark.py ingest --texts 400 --pdfs 20 --workers 4
+    python benchmark.py query-cache --distinct 50 --encode-ms 10
+    python benchmark.py hybrid --files 5000 --candidates 50
+    python benchmark.py model-registry --databases 4 --threads 8
+    python benchmark.py encoder-parity --candidates onnx:models/minilm onnx-int8:models/minilm
+    python benchmark.py encoder-throughput --models all-MiniLM-L6-v2 onnx-int8:models/minilm
+    python benchmark.py micro-batch --concurrency 1 8 32 --max-wait-ms 2
+    python benchmark.py --json base.json suite --rooms 200 2000
+    python benchmark.py --baseline base.json suite --rooms 200 2000
+    python benchmark.py --threshold-pct 25 compare base.json new.json
+
+Each benchmark works on a scratch copy of the database in a temporary
+directory, so the real hotel.db / meeting.db are never modified.
+
+`--json` writes the results with the run's parameters and environment;
+`--baseline` (or the `compare` command) checks them against an earlier run
+and exits non-zero on regressions.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import inspect
+import itertools
+import logging
+import multiprocessing
+import os
+import pickle
+import platform
+import random
+import re
+import shutil
+import sqlite3
+import statistics
+import string
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+import analytics
+import embeddings
+from ann import IVFIndex, IVFParams
+from content_cache import QueryEmbeddingCache
+from dbdriver import (
+    SELECT_AVAILABLE_ROOMS_SQL,
+    SELECT_ROOM_TYPES_SQL,
+    AsyncHotelDatabase,
+    ConnectionPool,
+    HotelDatabase,
+    MeetingDatabase,
+)
+from excel_export import EXPORT_BOOKINGS_SQL, append_bookings, write_workbook
+from discounts import DiscountMatcher
+from pricing import quote_prices
+from passages import split_passages
+from records import Room, rows_as
+from vectors import VectorIndex, from_blob, from_blobs, normalize_rows, to_blob
+
+logger = logging.getLogger("benchmark")
+
+
+class ConnectPerCallPool(ConnectionPool):
+    """Reproduces the pre-pool behaviour: a brand new default connection for every call"""
+
+    def connection(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, isolation_level=None)
+
+
+def _scratch_db(workdir: str, source: str = "hotel.db") -> str:
+    path = os.path.join(workdir, "hotel.db")
+    if os.path.exists(source):
+        shutil.copyfile(source, path)
+    return path
+
+
+ROOM_TYPES = [
+    ("Normal", 50, 80),
+    ("Couple", 80, 120),
+    ("2 Beds", 100, 150),
+    ("4 Beds", 150, 200),
+    ("Queen Size", 120, 180),
+    ("Honeymoon", 200, 300),
+    ("Deluxe Suite", 250, 400),
+    ("Luxury", 350, 600),
+]
+
+
+def _synthetic_stay(i: int, horizon_days: int = 365):
+    """Deterministic 1-5 night stay somewhere in the next `horizon_days` days"""
+    check_in = date.today() + timedelta(days=(i * 7919) % horizon_days)
+    return check_in.isoformat(), (check_in + timedelta(days=1 + i % 5)).isoformat()
+
+
+def _synthetic_hotel(workdir: str, rooms: int, bookings: int = 0) -> str:
+    """Create a scratch hotel database with `rooms` rooms spread over the standard room types
+    and `bookings` historical bookings"""
+    path = os.path.join(workdir, f"hotel_{rooms}_{bookings}.db")
+    db = HotelDatabase(path)
+    with db.pool.transaction() as cursor:
+        cursor.execute("DELETE FROM rooms")
+        cursor.executemany(
+            "INSERT INTO rooms (room_number, room_type, price_min, price_max, is_occupied) VALUES (?, ?, ?, ?, ?)",
+            (
+                (1000 + i, *ROOM_TYPES[i % len(ROOM_TYPES)], i % 3 == 0)
+                for i in range(rooms)
+            ),
+        )
+        first_room_id = cursor.execute("SELECT MIN(room_id) FROM rooms").fetchone()[0]
+        cursor.executemany(
+            "INSERT INTO bookings (room_id, guest_name, check_in_date, check_out_date, total_amount, "
+            "discount_amount, special_occasion) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                (first_room_id + i % rooms, f"Guest {i}", *_synthetic_stay(i), 100.0, 0.0, None)
+                for i in range(bookings)
+            ),
+        )
+    db.close()
+    return path
+
+
+def _time_calls(fn: Callable, iterations: int, setup: Optional[Callable] = None) -> Dict[str, float]:
+    """Latency of `iterations` sequential calls; `setup` runs untimed before each one"""
+    samples = []
+    for _ in range(iterations):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1e6)
+    return _summarize(samples)
+
+
+def _summarize(samples: List[float]) -> Dict[str, float]:
+    samples.sort()
+    return {
+        "mean_us": statistics.fmean(samples),
+        "p50_us": samples[len(samples) // 2],
+        "p99_us": samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+    }
+
+
+def _import_api(workdir: str):
+    """Import api.py from inside `workdir` so its import-time side effects stay in the scratch dir"""
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        import api
+    finally:
+        os.chdir(cwd)
+    return api
+
+
+def _tool_calls(db: HotelDatabase, workdir: str, loop: asyncio.AbstractEventLoop) -> Dict[str, Callable]:
+    """The read-only function tools in api.py, bound to `db`"""
+    api = _import_api(workdir)
+    api.init_database(db)
+
+    def run(coro_fn, *args):
+        return lambda: loop.run_until_complete(coro_fn(None, *args))
+
+    return {
+        "tool.search_available_rooms": run(api.search_available_rooms, "Deluxe Suite"),
+        "tool.check_room_availability": run(api.check_room_availability, "Normal"),
+        "tool.get_room_pricing": run(api.get_room_pricing, "Luxury"),
+        "tool.get_room_details": run(api.get_room_details, 1),
+        "tool.calculate_discount": run(api.calculate_discount, "Honeymoon", "honeymoon"),
+        "tool.get_booking_summary": run(api.get_booking_summary),
+    }
+
+
+def bench_pool(args) -> List[Dict]:
+    """Per-call latency of HotelDatabase methods and api tools, connect-per-call vs pooled"""
+    results = []
+    loop = asyncio.new_event_loop()
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = _scratch_db(workdir)
+        for label, pool_cls in (("connect_per_call", ConnectPerCallPool), ("pooled", ConnectionPool)):
+            db = HotelDatabase(db_path, pool=pool_cls(db_path))
+            calls = {
+                "db.get_available_rooms_by_type": lambda: db.get_available_rooms_by_type("Normal"),
+                "db.get_all_room_types": db.get_all_room_types,
+                "db.get_room_status": lambda: db.get_room_status(1),
+            }
+            if not args.skip_tools:
+                calls.update(_tool_calls(db, workdir, loop))
+            for name, fn in calls.items():
+                fn()  # warm up
+                results.append({"benchmark": name, "mode": label, **_time_calls(fn, args.iterations)})
+            db.close()
+    loop.close()
+    return results
+
+
+class BlockingHotelDatabase(AsyncHotelDatabase):
+    """Awaitable API that runs queries inline on the event loop, as the tools used to"""
+
+    async def _run(self, fn, *args, **kwargs):
+        return fn(*args, **kwargs)
+
+
+async def _measure_loop_lag(adb: AsyncHotelDatabase, calls: int, concurrency: int,
+                            tick_ms: float) -> Dict[str, float]:
+    lags = []
+    done = asyncio.Event()
+
+    async def ticker():
+        interval = tick_ms / 1000
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            lags.append((time.perf_counter() - start - interval) * 1000)
+
+    async def worker(n: int):
+        for i in range(n):
+            if i % 2:
+                await adb.get_all_room_types()
+            else:
+                await adb.get_available_rooms_by_type(ROOM_TYPES[i % len(ROOM_TYPES)][0])
+
+    tick = asyncio.create_task(ticker())
+    await asyncio.sleep(tick_ms / 1000)
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(calls // concurrency) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await tick
+    lags.sort()
+    return {
+        "max_lag_ms": lags[-1],
+        "p99_lag_ms": lags[min(len(lags) - 1, int(len(lags) * 0.99))],
+        "p50_lag_ms": lags[len(lags) // 2],
+        "calls_per_s": calls / elapsed,
+    }
+
+
+def bench_loop_lag(args) -> List[Dict]:
+    """Event-loop lag while many tool queries run concurrently, inline vs on the executor"""
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = _synthetic_hotel(workdir, args.rooms)
+        for label, facade in (("inline", BlockingHotelDatabase), ("executor", AsyncHotelDatabase)):
+            adb = facade(HotelDatabase(db_path))
+            stats = asyncio.run(_measure_loop_lag(adb, args.calls, args.concurrency, args.tick_ms))
+            adb.close()
+            results.append({"benchmark": "loop_lag", "mode": label, **stats})
+    executor_lag = results[-1]["max_lag_ms"]
+    if args.max_lag_ms is not None and executor_lag > args.max_lag_ms:
+        _print_table(results)
+        raise SystemExit(f"FAIL: event loop stalled {executor_lag:.1f} ms (budget {args.max_lag_ms} ms)")
+    return results
+
+
+def bench_export(args) -> List[Dict]:
+    """Cost of exporting after one booking as history grows: full workbook rewrite vs CSV append"""
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for history in args.history:
+            db = HotelDatabase(_synthetic_hotel(workdir, args.rooms, history))
+            conn = db.pool.connection()
+            ledger = os.path.join(workdir, f"ledger_{history}.csv")
+            high_water = append_bookings(conn, ledger)
+
+            start = time.perf_counter()
+            write_workbook(conn, os.path.join(workdir, f"export_{history}.xlsx"))
+            full_ms = (time.perf_counter() - start) * 1000
+
+            room_id = db.get_available_rooms_by_type("Couple")[0].room_id
+            db.book_room(room_id, "Benchmark Guest", "2026-01-01", "2026-01-02")
+            start = time.perf_counter()
+            append_bookings(conn, ledger, high_water)
+            append_ms = (time.perf_counter() - start) * 1000
+
+            results.append({"benchmark": f"export[{history} bookings]", "mode": "full_vs_append",
+                            "full_ms": full_ms, "append_ms": append_ms})
+            db.close()
+    return results
+
+
+def _booking_worker(db_path: str, room_ids: List[int], seed: int, start_event, results):
+    logging.getLogger().setLevel(logging.WARNING)
+    db = HotelDatabase(db_path)
+    order = list(room_ids)
+    random.Random(seed).shuffle(order)
+    start_event.wait()
+    booked = 0
+    for room_id in order:
+        success, _, _ = db.book_room(room_id, f"Guest {seed}", "2026-01-01", "2026-01-02")
+        booked += success
+    db.close()
+    results.put((booked, len(order)))
+
+
+def bench_book_stress(args) -> List[Dict]:
+    """Multi-process booking contention: bookings per second and a double-booking check"""
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = _synthetic_hotel(workdir, args.rooms)
+        db = HotelDatabase(db_path)
+        conn = db.pool.connection()
+        room_ids = [row[0] for row in conn.execute("SELECT room_id FROM rooms WHERE is_occupied = FALSE")]
+
+        start_event = multiprocessing.Event()
+        queue = multiprocessing.Queue()
+        workers = [
+            multiprocessing.Process(target=_booking_worker, args=(db_path, room_ids, seed, start_event, queue))
+            for seed in range(args.processes)
+        ]
+        for worker in workers:
+            worker.start()
+        time.sleep(0.5)
+        start = time.perf_counter()
+        start_event.set()
+        outcomes = [queue.get() for _ in workers]
+        elapsed = time.perf_counter() - start
+        for worker in workers:
+            worker.join()
+
+        booked = sum(b for b, _ in outcomes)
+        attempts = sum(a for _, a in outcomes)
+        double_booked = conn.execute(
+            "SELECT COUNT(*) FROM (SELECT room_id FROM bookings GROUP BY room_id HAVING COUNT(*) > 1)"
+        ).fetchone()[0]
+        booking_rows = conn.execute("SELECT COUNT(*) FROM bookings").fetchone()[0]
+        db.close()
+
+    if double_booked or booked != len(room_ids) or booking_rows != booked:
+        raise SystemExit(
+            f"FAIL: {double_booked} double-booked rooms, {booked} successful bookings, "
+            f"{booking_rows} booking rows for {len(room_ids)} free rooms"
+        )
+    return [{
+        "benchmark": f"book_stress[{args.processes} procs]",
+        "mode": "begin_immediate",
+        "bookings_per_s": booked / elapsed,
+        "attempts_per_s": attempts / elapsed,
+        "elapsed_s": elapsed,
+    }]
+
+
+def bench_availability(args) -> List[Dict]:
+    """Date-range availability queries on the occupancy bitmap, per room type"""
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        db = HotelDatabase(_synthetic_hotel(workdir, args.rooms, args.bookings))
+        start = time.perf_counter()
+        db.calendar.free_rows("Normal", date.today(), date.today() + timedelta(days=1))
+        build_ms = (time.perf_counter() - start) * 1000
+
+        rng = random.Random(0)
+
+        def query():
+            check_in = date.today() + timedelta(days=rng.randrange(360))
+            room_type = ROOM_TYPES[rng.randrange(len(ROOM_TYPES))][0]
+            db.calendar.free_rows(room_type, check_in, check_in + timedelta(days=rng.randint(1, 7)))
+
+        stats = _time_calls(query, args.iterations)
+        results.append({"benchmark": f"availability[{args.rooms} rooms]", "mode": "bitmap",
+                        "build_ms": build_ms, **stats})
+        db.close()
+    return results
+
+
+def _rooms_as_dicts(cursor: sqlite3.Cursor) -> List[Dict]:
+    """The pre-record row handling: one dict with string keys per row"""
+    rooms = []
+    for row in cursor.fetchall():
+        rooms.append({
+            'room_id': row[0],
+            'room_number': row[1],
+            'room_type': row[2],
+            'price_min': row[3],
+            'price_max': row[4]
+        })
+    return rooms
+
+
+def _rooms_as_records(cursor: sqlite3.Cursor) -> List[Room]:
+    return rows_as(Room, cursor)
+
+
+def bench_listing(args) -> List[Dict]:
+    """Listing every room: dict-per-row versus Room records, allocation and throughput, and the
+    rows as a function tool's result reaches the model (str() of the response)"""
+    sql = "SELECT room_id, room_number, room_type, price_min, price_max FROM rooms"
+    modes = [("dict", _rooms_as_dicts), ("record", _rooms_as_records),
+             ("tool_response[dict]", lambda cursor: str({"rooms": _rooms_as_dicts(cursor)})),
+             ("tool_response[record]", lambda cursor: str({"rooms": _rooms_as_records(cursor)}))]
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for rooms in args.rooms:
+            db = HotelDatabase(_synthetic_hotel(workdir, rooms))
+            conn = db.pool.connection()
+            for mode, build in modes:
+                tracemalloc.start()
+                listing = build(conn.execute(sql))
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                assert isinstance(listing, str) or len(listing) == rooms
+                del listing
+
+                stats = _time_calls(lambda: build(conn.execute(sql)), args.iterations)
+                results.append({
+                    "benchmark": f"listing[{rooms} rooms]",
+                    "mode": mode,
+                    "peak_bytes_per_row": peak / rooms,
+                    "rows_per_s": rooms / (stats["mean_us"] / 1e6),
+                    **stats,
+                })
+            db.close()
+    return results
+
+
+def _legacy_discount(special_occasion: str) -> float:
+    """The hard-coded if/elif chain the discount rules replaced"""
+    if not special_occasion:
+        return 0
+    occasion_lower = special_occasion.lower()
+    if 'honeymoon' in occasion_lower:
+        return 15.0
+    elif 'birthday' in occasion_lower:
+        return 10.0
+    elif 'anniversary' in occasion_lower:
+        return 12.0
+    elif 'wedding' in occasion_lower:
+        return 20.0
+    elif 'special' in occasion_lower or 'celebration' in occasion_lower:
+        return 8.0
+    return 0
+
+
+def _legacy_quotes(db: HotelDatabase, room_ids: List[int], occasion: str) -> List[float]:
+    """The pre-engine pricing: a query per room, then price_max less the discount, floored at price_min"""
+    conn = db.pool.connection()
+    prices = []
+    for room_id in room_ids:
+        _, price_min, price_max = conn.execute("SELECT room_type, price_min, price_max FROM rooms WHERE room_id = ?",
+                                               (room_id,)).fetchone()
+        discount_percentage = _legacy_discount(occasion)
+        prices.append(max(price_max - price_max * discount_percentage / 100, price_min))
+    return prices
+
+
+def bench_pricing(args) -> List[Dict]:
+    """Quoting every room: one query per room versus the vectorized pricing engine"""
+    results = []
+    check_in, check_out = _synthetic_stay(1)
+    with tempfile.TemporaryDirectory() as workdir:
+        for rooms in args.rooms:
+            db = HotelDatabase(_synthetic_hotel(workdir, rooms, rooms * 10))
+            db.quote_rooms(check_in, check_out)
+            arrays = db.calendar.room_arrays()
+            demand = np.random.default_rng(0).random(len(arrays.room_ids))
+            room_ids = arrays.room_ids.tolist()
+            legacy_ids = room_ids[:min(rooms, 2000)]
+
+            modes = [
+                ("query_per_room", lambda: _legacy_quotes(db, legacy_ids, "birthday"), len(legacy_ids)),
+                ("engine.undated", lambda: db.quote_rooms(special_occasion="birthday"), rooms),
+                ("engine.dated", lambda: db.quote_rooms(check_in, check_out, "birthday"), rooms),
+                ("quote_prices", lambda: quote_prices(arrays.price_min, arrays.price_max, demand, 10.0), rooms),
+                ("engine.types", lambda: db.quote_room_types(check_in, check_out, "birthday"), len(ROOM_TYPES)),
+            ]
+            for mode, fn, count in modes:
+                stats = _time_calls(fn, args.iterations)
+                results.append({
+                    "benchmark": f"pricing[{rooms} rooms]",
+                    "mode": mode,
+                    "ns_per_quote": stats["mean_us"] * 1000 / count,
+                    **stats,
+                })
+            db.close()
+    return results
+
+
+TRANSCRIPT_WORDS = ("we would like a quiet room for the weekend with a late check out and breakfast "
+                    "for two and maybe a view of the city if that is possible thank you").split()
+
+
+def _transcript(words: int, occasion: str, rng: random.Random) -> str:
+    """Free-form chatter with the occasion mentioned at the very end, the worst case for every matcher"""
+    return " ".join(rng.choice(TRANSCRIPT_WORDS) for _ in range(words)) + f" it is our {occasion}"
+
+
+class RegexDiscountMatcher:
+    """One case-insensitive alternation over every keyword, best priority among all hits"""
+
+    def __init__(self, rules):
+        self.rules = {rule.keyword.lower(): rule for rule in rules}
+        keywords = sorted(self.rules, key=len, reverse=True)
+        self.pattern = re.compile("|".join(map(re.escape, keywords)))
+
+    def discount_percentage(self, occasion: str) -> float:
+        hits = [self.rules[m.group()] for m in self.pattern.finditer(occasion.lower())]
+        return min(hits, key=lambda rule: rule.priority).discount_percentage if hits else 0
+
+
+def bench_discounts(args) -> List[Dict]:
+    """Occasion discount matching on free-form transcripts of growing length"""
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        db = HotelDatabase(_scratch_db(workdir))
+        rules = db.get_discount_rules()
+        matcher = DiscountMatcher(rules)
+        regex = RegexDiscountMatcher(rules)
+        rng = random.Random(0)
+        for words in args.words:
+            texts = [_transcript(words, occasion, rng) for occasion in ("anniversary", "wedding", "graduation")]
+            for text in texts:
+                expected = _legacy_discount(text)
+                if not (matcher.discount_percentage(text) == regex.discount_percentage(text)
+                        == db.discounts.discount_for(text) == expected):
+                    raise SystemExit(f"FAIL: matchers disagree on a {words}-word transcript")
+            modes = [
+                ("if_elif", _legacy_discount),
+                ("regex_alternation", regex.discount_percentage),
+                ("matcher", matcher.discount_percentage),
+                ("rules.discount_for", db.discounts.discount_for),
+            ]
+            for mode, fn in modes:
+                stats = _time_calls(lambda: [fn(text) for text in texts], args.iterations)
+                results.append({"benchmark": f"discounts[{words} words]", "mode": mode,
+                                "us_per_match": stats["mean_us"] / len(texts), **stats})
+        results.append({"benchmark": "discounts.compiles", "mode": "cached", "compiles": float(db.discounts.compiles)})
+        db.close()
+    return results
+
+
+# Daily aggregates computed straight from bookings, what a report had to do before analytics.py
+DAILY_STATS_FROM_BOOKINGS_SQL = '''
+    WITH RECURSIVE nights(stay_date, last_night, room_type, revenue) AS (
+        SELECT date(b.check_in_date), date(b.check_out_date, '-1 day'), r.room_type,
+               b.total_amount / (julianday(b.check_out_date) - julianday(b.check_in_date))
+        FROM bookings b JOIN rooms r ON r.room_id = b.room_id
+        WHERE b.check_out_date > ? AND b.check_in_date <= ?
+        UNION ALL
+        SELECT date(stay_date, '+1 day'), last_night, room_type, revenue
+        FROM nights WHERE stay_date < last_night
+    )
+    SELECT stay_date, room_type, COUNT(*), SUM(revenue)
+    FROM nights WHERE stay_date BETWEEN ? AND ?
+    GROUP BY stay_date, room_type
+'''
+
+
+def bench_analytics(args) -> List[Dict]:
+    """30-day occupancy/revenue report: materialized daily aggregates versus aggregating bookings"""
+    results = []
+    start = date.today() + timedelta(days=30)
+    start_date, end_date = start.isoformat(), (start + timedelta(days=29)).isoformat()
+    with tempfile.TemporaryDirectory() as workdir:
+        for bookings in args.bookings:
+            db = HotelDatabase(_synthetic_hotel(workdir, args.rooms, bookings))
+            began = time.perf_counter()
+            db.rebuild_analytics()
+            backfill_ms = (time.perf_counter() - began) * 1000
+            conn = db.pool.connection()
+
+            materialized = {(s.stay_date, s.room_type): s.rooms_booked
+                            for s in db.get_daily_stats(start_date, end_date)}
+            on_the_fly = {(row[0], row[1]): row[2] for row in conn.execute(
+                DAILY_STATS_FROM_BOOKINGS_SQL, (start_date, end_date, start_date, end_date))}
+            if materialized != on_the_fly:
+                raise SystemExit(f"FAIL: materialized aggregates disagree with bookings at {bookings} bookings")
+
+            modes = [
+                ("from_bookings", lambda: conn.execute(DAILY_STATS_FROM_BOOKINGS_SQL,
+                                                       (start_date, end_date, start_date, end_date)).fetchall()),
+                ("materialized", lambda: db.get_daily_stats(start_date, end_date)),
+                ("totals", db.get_booking_totals),
+            ]
+            for mode, fn in modes:
+                results.append({"benchmark": f"analytics[{bookings} bookings]", "mode": mode,
+                                **_time_calls(fn, args.iterations)})
+
+            room_ids = [room.room_id for room in db.get_available_rooms_by_type("Normal")]
+            db.quote_room_types(*_synthetic_stay(bookings))  # build the occupancy calendar up front
+            stays = iter(range(len(room_ids)))
+            results.append({"benchmark": f"analytics[{bookings} bookings]", "mode": "book_room",
+                            "backfill_ms": backfill_ms,
+                            **_time_calls(lambda: db.book_room(room_ids[next(stays)], "Guest",
+                                                               *_synthetic_stay(bookings)),
+                                          min(args.iterations, len(room_ids)))})
+            db.close()
+    return results
+
+
+LEGACY_MEETING_FILES_SQL = '''
+    CREATE TABLE meeting_files (
+        file_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        filename TEXT UNIQUE NOT NULL,
+        content TEXT NOT NULL,
+        embedding BLOB NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+
+def bench_embeddings(args) -> List[Dict]:
+    """Decoding stored meeting embeddings: pickled ndarrays versus raw float32 bytes"""
+    results = []
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as workdir:
+        for rows in args.rows:
+            matrix = rng.standard_normal((rows, args.dim)).astype(np.float32)
+            pickled = [pickle.dumps(vector) for vector in matrix]
+            raw = [to_blob(vector) for vector in matrix]
+            if not (np.array_equal(from_blobs(raw, args.dim), matrix)
+                    and all(np.array_equal(from_blob(blob, args.dim), pickle.loads(old))
+                            for blob, old in zip(raw[:100], pickled[:100]))):
+                raise SystemExit(f"FAIL: float32 blobs do not round-trip at {rows} rows")
+
+            modes = [
+                ("pickle.loads", lambda: [pickle.loads(blob) for blob in pickled], len(pickled[0])),
+                ("from_blob", lambda: [from_blob(blob, args.dim) for blob in raw], len(raw[0])),
+                ("from_blobs", lambda: from_blobs(raw, args.dim), len(raw[0])),
+            ]
+            for mode, fn, blob_bytes in modes:
+                stats = _time_calls(fn, args.iterations)
+                results.append({"benchmark": f"embeddings[{rows} rows]", "mode": mode,
+                                "ms_per_100k_rows": stats["mean_us"] / 1000 * 100000 / rows,
+                                "bytes_per_row": float(blob_bytes), **stats})
+
+            # One-time conversion of a meeting.db written in the pickle format
+            path = os.path.join(workdir, f"meeting_{rows}.db")
+            with sqlite3.connect(path) as conn:
+                conn.execute(LEGACY_MEETING_FILES_SQL)
+                conn.executemany("INSERT INTO meeting_files (filename, content, embedding) VALUES (?, ?, ?)",
+                                 ((f"meeting_{i}.txt", "content", blob) for i, blob in enumerate(pickled)))
+            conn.close()
+            began = time.perf_counter()
+            MeetingDatabase(path)
+            results.append({"benchmark": f"embeddings[{rows} rows]", "mode": "migrate",
+                            "migrate_ms": (time.perf_counter() - began) * 1000,
+                            "file_mb": os.path.getsize(path) / 2 ** 20})
+    return results
+
+
+class HashEncoder:
+    """Deterministic stand-in for the SentenceTransformer, so search timings leave out inference"""
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+        self.encoded = 0
+
+    def encode(self, text, **kwargs):
+        if isinstance(text, str):
+            self.encoded += 1
+            seed = int.from_bytes(text.encode()[:8].ljust(8, b"\0"), "little") ^ len(text)
+            return np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+        return np.stack([self.encode(item) for item in text]).reshape(-1, self.dim)
+
+
+def _synthetic_meetings(workdir: str, files: int, dim: int, content_words: int = 300) -> MeetingDatabase:
+    # Start from a copy of meeting.db; a fresh one would need the real model for its sample rows
+    path = shutil.copy("meeting.db", os.path.join(workdir, f"meeting_{files}.db"))
+    db = MeetingDatabase(path)
+    db._embedding_model = HashEncoder(dim)
+    rng = np.random.default_rng(files)
+    content = _transcript(content_words, "meeting", random.Random(files))
+    with db.pool.transaction() as cursor:
+        cursor.execute("DELETE FROM meeting_files")
+        for start in range(0, files, 10000):
+            embeddings = rng.standard_normal((min(10000, files - start), dim)).astype(np.float32)
+            cursor.executemany(
+                "INSERT INTO meeting_files (filename, content, embedding, embedding_dim) VALUES (?, ?, ?, ?)",
+                ((f"meeting_{start + i}.txt", content, to_blob(e), dim) for i, e in enumerate(embeddings)))
+        # One passage per file with the file's embedding, so the index and the scan agree
+        cursor.execute("INSERT INTO meeting_passages (file_id, start_offset, end_offset, embedding, embedding_dim) "
+                       "SELECT file_id, 0, ?, embedding, embedding_dim FROM meeting_files", (db.passage_chars,))
+    return db
+
+
+def _scan_search(db: MeetingDatabase, query: str, top_k: int) -> List[Dict]:
+    """vector_search before the resident index: read every row, score in Python, sort all"""
+    query_emb = db.embedding_model.encode(query)
+    results = []
+    cursor = db.pool.connection().execute(
+        "SELECT filename, content, embedding, embedding_dim, created_at FROM meeting_files")
+    for filename, content, embedding_blob, embedding_dim, created_at in cursor.fetchall():
+        embedding = from_blob(embedding_blob, embedding_dim)
+        similarity = np.dot(query_emb, embedding) / (np.linalg.norm(query_emb) * np.linalg.norm(embedding))
+        results.append({"filename": filename, "content": content, "similarity": similarity, "created_at": created_at})
+    results.sort(key=lambda x: x["similarity"], reverse=True)
+    return results[:top_k]
+
+
+def bench_meeting_search(args) -> List[Dict]:
+    """Meeting vector search: full-table scan versus the resident normalized index"""
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for files in args.files:
+            db = _synthetic_meetings(workdir, files, args.dim)
+            queries = itertools.cycle([f"query {i}" for i in range(16)])
+            began = time.perf_counter()
+            db.vector_search("warm up", args.top_k)
+            load_ms = (time.perf_counter() - began) * 1000
+            for query in ("budget", "timeline", "feedback"):
+                expected = [r["filename"] for r in _scan_search(db, query, args.top_k)]
+                if [r["filename"] for r in db.vector_search(query, args.top_k)] != expected:
+                    raise SystemExit(f"FAIL: index and scan disagree on the top {args.top_k} at {files} files")
+            query_emb = db.embedding_model.encode("budget")
+            modes = [
+                ("scan", lambda: _scan_search(db, next(queries), args.top_k)),
+                ("vector_search", lambda: db.vector_search(next(queries), args.top_k)),
+                ("index.search", lambda: db.index.search(query_emb, args.top_k)),
+            ]
+            for mode, fn in modes:
+                iterations = max(3, args.iterations // 10) if mode == "scan" else args.iterations
+                results.append({"benchmark": f"meeting_search[{files} files]", "mode": mode,
+                                **_time_calls(fn, iterations)})
+            results.append({"benchmark": f"meeting_search[{files} files]", "mode": "index_load",
+                            "load_ms": load_ms, "index_mb": files * args.dim * 4 / 2 ** 20})
+            db.close()
+    return results
+
+
+def _clustered_embeddings(rows: int, dim: int, topics: int, seed: int) -> np.ndarray:
+    """Unit vectors scattered around `topics` directions, closer to real sentence embeddings than pure noise"""
+    rng = np.random.default_rng(seed)
+    centers = normalize_rows(rng.standard_normal((topics, dim)))
+    noise = rng.standard_normal((rows, dim)).astype(np.float32) / np.sqrt(dim)
+    return normalize_rows(centers[rng.integers(0, topics, rows)] + 0.8 * noise)
+
+
+def bench_ann(args) -> List[Dict]:
+    """IVF approximate search: recall@k and latency against the exact index, per nprobe"""
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for files in args.files:
+            embeddings = _clustered_embeddings(files, args.dim, max(1, files // 200), seed=files)
+            queries = _clustered_embeddings(args.queries, args.dim, max(1, files // 200), seed=files + 1)
+            ids = np.arange(1, files + 1)
+            exact = VectorIndex()
+            exact.add(ids, embeddings)
+            params = IVFParams(nlist=args.nlist, min_rows=min(files, IVFParams().min_rows))
+            began = time.perf_counter()
+            ivf = IVFIndex(params)
+            ivf.add(ids, embeddings)
+            build_ms = (time.perf_counter() - began) * 1000
+
+            path = os.path.join(workdir, "index.npz")
+            began = time.perf_counter()
+            ivf.save(path)
+            save_ms = (time.perf_counter() - began) * 1000
+            began = time.perf_counter()
+            loaded, _ = IVFIndex.load(path, params)
+            load_ms = (time.perf_counter() - began) * 1000
+            if not np.array_equal(loaded.search(queries[0], args.top_k)[0], ivf.search(queries[0], args.top_k)[0]):
+                raise SystemExit(f"FAIL: reloaded IVF index answers differently at {files} files")
+            results.append({"benchmark": f"ann[{files} files]", "mode": "build", "build_ms": build_ms,
+                            "nlist": float(ivf.nlist), "save_ms": save_ms, "load_ms": load_ms,
+                            "file_mb": os.path.getsize(path) / 2 ** 20})
+
+            truth = [set(exact.search(query, args.top_k)[0].tolist()) for query in queries]
+            query_cycle = itertools.cycle(queries)
+            results.append({"benchmark": f"ann[{files} files]", "mode": "exact", "recall": 1.0,
+                            **_time_calls(lambda: exact.search(next(query_cycle), args.top_k), args.iterations)})
+            for nprobe in [None] + args.nprobe:
+                recall = statistics.mean(
+                    len(expected & set(ivf.search(query, args.top_k, nprobe)[0].tolist())) / args.top_k
+                    for query, expected in zip(queries, truth))
+                mode = f"nprobe={nprobe}" if nprobe else f"default nprobe={ivf.default_nprobe(ivf.nlist)}"
+                if not nprobe and recall < args.min_recall:
+                    raise SystemExit(f"FAIL: default nprobe recall@{args.top_k} is {recall:.2f} at {files} files")
+                results.append({"benchmark": f"ann[{files} files]", "mode": f"ivf[{mode}]",
+                                "recall": recall,
+                                **_time_calls(lambda: ivf.search(next(query_cycle), args.top_k, nprobe),
+                                              args.iterations)})
+    return results
+
+
+def bench_passages(args) -> List[Dict]:
+    """Passage splitting and add_file for long documents, and how much text a search hit returns"""
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        # No embedding cache, so add_file keeps timing the encode of a document it has seen
+        db = MeetingDatabase(shutil.copy("meeting.db", os.path.join(workdir, "meeting.db")), cache_embeddings=0)
+        db._embedding_model = HashEncoder()
+        rng = random.Random(0)
+        for words in args.doc_words:
+            docs = [_transcript(words, f"topic {i}", rng).replace(" it is our", ". It is our") for i in range(args.docs)]
+            spans = [split_passages(doc, db.passage_chars, db.passage_overlap) for doc in docs]
+            if any(not doc_spans or doc_spans[-1][1] < len(doc.rstrip()) for doc, doc_spans in zip(docs, spans)):
+                raise SystemExit(f"FAIL: passages do not reach the end of a {words}-word document")
+            stats = _time_calls(lambda: [split_passages(doc, db.passage_chars, db.passage_overlap) for doc in docs],
+                                args.iterations)
+            doc_chars = statistics.mean(len(doc) for doc in docs)
+            passage_chars = statistics.mean(end - start for doc_spans in spans for start, end in doc_spans)
+            results.append({"benchmark": f"passages[{words} words]", "mode": "split_passages",
+                            "passages_per_doc": float(statistics.mean(map(len, spans))),
+                            "ms_per_mb": stats["mean_us"] / 1000 / (doc_chars * len(docs) / 2 ** 20),
+                            # What a search hit hands the agent: the whole file before, one passage now
+                            "hit_chars_file": doc_chars, "hit_chars_passage": passage_chars, **stats})
+            names = iter(itertools.count())
+            results.append({"benchmark": f"passages[{words} words]", "mode": "add_file",
+                            **_time_calls(lambda: db.add_file(f"doc_{words}_{next(names)}.txt", docs[0]),
+                                          max(3, args.iterations // 10))})
+        db.close()
+    return results
+
+
+def _write_documents(workdir: str, texts: int, pdfs: int, pdf_pages: int) -> str:
+    """A directory of `texts` transcript .txt files and `pdfs` PDFs of `pdf_pages` pages each"""
+    import pymupdf
+    docs = os.path.join(workdir, "docs")
+    os.makedirs(docs)
+    rng = random.Random(0)
+    for i in range(texts):
+        with open(os.path.join(docs, f"transcript_{i}.txt"), "w") as f:
+            f.write(_transcript(400, f"topic {i}", rng))
+    for i in range(pdfs):
+        pdf = pymupdf.open()
+        for page in range(pdf_pages):
+            pdf.new_page().insert_textbox(pymupdf.Rect(50, 50, 550, 800), _transcript(150, f"page {page}", rng))
+        pdf.save(os.path.join(docs, f"report_{i}.pdf"))
+        pdf.close()
+    return docs
+
+
+def bench_ingest(args) -> List[Dict]:
+    """Bulk ingest of a directory of transcripts and PDFs: add_file per document versus ingest_paths,
+    then the same documents under new names, served by the content cache"""
+    import pdfplumber
+    from ingest import find_documents, ingest_paths
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        docs = _write_documents(workdir, args.texts, args.pdfs, args.pdf_pages)
+        paths = find_documents([docs])
+        for mode in ["add_file", "ingest_paths"]:
+            db = MeetingDatabase(shutil.copy("meeting.db", os.path.join(workdir, f"meeting_{mode}.db")))
+            db._embedding_model = HashEncoder()
+            began = time.perf_counter()
+            if mode == "add_file":
+                # What the agent did per file: pdfplumber in-process, then one encode and one commit each
+                for path in paths:
+                    if path.endswith(".pdf"):
+                        with pdfplumber.open(path) as pdf:
+                            content = "\n".join(page.extract_text() or "" for page in pdf.pages).strip()
+                    else:
+                        with open(path) as f:
+                            content = f.read()
+                    db.add_file(os.path.basename(path), content)
+                added = db.pool.connection().execute("SELECT COUNT(*) FROM meeting_files").fetchone()[0] - 3
+            else:
+                added = ingest_paths(db, [docs], args.workers, args.batch_docs).added
+            seconds = time.perf_counter() - began
+            db.close()
+            if added != len(paths):
+                raise SystemExit(f"FAIL: {mode} added {added} of {len(paths)} documents")
+            results.append({"benchmark": f"ingest[{args.texts} txt + {args.pdfs} pdf]", "mode": mode,
+                            "docs_per_s": len(paths) / seconds, "total_ms": seconds * 1000})
+        # The same documents again under new names: text and embeddings come from the content cache
+        renamed = shutil.copytree(docs, os.path.join(workdir, "renamed"))
+        for name in os.listdir(renamed):
+            os.rename(os.path.join(renamed, name), os.path.join(renamed, f"copy_{name}"))
+        db = MeetingDatabase(os.path.join(workdir, "meeting_ingest_paths.db"))
+        encoder = db._embedding_model = HashEncoder()
+        report = ingest_paths(db, [renamed], args.workers, args.batch_docs)
+        stats = db.content_cache.stats()
+        db.close()
+        if report.added != len(paths) or encoder.encoded:
+            raise SystemExit(f"FAIL: re-ingest added {report.added} of {len(paths)} and encoded {encoder.encoded} texts")
+        results.append({"benchmark": f"ingest[{args.texts} txt + {args.pdfs} pdf]", "mode": "ingest_paths cached",
+                        "docs_per_s": report.docs_per_s, "total_ms": report.seconds * 1000,
+                        "text_hit_rate": stats["text_hit_rate"], "embedding_hit_rate": stats["embedding_hit_rate"]})
+    return results
+
+
+class SlowEncoder(HashEncoder):
+    """HashEncoder that takes `delay_ms` per call, like a CPU forward pass of the real model"""
+
+    def __init__(self, dim: int = 384, delay_ms: float = 10.0):
+        super().__init__(dim)
+        self.delay_ms = delay_ms
+
+    def encode(self, text, **kwargs):
+        time.sleep(self.delay_ms / 1000)
+        return super().encode(text, **kwargs)
+
+
+def bench_query_cache(args) -> List[Dict]:
+    """vector_search on a repetitive voice-style query stream, with and without the query embedding cache"""
+    rng = random.Random(0)
+    topics = [f"what did we decide about {_transcript(3, f'topic {i}', rng)}" for i in range(args.distinct)]
+    # Zipf-like popularity, and the same question asked with different spacing or a trailing space
+    weights = [1 / (rank + 1) for rank in range(len(topics))]
+    stream = [rng.choices(topics, weights)[0] for _ in range(args.queries)]
+    stream = [query.replace(" ", "  ", 1) if i % 3 == 0 else query + " " * (i % 2) for i, query in enumerate(stream)]
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        db = _synthetic_meetings(workdir, args.files, 384)
+        for mode, size in [("uncached", 0), ("cached", args.cache_size)]:
+            db.query_cache = QueryEmbeddingCache(size, args.ttl)
+            db._embedding_model = SlowEncoder(delay_ms=args.encode_ms)
+            db.vector_search("warm up", 5)
+            queries = iter(stream)
+            stats = _time_calls(lambda: db.vector_search(next(queries), 5), len(stream))
+            results.append({"benchmark": f"query-cache[{args.distinct} distinct]", "mode": mode,
+                            "hit_rate": db.query_cache.stats()["hit_rate"], **stats})
+        # A new model object must not be answered from the old model's entries
+        db._embedding_model = SlowEncoder(delay_ms=0)
+        db.vector_search(stream[0], 5)
+        if db.query_cache.stats()["invalidations"] != 1:
+            raise SystemExit("FAIL: query cache was not invalidated when the model changed")
+        db.close()
+    return results
+
+
+class WordEncoder:
+    """Bag-of-words stand-in for the model: texts sharing words are similar, but tokens with
+    digits (project codes, dates, filenames) are invisible to it, as they mostly are to MiniLM"""
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def encode(self, text, **kwargs):
+        if not isinstance(text, str):
+            return np.stack([self.encode(item) for item in text]).reshape(-1, self.dim)
+        embedding = np.zeros(self.dim, dtype=np.float32)
+        for word in re.findall(r"\b[a-z]+\b", text.lower()):
+            digest = hashlib.blake2b(word.encode(), digest_size=4).digest()
+            embedding[int.from_bytes(digest, "little") % self.dim] += 1.0
+        return embedding
+
+
+def bench_hybrid(args) -> List[Dict]:
+    """Recall@k and latency of vector_search and hybrid_search for code, filename and plain-word queries"""
+    rng = random.Random(0)
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        db = MeetingDatabase(shutil.copy("meeting.db", os.path.join(workdir, "meeting.db")))
+        db._embedding_model = WordEncoder()
+        # Letters-only words with Zipf frequencies, so files differ in wording as real notes do
+        vocabulary = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))) for _ in range(2000)]
+        cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(vocabulary))))
+        files = [(f"project_{i:05d}.txt", f"Status of project code{i:05d}. "
+                  + " ".join(rng.choices(vocabulary, cum_weights=cum_weights, k=args.content_words)))
+                 for i in range(args.files)]
+        for start in range(0, len(files), 1000):
+            db.add_files(files[start:start + 1000])
+        targets = rng.sample(range(args.files), args.queries)
+        # What pure similarity misses (a project code, a filename), and what it finds (a run of the file's words)
+        kinds = {
+            "code": [(f"code{i:05d} status", files[i][0]) for i in targets[0::3]],
+            "filename": [(files[i][0], files[i][0]) for i in targets[1::3]],
+            "words": [(" ".join(files[i][1].split()[5:17]), files[i][0]) for i in targets[2::3]],
+        }
+        queries = [query for kind in kinds.values() for query in kind]
+        searches = [
+            ("vector_search", lambda query: db.vector_search(query, args.top_k)),
+            ("hybrid_search", lambda query: db.hybrid_search(query, args.top_k, args.candidates)),
+            ("hybrid prefilter", lambda query: db.hybrid_search(query, args.top_k, args.candidates, prefilter=True)),
+        ]
+        for mode, search in searches:
+            search("warm up")
+            recall = {f"recall_{kind}": sum(target in [r["filename"] for r in search(query)]
+                                            for query, target in kind_queries) / len(kind_queries)
+                      for kind, kind_queries in kinds.items()}
+            query_cycle = itertools.cycle(query for query, _ in queries)
+            results.append({"benchmark": f"hybrid[{args.files} files]", "mode": mode, **recall,
+                            **_time_calls(lambda: search(next(query_cycle)), args.iterations)})
+        db.close()
+    return results
+
+
+class FakeModel(SlowEncoder):
+    """SlowEncoder that holds `weights_mb` of resident memory, like a model's weights"""
+
+    def __init__(self, weights_mb: int, delay_ms: float):
+        super().__init__(delay_ms=delay_ms)
+        self.weights = np.ones(weights_mb * 2 ** 20 // 4, dtype=np.float32)
+
+
+def bench_model_registry(args) -> List[Dict]:
+    """Concurrent first use of the model registry: one load per process, shared by every MeetingDatabase"""
+    loads = []
+
+    def loader(name: str):
+        loads.append(name)
+        time.sleep(args.load_ms / 1000)
+        return FakeModel(args.weights_mb, args.encode_ms)
+
+    registry = embeddings.ModelRegistry(loader)
+    results = []
+    with tempfile.TemporaryDirectory() as workdir, ThreadPoolExecutor(max_workers=args.threads) as executor:
+        # MeetingDatabase resolves models through the module-level registry
+        default_registry, embeddings.registry = embeddings.registry, registry
+        try:
+            dbs = [MeetingDatabase(shutil.copy("meeting.db", os.path.join(workdir, f"meeting_{i}.db")),
+                                   query_cache_size=0) for i in range(args.databases)]
+            # Every thread searches at once, before anything has loaded the model
+            start = time.perf_counter()
+            list(executor.map(lambda i: dbs[i % len(dbs)].vector_search(f"question {i}", 5), range(args.threads)))
+            cold_ms = (time.perf_counter() - start) * 1000
+            if len(loads) != 1 or len({id(db.embedding_model) for db in dbs}) != 1:
+                raise SystemExit(f"FAIL: {len(loads)} loads for {len(dbs)} databases")
+            stats = registry.stats()["models"][embeddings.DEFAULT_MODEL]
+            results.append({"benchmark": f"model-registry[{args.databases} databases, {args.threads} threads]",
+                            "mode": "cold start", "loads": len(loads), "load_ms": stats["load_ms"],
+                            "load_rss_mb": stats["load_rss_mb"], "first_searches_ms": cold_ms})
+            encoded = stats["encode_calls"]
+            queries = itertools.count()
+
+            def search():
+                i = next(queries)
+                dbs[i % len(dbs)].vector_search(f"question {i}", 5)
+
+            results.append({"benchmark": f"model-registry[{args.databases} databases, {args.threads} threads]",
+                            "mode": "warm search", "loads": len(loads),
+                            **_time_concurrent(search, args.iterations, args.threads)})
+            # Concurrent calls are serialized, not lost: one recorded encode per search
+            encoded = registry.stats()["models"][embeddings.DEFAULT_MODEL]["encode_calls"] - encoded
+            if encoded != args.iterations // args.threads * args.threads:
+                raise SystemExit(f"FAIL: {encoded} encode calls recorded")
+            for db in dbs:
+                db.close()
+        finally:
+            embeddings.registry = default_registry
+    return results
+
+
+def _encoder_sentences(count: int, rng: random.Random) -> List[str]:
+    """Meeting notes from meeting.db, split into passages, plus voice-style questions and transcripts
+    from a few words to past the model's token limit"""
+    conn = sqlite3.connect("file:meeting.db?mode=ro", uri=True)
+    notes = [content for (content,) in conn.execute("SELECT content FROM meeting_files")]
+    conn.close()
+    sentences = [note[start:end] for note in notes for start, end in split_passages(note)]
+    while len(sentences) < count:
+        words = rng.choice([3, 8, 20, 60, 200])
+        sentences.append(_transcript(words, f"meeting {rng.randrange(1000)}", rng) if len(sentences) % 2
+                         else f"what did we decide about {_transcript(words, 'budget', rng)}")
+    return sentences[:count]
+
+
+def bench_encoder_parity(args) -> List[Dict]:
+    """Cosine similarity between each candidate encoder backend's embeddings and the reference model's"""
+    sentences = _encoder_sentences(args.sentences, random.Random(0))
+    reference = normalize_rows(np.asarray(embeddings.load_model(args.reference).encode(sentences), dtype=np.float32))
+    # Nearest neighbours among the sentences themselves, as a search over them would rank them
+    reference_top = np.argsort(-(reference @ reference.T), axis=1)[:, 1:args.top_k + 1]
+    results, failed = [], []
+    for spec in args.candidates:
+        candidate = normalize_rows(np.asarray(embeddings.load_model(spec).encode(sentences), dtype=np.float32))
+        cosine = (reference * candidate).sum(axis=1)
+        candidate_top = np.argsort(-(candidate @ candidate.T), axis=1)[:, 1:args.top_k + 1]
+        agreement = statistics.fmean(len(set(a) & set(b)) / args.top_k for a, b in zip(reference_top, candidate_top))
+        results.append({"benchmark": f"encoder-parity[{args.reference}, {len(sentences)} sentences]", "mode": spec,
+                        "min_cosine": float(cosine.min()), "mean_cosine": float(cosine.mean()),
+                        f"top{args.top_k}_agreement": agreement})
+        if cosine.min() < args.min_cosine:
+            failed.append(f"{spec} min cosine {cosine.min():.4f}")
+    if failed:
+        raise SystemExit(f"FAIL: below {args.min_cosine}: {', '.join(failed)}")
+    return results
+
+
+def bench_encoder_throughput(args) -> List[Dict]:
+    """Sentences per second of each encoder backend, at several batch sizes"""
+    sentences = _encoder_sentences(args.sentences, random.Random(0))
+    results = []
+    for spec in args.models:
+        start = time.perf_counter()
+        model = embeddings.load_model(spec)
+        load_ms = (time.perf_counter() - start) * 1000
+        model.encode(sentences[:args.batch_sizes[0]], batch_size=args.batch_sizes[0])
+        for batch_size in args.batch_sizes:
+            start = time.perf_counter()
+            model.encode(sentences, batch_size=batch_size)
+            elapsed = time.perf_counter() - start
+            results.append({"benchmark": f"encoder-throughput[batch {batch_size}]", "mode": spec,
+                            "load_ms": load_ms, "sentences_per_s": len(sentences) / elapsed})
+    return results
+
+
+class BatchCostEncoder:
+    """HashEncoder that sleeps `call_ms` per call plus `item_ms` per text, like a CPU forward
+    pass whose fixed cost dominates for short queries"""
+
+    def __init__(self, call_ms: float, item_ms: float, dim: int = 384):
+        self.hash_encoder = HashEncoder(dim)
+        self.call_ms = call_ms
+        self.item_ms = item_ms
+
+    def encode(self, text, **kwargs):
+        time.sleep((self.call_ms + self.item_ms * (1 if isinstance(text, str) else len(text))) / 1000)
+        return self.hash_encoder.encode(text)
+
+
+def bench_micro_batch(args) -> List[Dict]:
+    """Concurrent single-query encodes, straight to the shared encoder and through a MicroBatcher"""
+    rng = random.Random(0)
+    # Numbered first, so HashEncoder (seeded by the first bytes) gives every query its own vector
+    queries = [f"{i:05d} what did we decide about {_transcript(6, f'topic {i}', rng)}" for i in range(args.iterations)]
+    encoder = embeddings.SharedEncoder("batch-cost", BatchCostEncoder(args.call_ms, args.item_ms), 0.0, 0.0)
+    batcher = embeddings.MicroBatcher(encoder.encode, args.max_batch_size, args.max_wait_ms)
+    with ThreadPoolExecutor(max_workers=32) as executor:
+        fanned_out = np.stack(list(executor.map(batcher.encode, queries[:256])))
+    batcher.close()
+    if not np.array_equal(fanned_out, HashEncoder().encode(queries[:256])):
+        raise SystemExit("FAIL: MicroBatcher returned an embedding to the wrong caller")
+    results = []
+    for concurrency in args.concurrency:
+        for mode in ("direct", "batched", "batched async"):
+            batcher = embeddings.MicroBatcher(encoder.encode, args.max_batch_size, args.max_wait_ms)
+            stream = itertools.cycle(queries)
+            if mode == "direct":
+                stats = _time_concurrent(lambda: encoder.encode(next(stream)), args.iterations, concurrency)
+            elif mode == "batched":
+                stats = _time_concurrent(lambda: batcher.encode(next(stream)), args.iterations, concurrency)
+            else:
+                stats = asyncio.run(_time_concurrent_async(lambda: batcher.encode_async(next(stream)),
+                                                           args.iterations, concurrency))
+            batcher.close()
+            batch_stats = batcher.stats()
+            if mode == "direct":
+                direct_p50_us = stats["p50_us"]
+            elif concurrency == 1 and stats["p50_us"] > direct_p50_us + 1000:
+                raise SystemExit(f"FAIL: a lone {mode} caller took {stats['p50_us']:.0f} us, "
+                                 f"direct {direct_p50_us:.0f} us")
+            results.append({"benchmark": f"micro-batch[{concurrency} concurrent]", "mode": mode, **stats,
+                            "mean_batch_size": batch_stats["mean_batch_size"] if mode != "direct" else 1.0,
+                            "wait_p99_ms": batch_stats["wait_p99_ms"]})
+    return results
+
+
+class StubRunContext:
+    """Stands in for livekit's RunContext, which only exists inside a live agent session"""
+
+    def __init__(self):
+        self.userdata = {}
+        self.session = None
+        self.speech_handle = None
+        self.function_call = None
+
+    def disallow_interruptions(self):
+        pass
+
+    async def wait_for_playout(self):
+        pass
+
+
+class Case(NamedTuple):
+    """One timed call. `fn` is synchronous; tools also carry `afn` for the concurrent run"""
+    name: str
+    fn: Callable
+    afn: Optional[Callable[[], Awaitable]] = None
+    writes: bool = False
+    setup: Optional[Callable] = None
+    max_iterations: Optional[int] = None
+
+
+SUITE_GUEST = "Suite Guest"
+
+# Frees the rooms the suite booked and drops its bookings, so dated write cases can run again
+RELEASE_SUITE_ROOMS_SQL = f"UPDATE rooms SET is_occupied = FALSE WHERE guest_name = '{SUITE_GUEST}' AND is_occupied"
+DELETE_SUITE_BOOKINGS_SQL = f"DELETE FROM bookings WHERE guest_name = '{SUITE_GUEST}'"
+
+# Public HotelDatabase methods and api.py tools the suite does not time, and why
+SUITE_SKIPS = {
+    "db.close": "tears the database down",
+    "tool.convert_to_pdf": "needs a Playwright browser and a recorded meeting",
+}
+
+
+def _release_suite_rooms(db: HotelDatabase):
+    """Undo the suite's bookings, so the next write case books the same rooms and dates afresh"""
+    with db.pool.transaction(immediate=True) as cursor:
+        cursor.execute(RELEASE_SUITE_ROOMS_SQL)
+        if cursor.execute(DELETE_SUITE_BOOKINGS_SQL).rowcount:
+            analytics.rebuild(cursor)
+    # Deleted bookings force a calendar rebuild; do it here rather than inside the timed call
+    db.calendar.room_arrays()
+
+
+def _suite_stay(i: int):
+    """A `_synthetic_stay` moved a year on, past the synthetic history, so the suite's fixed rooms are free"""
+    check_in, check_out = (date.fromisoformat(day) + timedelta(days=366) for day in _synthetic_stay(i))
+    return check_in.isoformat(), check_out.isoformat()
+
+
+def _db_cases(db: HotelDatabase, workdir: str) -> List[Case]:
+    check_in, check_out = _synthetic_stay(3)
+    report_end = (date.fromisoformat(check_in) + timedelta(days=29)).isoformat()
+    room_id = db.get_available_rooms_by_type("Couple")[0].room_id
+    stays = itertools.count(10_000)
+    release = lambda: _release_suite_rooms(db)
+
+    return [
+        Case("db.init_database", db.init_database, max_iterations=20),
+        Case("db.get_available_rooms_by_type", lambda: db.get_available_rooms_by_type("Normal")),
+        Case("db.get_available_rooms_for_dates", lambda: db.get_available_rooms_for_dates("Normal", check_in, check_out)),
+        Case("db.get_all_room_types", db.get_all_room_types),
+        Case("db.get_room_type", lambda: db.get_room_type("deluxe suite")),
+        Case("db.get_inventory_stats", db.get_inventory_stats),
+        Case("db.quote_room_types", lambda: db.quote_room_types(check_in, check_out, "birthday")),
+        Case("db.quote_room_type", lambda: db.quote_room_type("Luxury", check_in, check_out, "wedding")),
+        Case("db.quote_rooms", lambda: db.quote_rooms(check_in, check_out, "anniversary"), max_iterations=20),
+        Case("db.get_daily_stats", lambda: db.get_daily_stats(check_in, report_end)),
+        Case("db.get_booking_totals", db.get_booking_totals),
+        Case("db.get_discount_rules", db.get_discount_rules),
+        Case("db.get_room_status", lambda: db.get_room_status(room_id)),
+        Case("db.book_room", lambda: db.book_room(room_id, SUITE_GUEST, *_suite_stay(next(stays)), "birthday"),
+             writes=True, setup=release),
+        Case("db.book_rooms", lambda: db.book_rooms({"Normal": 2, "Couple": 1}, SUITE_GUEST,
+                                                    *_suite_stay(next(stays))),
+             writes=True, setup=release),
+        Case("db.rebuild_analytics", db.rebuild_analytics, writes=True, max_iterations=5),
+        Case("db.export_to_excel", lambda: db.export_to_excel(os.path.join(workdir, "suite.xlsx")), max_iterations=3),
+    ]
+
+
+def _tool_cases(api, db: HotelDatabase, loop: asyncio.AbstractEventLoop) -> List[Case]:
+    check_in, check_out = _synthetic_stay(3)
+    room_id = db.get_available_rooms_by_type("Couple")[0].room_id
+    stays = itertools.count(20_000)
+    context = StubRunContext()
+    release = lambda: _release_suite_rooms(db)
+
+    def case(tool, *args, args_fn: Callable = None, **kwargs):
+        afn = lambda: tool(context, *(args_fn() if args_fn else args))
+        return Case(f"tool.{tool.__name__}", lambda: loop.run_until_complete(afn()), afn, **kwargs)
+
+    return [
+        case(api.search_available_rooms, "Deluxe Suite"),
+        case(api.check_room_availability, "Normal", check_in, check_out),
+        case(api.get_room_pricing, "Luxury", check_in, check_out),
+        case(api.get_room_details, room_id),
+        case(api.suggest_room_for_occasion, "honeymoon", 400.0),
+        case(api.calculate_discount, "Honeymoon", "honeymoon"),
+        case(api.get_booking_summary),
+        case(api.book_room, args_fn=lambda: (room_id, SUITE_GUEST, *_suite_stay(next(stays)), "wedding"),
+             writes=True, setup=release),
+        case(api.book_group_rooms,
+             args_fn=lambda: (["Normal", "Couple"], [2, 1], SUITE_GUEST, *_suite_stay(next(stays))),
+             writes=True, setup=release),
+    ]
+
+
+def _check_coverage(names: List[str], api):
+    """Every public HotelDatabase method and api.py function tool needs a case or a reason to skip it"""
+    from livekit.agents.llm import is_function_tool
+
+    expected = {f"db.{name}" for name, member in inspect.getmembers(HotelDatabase, inspect.isfunction)
+                if not name.startswith("_")}
+    expected |= {f"tool.{name}" for name, member in vars(api).items() if is_function_tool(member)}
+    missing = expected - set(names) - set(SUITE_SKIPS)
+    if missing:
+        raise SystemExit(f"FAIL: no suite case for {sorted(missing)}; add one or list it in SUITE_SKIPS")
+
+
+def _check_write(case: Case, result):
+    success = result.get("success") if isinstance(result, dict) else result[0] if isinstance(result, tuple) else True
+    if case.writes and success is False:
+        raise SystemExit(f"FAIL: {case.name} did not succeed: {result}")
+
+
+def _time_concurrent(fn: Callable, iterations: int, threads: int) -> Dict[str, float]:
+    samples = []
+
+    def worker(n: int):
+        for _ in range(n):
+            start = time.perf_counter()
+            fn()
+            samples.append((time.perf_counter() - start) * 1e6)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(worker, [max(1, iterations // threads)] * threads))
+    elapsed = time.perf_counter() - start
+    return {**_summarize(samples), "calls_per_s": len(samples) / elapsed}
+
+
+async def _time_concurrent_async(afn: Callable[[], Awaitable], iterations: int, concurrency: int) -> Dict[str, float]:
+    samples = []
+
+    async def worker(n: int):
+        for _ in range(n):
+            start = time.perf_counter()
+            await afn()
+            samples.append((time.perf_counter() - start) * 1e6)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(max(1, iterations // concurrency)) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {**_summarize(samples), "calls_per_s": len(samples) / elapsed}
+
+
+def bench_suite(args) -> List[Dict]:
+    """Every HotelDatabase method and api.py tool: cold, warm and concurrent, on synthetic hotels"""
+    results = []
+    loop = asyncio.new_event_loop()
+    with tempfile.TemporaryDirectory() as workdir:
+        api = _import_api(workdir)
+        export_path = os.path.join(workdir, "hotel_bookings.xlsx")
+        for rooms in args.rooms:
+            db_path = _synthetic_hotel(workdir, rooms, rooms * args.bookings_per_room)
+            HotelDatabase(db_path).rebuild_analytics()
+
+            def open_cases(kind: str) -> List[Case]:
+                """Cases bound to a newly opened database; tools get it installed in api.py"""
+                db = HotelDatabase(db_path)
+                opened.append(db)
+                if kind == "db":
+                    return _db_cases(db, workdir)
+                api.init_database(db, export_filename=export_path)
+                return _tool_cases(api, db, loop)
+
+            def close_opened():
+                while opened:
+                    opened.pop().close()
+
+            opened = []
+            names = {kind: [case.name for case in open_cases(kind)] for kind in ("db", "tool")}
+            close_opened()
+            _check_coverage(names["db"] + names["tool"], api)
+
+            for kind in ("db", "tool"):
+                for index, name in enumerate(names[kind]):
+                    label = f"{name}[{rooms}]"
+
+                    # Cold: first call on a freshly opened database, with empty caches
+                    # and no prepared statements (the OS page cache stays warm)
+                    cold = []
+                    for _ in range(args.cold_repeat):
+                        case = open_cases(kind)[index]
+                        if case.setup:
+                            case.setup()
+                        start = time.perf_counter()
+                        case.fn()
+                        cold.append((time.perf_counter() - start) * 1e6)
+                        close_opened()
+                    results.append({"benchmark": label, "mode": "cold", **_summarize(cold)})
+
+                    case = open_cases(kind)[index]
+                    iterations = min(args.iterations, case.max_iterations or args.iterations)
+                    if case.setup:
+                        case.setup()
+                    _check_write(case, case.fn())
+                    results.append({"benchmark": label, "mode": "warm",
+                                    **_time_calls(case.fn, iterations, case.setup)})
+
+                    # Concurrent writers are covered by book-stress
+                    if not case.writes:
+                        if case.afn:
+                            stats = loop.run_until_complete(
+                                _time_concurrent_async(case.afn, iterations, args.threads))
+                        else:
+                            stats = _time_concurrent(case.fn, iterations, args.threads)
+                        results.append({"benchmark": label, "mode": f"concurrent[{args.threads}]", **stats})
+                    close_opened()
+        api.get_exporter().close()
+    loop.close()
+    return results
+
+
+def _load_results(path: str) -> List[Dict]:
+    with open(path) as f:
+        data = json.load(f)
+    return data["results"] if isinstance(data, dict) else data
+
+
+def _compare(baseline: List[Dict], current: List[Dict], metric: str, threshold_pct: float) -> List[Dict]:
+    """Rows present in both runs whose `metric` got worse by more than threshold_pct.
+
+    Metrics ending in `_per_s` are throughputs, where lower is worse.
+    """
+    before = {(row["benchmark"], row.get("mode")): row for row in baseline}
+    regressions = []
+    for row in current:
+        old = before.get((row["benchmark"], row.get("mode")))
+        name = metric if metric in row else next((k for k in row if k.endswith("_per_s")), None)
+        if old is None or name is None or not old.get(name) or name not in row:
+            continue
+        change_pct = (row[name] - old[name]) / old[name] * 100
+        if name.endswith("_per_s"):
+            change_pct = -change_pct
+        if change_pct > threshold_pct:
+            regressions.append({"benchmark": row["benchmark"], "mode": row.get("mode"), "metric": name,
+                                "baseline": old[name], "current": row[name], "change_pct": change_pct})
+    return regressions
+
+
+def _report_regressions(regressions: List[Dict], threshold_pct: float):
+    if regressions:
+        for r in regressions:
+            print(f"REGRESSION {r['benchmark']} {r['mode']} {r['metric']}: "
+                  f"{r['baseline']:.1f} -> {r['current']:.1f} ({r['change_pct']:+.0f}%)")
+        raise SystemExit(f"FAIL: {len(regressions)} benchmarks regressed by more than {threshold_pct}%")
+    print(f"No regressions beyond {threshold_pct}%")
+
+
+def bench_compare(args) -> List[Dict]:
+    """Compare two --json result files and fail on regressions"""
+    regressions = _compare(_load_results(args.baseline_file), _load_results(args.current_file),
+                           args.metric, args.threshold_pct)
+    _report_regressions(regressions, args.threshold_pct)
+    return []
+
+
+# (name, sql, params, substring every line of the plan must satisfy together)
+EXPECTED_PLANS = [
+    ("available_rooms_by_type", SELECT_AVAILABLE_ROOMS_SQL, ("Normal",),
+     ["COVERING INDEX idx_rooms_type_occupied"]),
+    ("room_type_aggregates", SELECT_ROOM_TYPES_SQL, (),
+     ["COVERING INDEX idx_rooms_type_occupied"]),
+    ("export_bookings_join", EXPORT_BOOKINGS_SQL, (0,),
+     ["SEARCH b USING INTEGER PRIMARY KEY", "SEARCH r USING INTEGER PRIMARY KEY"]),
+    ("bookings_for_room", "SELECT check_in_date, check_out_date FROM bookings WHERE room_id = ?", (1,),
+     ["COVERING INDEX idx_bookings_room_id"]),
+]
+
+
+def _check_plans(conn: sqlite3.Connection) -> List[str]:
+    failures = []
+    for name, sql, params, expected in EXPECTED_PLANS:
+        plan = " | ".join(row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params))
+        for fragment in expected:
+            if fragment not in plan:
+                failures.append(f"{name}: expected '{fragment}' in plan '{plan}'")
+        if "TEMP B-TREE" in plan:
+            failures.append(f"{name}: plan needs a temporary b-tree: '{plan}'")
+    return failures
+
+
+def bench_query_plans(args) -> List[Dict]:
+    """Assert EXPLAIN QUERY PLAN uses the secondary indexes, then time the queries with and without them"""
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        db = HotelDatabase(_synthetic_hotel(workdir, args.rooms, args.bookings))
+        conn = db.pool.connection()
+        conn.execute("ANALYZE")
+        failures = _check_plans(conn)
+        if failures:
+            raise SystemExit("FAIL:\n" + "\n".join(failures))
+
+        timed = [(name, sql, params) for name, sql, params, _ in EXPECTED_PLANS if name != "export_bookings_join"]
+        for label in ("indexed", "no_indexes"):
+            if label == "no_indexes":
+                conn.execute("DROP INDEX idx_rooms_type_occupied")
+                conn.execute("DROP INDEX idx_bookings_room_id")
+            for name, sql, params in timed:
+                stats = _time_calls(lambda: conn.execute(sql, params).fetchall(), args.iterations)
+                results.append({"benchmark": f"query.{name}", "mode": label, **stats})
+        db.close()
+    return results
+
+
+# Modules that must not be imported just by importing the app modules
+DEFERRED_MODULES = ["sentence_transformers", "torch", "pdfplumber", "openpyxl", "pymupdf",
+                    "playwright", "google.generativeai", "google.genai", "pandas"]
+
+IMPORT_PROBE = """
+import json, os, sys, time
+sys.path.insert(0, {backend!r})
+for name in {preload!r}:
+    __import__(name)
+preloaded = set(sys.modules)
+start = time.perf_counter()
+import {module}
+elapsed_ms = (time.perf_counter() - start) * 1000
+result = {{
+    "import_ms": elapsed_ms,
+    "deferred_loaded": [m for m in {deferred!r} if m in sys.modules and m not in preloaded],
+    "files_created": sorted(os.listdir(".")),
+}}
+if {check_agent!r}:
+    import agent, flask_server
+    first = agent.get_agent()
+    result["single_agent"] = first is agent.get_agent() and first is flask_server.load_agent()
+    result["model_loaded_by_agent"] = first.meeting_db._embedding_model is not None
+    result["files_created"] = sorted(os.listdir("."))
+print(json.dumps(result))
+"""
+
+
+def bench_import_time(args) -> List[Dict]:
+    """Cold import cost of the app modules in a fresh interpreter, with a budget and lazy-init checks"""
+    backend = os.path.dirname(os.path.abspath(__file__))
+    results = []
+    failures = []
+    for module in args.modules:
+        samples = []
+        for _ in range(args.repeat):
+            with tempfile.TemporaryDirectory() as workdir:
+                # Run against copies of the existing databases, as a deployed worker would
+                for name in ("hotel.db", "meeting.db"):
+                    if os.path.exists(os.path.join(backend, name)):
+                        shutil.copyfile(os.path.join(backend, name), os.path.join(workdir, name))
+                probe = IMPORT_PROBE.format(backend=backend, preload=args.preload, module=module,
+                                            deferred=DEFERRED_MODULES, check_agent=module == "agent")
+                out = subprocess.run([sys.executable, "-c", probe], cwd=workdir, capture_output=True,
+                                     text=True, check=True).stdout
+                samples.append(json.loads(out.strip().splitlines()[-1]))
+        best = min(samples, key=lambda r: r["import_ms"])
+        results.append({"benchmark": f"import.{module}", "mode": "cold", "import_ms": best["import_ms"]})
+        if best["import_ms"] > args.budget_ms:
+            failures.append(f"import {module} took {best['import_ms']:.0f} ms (budget {args.budget_ms} ms)")
+        if best["deferred_loaded"]:
+            failures.append(f"import {module} eagerly loaded {best['deferred_loaded']}")
+        created = set(best["files_created"]) - {"hotel.db", "meeting.db"}
+        if module != "agent" and created:
+            failures.append(f"import {module} created {sorted(created)}")
+        if module == "agent" and not best.get("single_agent", False):
+            failures.append("agent, flask_server and repeated get_agent() calls built more than one agent")
+        if best.get("model_loaded_by_agent"):
+            failures.append("building the agent loaded the embedding model")
+    if failures:
+        _print_table(results)
+        raise SystemExit("FAIL:\n" + "\n".join(failures))
+    return results
+
+
+def _print_table(results: List[Dict]):
+    for row in results:
+        stats = "  ".join(f"{k}={v:10.1f}" for k, v in row.items() if isinstance(v, float))
+        print(f"{row['benchmark']:<34} {row.get('mode', ''):<18} {stats}")
+
+
+def _run_metadata(args) -> Dict:
+    return {
+        "command": args.command,
+        "args": {k: v for k, v in vars(args).items() if k not in ("func", "json", "baseline")},
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--json", help="Write raw results to this file")
+    parser.add_argument("--baseline", help="Compare results with this earlier --json file and fail on regressions")
+    parser.add_argument("--metric", default="p50_us", help="Metric compared against the baseline")
+    parser.add_argument("--threshold-pct", type=float, default=25.0, help="Allowed slowdown against the baseline")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("pool", help=bench_pool.__doc__)
+    p.add_argument("--iterations", type=int, default=1000)
+    p.add_argument("--skip-tools", action="store_true", help="Only time HotelDatabase methods, not api.py tools")
+    p.set_defaults(func=bench_pool)
+
+    p = sub.add_parser("loop-lag", help=bench_loop_lag.__doc__)
+    p.add_argument("--rooms", type=int, default=50000)
+    p.add_argument("--calls", type=int, default=400)
+    p.add_argument("--concurrency", type=int, default=40)
+    p.add_argument("--tick-ms", type=float, default=5.0, help="Interval of the simulated audio-frame ticker")
+    p.add_argument("--max-lag-ms", type=float, help="Exit non-zero if the executor mode exceeds this lag")
+    p.set_defaults(func=bench_loop_lag)
+
+    p = sub.add_parser("export", help=bench_export.__doc__)
+    p.add_argument("--rooms", type=int, default=200)
+    p.add_argument("--history", type=int, nargs="+", default=[1000, 10000, 100000])
+    p.set_defaults(func=bench_export)
+
+    p = sub.add_parser("book-stress", help=bench_book_stress.__doc__)
+    p.add_argument("--processes", type=int, default=8)
+    p.add_argument("--rooms", type=int, default=2000)
+    p.set_defaults(func=bench_book_stress)
+
+    p = sub.add_parser("availability", help=bench_availability.__doc__)
+    p.add_argument("--rooms", type=int, default=5000)
+    p.add_argument("--bookings", type=int, default=200000)
+    p.add_argument("--iterations", type=int, default=2000)
+    p.set_defaults(func=bench_availability)
+
+    p = sub.add_parser("listing", help=bench_listing.__doc__)
+    p.add_argument("--rooms", type=int, nargs="+", default=[10000, 50000])
+    p.add_argument("--iterations", type=int, default=20)
+    p.set_defaults(func=bench_listing)
+
+    p = sub.add_parser("pricing", help=bench_pricing.__doc__)
+    p.add_argument("--rooms", type=int, nargs="+", default=[10000, 50000])
+    p.add_argument("--iterations", type=int, default=20)
+    p.set_defaults(func=bench_pricing)
+
+    p = sub.add_parser("discounts", help=bench_discounts.__doc__)
+    p.add_argument("--words", type=int, nargs="+", default=[10, 1000, 50000])
+    p.add_argument("--iterations", type=int, default=50)
+    p.set_defaults(func=bench_discounts)
+
+    p = sub.add_parser("analytics", help=bench_analytics.__doc__)
+    p.add_argument("--rooms", type=int, default=2000)
+    p.add_argument("--bookings", type=int, nargs="+", default=[10000, 100000, 1000000])
+    p.add_argument("--iterations", type=int, default=50)
+    p.set_defaults(func=bench_analytics)
+
+    p = sub.add_parser("embeddings", help=bench_embeddings.__doc__)
+    p.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    p.add_argument("--dim", type=int, default=384)
+    p.add_argument("--iterations", type=int, default=5)
+    p.set_defaults(func=bench_embeddings)
+
+    p = sub.add_parser("meeting-search", help=bench_meeting_search.__doc__)
+    p.add_argument("--files", type=int, nargs="+", default=[1000, 10000, 100000])
+    p.add_argument("--dim", type=int, default=384)
+    p.add_argument("--top-k", type=int, default=5)
+    p.add_argument("--iterations", type=int, default=100)
+    p.set_defaults(func=bench_meeting_search)
+
+    p = sub.add_parser("ann", help=bench_ann.__doc__)
+    p.add_argument("--files", type=int, nargs="+", default=[10000, 100000])
+    p.add_argument("--dim", type=int, default=384)
+    p.add_argument("--nlist", type=int, default=None, help="IVF lists (default about sqrt(files))")
+    p.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 16, 64])
+    p.add_argument("--top-k", type=int, default=10)
+    p.add_argument("--queries", type=int, default=200)
+    p.add_argument("--iterations", type=int, default=200)
+    p.add_argument("--min-recall", type=float, default=0.9, help="Fail below this recall at the default nprobe")
+    p.set_defaults(func=bench_ann)
+
+    p = sub.add_parser("passages", help=bench_passages.__doc__)
+    p.add_argument("--doc-words", type=int, nargs="+", default=[200, 2000, 20000])
+    p.add_argument("--docs", type=int, default=20)
+    p.add_argument("--iterations", type=int, default=20)
+    p.set_defaults(func=bench_passages)
+
+    p = sub.add_parser("ingest", help=bench_ingest.__doc__)
+    p.add_argument("--texts", type=int, default=400)
+    p.add_argument("--pdfs", type=int, default=20)
+    p.add_argument("--pdf-pages", type=int, default=20)
+    p.add_argument("--workers", type=int, default=None, help="PDF extraction processes (default: CPU count)")
+    p.add_argument("--batch-docs", type=int, default=64)
+    p.set_defaults(func=bench_ingest)
+
+    p = sub.add_parser("query-cache", help=bench_query_cache.__doc__)
+    p.add_argument("--files", type=int, default=1000)
+    p.add_argument("--distinct", type=int, default=50, help="Distinct questions in the query stream")
+    p.add_argument("--queries", type=int, default=500)
+    p.add_argument("--cache-size", type=int, default=1024)
+    p.add_argument("--ttl", type=float, default=3600.0)
+    p.add_argument("--encode-ms", type=float, default=10.0, help="Simulated model latency per encode")
+    p.set_defaults(func=bench_query_cache)
+
+    p = sub.add_parser("hybrid", help=bench_hybrid.__doc__)
+    p.add_argument("--files", type=int, default=5000)
+    p.add_argument("--content-words", type=int, default=150)
+    p.add_argument("--queries", type=int, default=100)
+    p.add_argument("--top-k", type=int, default=5)
+    p.add_argument("--candidates", type=int, default=50)
+    p.add_argument("--iterations", type=int, default=200)
+    p.set_defaults(func=bench_hybrid)
+
+    p = sub.add_parser("model-registry", help=bench_model_registry.__doc__)
+    p.add_argument("--databases", type=int, default=4, help="MeetingDatabases sharing the model")
+    p.add_argument("--threads", type=int, default=8)
+    p.add_argument("--iterations", type=int, default=400)
+    p.add_argument("--load-ms", type=float, default=500.0, help="Simulated model load time")
+    p.add_argument("--weights-mb", type=int, default=90, help="Simulated model size")
+    p.add_argument("--encode-ms", type=float, default=5.0, help="Simulated model latency per encode")
+    p.set_defaults(func=bench_model_registry)
+
+    p = sub.add_parser("encoder-parity", help=bench_encoder_parity.__doc__)
+    p.add_argument("--reference", default=embeddings.DEFAULT_MODEL, help="Model spec to compare against")
+    p.add_argument("--candidates", nargs="+", required=True, help="Model specs, e.g. onnx-int8:models/minilm")
+    p.add_argument("--sentences", type=int, default=500)
+    p.add_argument("--top-k", type=int, default=5)
+    p.add_argument("--min-cosine", type=float, default=0.99, help="Fail if any sentence agrees less")
+    p.set_defaults(func=bench_encoder_parity)
+
+    p = sub.add_parser("encoder-throughput", help=bench_encoder_throughput.__doc__)
+    p.add_argument("--models", nargs="+", default=[embeddings.DEFAULT_MODEL], help="Model specs to compare")
+    p.add_argument("--sentences", type=int, default=1000)
+    p.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    p.set_defaults(func=bench_encoder_throughput)
+
+    p = sub.add_parser("micro-batch", help=bench_micro_batch.__doc__)
+    p.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    p.add_argument("--iterations", type=int, default=640)
+    p.add_argument("--max-batch-size", type=int, default=16)
+    p.add_argument("--max-wait-ms", type=float, default=0.0,
+                   help="How long a batch that already has company waits for more")
+    p.add_argument("--call-ms", type=float, default=8.0, help="Simulated fixed cost per encode call")
+    p.add_argument("--item-ms", type=float, default=0.5, help="Simulated cost per text in a call")
+    p.set_defaults(func=bench_micro_batch)
+
+    p = sub.add_parser("suite", help=bench_suite.__doc__)
+    p.add_argument("--rooms", type=int, nargs="+", default=[200, 2000])
+    p.add_argument("--bookings-per-room", type=int, default=20)
+    p.add_argument("--iterations", type=int, default=100)
+    p.add_argument("--cold-repeat", type=int, default=5)
+    p.add_argument("--threads", type=int, default=8, help="Threads (db methods) or concurrent calls (tools)")
+    p.set_defaults(func=bench_suite)
+
+    p = sub.add_parser("compare", help=bench_compare.__doc__)
+    p.add_argument("baseline_file")
+    p.add_argument("current_file")
+    p.set_defaults(func=bench_compare)
+
+    p = sub.add_parser("query-plans", help=bench_query_plans.__doc__)
+    p.add_argument("--rooms", type=int, default=50000)
+    p.add_argument("--bookings", type=int, default=5000000)
+    p.add_argument("--iterations", type=int, default=50)
+    p.set_defaults(func=bench_query_plans)
+
+    p = sub.add_parser("import-time", help=bench_import_time.__doc__)
+    p.add_argument("--modules", nargs="+", default=["dbdriver", "api", "agent"])
+    p.add_argument("--preload", nargs="*", default=["livekit.agents", "livekit.plugins.google", "livekit.plugins.silero",
+                                                    "livekit.plugins.deepgram", "livekit.plugins.elevenlabs"],
+                   help="Framework modules imported before timing, so only the app's own cost is measured")
+    p.add_argument("--budget-ms", type=float, default=1000)
+    p.add_argument("--repeat", type=int, default=3)
+    p.set_defaults(func=bench_import_time)
+
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+    results = args.func(args)
+    _print_table(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"meta": _run_metadata(args), "results": results}, f, indent=2)
+    if args.baseline:
+        _report_regressions(_compare(_load_results(args.baseline), results, args.metric, args.threshold_pct),
+                            args.threshold_pct)
+
+
+if __name__ == "__main__":
+    main()
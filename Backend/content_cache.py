@@ -0,0 +1,283 @@
+"""
+Content-addressed cache for meeting ingestion.
+
+Two tables in meeting.db, both bounded and evicted least recently used:
+
+- `extracted_text_cache` maps the SHA-256 of a file's bytes to the text
+  extracted from it, so the same PDF uploaded again (under any name, or
+  regenerated byte-for-byte) skips extraction.
+- `passage_embedding_cache` maps the SHA-256 of the model name and a
+  passage's normalized text (NFKC, whitespace collapsed) to its embedding,
+  so content seen before, in whole or in part, is not encoded again.
+
+Keying embeddings by passage rather than by document means a re-uploaded
+file hits for every passage, and an edited one only pays for the passages
+that changed. Hits and misses are counted for `stats()`.
+
+Recency is tracked to within `touch_interval` seconds: a hit only rewrites
+`last_used` when it is older than that, so a fully cached re-ingest reads
+the cache without taking the write lock at all.
+
+`QueryEmbeddingCache` is the in-memory counterpart for searches: a small
+LRU of recent queries, since voice users repeat and rephrase the same
+questions and encoding the query is most of a search over a small corpus.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from vectors import from_blob, to_blob
+
+logger = logging.getLogger(__name__)
+
+CONTENT_CACHE_DDL = [
+    '''
+    CREATE TABLE IF NOT EXISTS extracted_text_cache (
+        file_hash TEXT PRIMARY KEY,
+        content TEXT NOT NULL,
+        last_used REAL NOT NULL
+    )
+    ''',
+    "CREATE INDEX IF NOT EXISTS idx_extracted_text_cache_last_used ON extracted_text_cache (last_used)",
+    '''
+    CREATE TABLE IF NOT EXISTS passage_embedding_cache (
+        text_hash TEXT PRIMARY KEY,
+        embedding BLOB NOT NULL,
+        embedding_dim INTEGER NOT NULL,
+        last_used REAL NOT NULL
+    )
+    ''',
+    "CREATE INDEX IF NOT EXISTS idx_passage_embedding_cache_last_used ON passage_embedding_cache (last_used)",
+]
+
+SELECT_CACHED_TEXT_SQL = "SELECT content, last_used FROM extracted_text_cache WHERE file_hash = ?"
+
+TOUCH_CACHED_TEXT_SQL = "UPDATE extracted_text_cache SET last_used = ? WHERE file_hash = ?"
+
+UPSERT_CACHED_TEXT_SQL = '''
+    INSERT INTO extracted_text_cache (file_hash, content, last_used) VALUES (?, ?, ?)
+    ON CONFLICT (file_hash) DO UPDATE SET content = excluded.content, last_used = excluded.last_used
+'''
+
+# One lookup for a whole batch of passage hashes; last_used tells embed() which hits need touching
+SELECT_CACHED_EMBEDDINGS_SQL = '''
+    SELECT text_hash, embedding, embedding_dim, last_used
+    FROM passage_embedding_cache
+    WHERE text_hash IN (SELECT value FROM json_each(?))
+'''
+
+TOUCH_CACHED_EMBEDDINGS_SQL = '''
+    UPDATE passage_embedding_cache SET last_used = ?
+    WHERE text_hash IN (SELECT value FROM json_each(?))
+'''
+
+INSERT_CACHED_EMBEDDING_SQL = '''
+    INSERT OR IGNORE INTO passage_embedding_cache (text_hash, embedding, embedding_dim, last_used)
+    VALUES (?, ?, ?, ?)
+'''
+
+# Deletes the least recently used rows beyond the limit passed as ?
+EVICT_TEXTS_SQL = '''
+    DELETE FROM extracted_text_cache WHERE file_hash IN (
+        SELECT file_hash FROM extracted_text_cache ORDER BY last_used
+        LIMIT max(0, (SELECT COUNT(*) FROM extracted_text_cache) - ?)
+    )
+'''
+
+EVICT_EMBEDDINGS_SQL = '''
+    DELETE FROM passage_embedding_cache WHERE text_hash IN (
+        SELECT text_hash FROM passage_embedding_cache ORDER BY last_used
+        LIMIT max(0, (SELECT COUNT(*) FROM passage_embedding_cache) - ?)
+    )
+'''
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 of a file's bytes, read in chunks"""
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def normalize_text(text: str) -> str:
+    """NFKC with runs of whitespace collapsed to one space, so layout changes do not miss"""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def passage_key(model_name: str, text: str) -> str:
+    return hashlib.sha256(f"{model_name}\0{normalize_text(text)}".encode()).hexdigest()
+
+
+class ContentCache:
+    """Extracted-text and passage-embedding cache in the meeting database's two cache tables"""
+
+    def __init__(self, pool, model_name: str, max_texts: int = 512, max_embeddings: int = 50000,
+                 touch_interval: float = 3600.0):
+        self.pool = pool
+        self.model_name = model_name
+        self.max_texts = max_texts
+        self.max_embeddings = max_embeddings
+        self.touch_interval = touch_interval
+        self._lock = threading.Lock()
+        self.text_hits = 0
+        self.text_misses = 0
+        self.embedding_hits = 0
+        self.embedding_misses = 0
+
+    def get_text(self, file_hash: str) -> Optional[str]:
+        """Text extracted earlier from a file with these bytes, or None"""
+        conn = self.pool.connection()
+        row = conn.execute(SELECT_CACHED_TEXT_SQL, (file_hash,)).fetchone()
+        with self._lock:
+            if row:
+                self.text_hits += 1
+            else:
+                self.text_misses += 1
+        if row:
+            now = time.time()
+            if now - row[1] > self.touch_interval:
+                conn.execute(TOUCH_CACHED_TEXT_SQL, (now, file_hash))
+            return row[0]
+        return None
+
+    def put_text(self, file_hash: str, content: str):
+        with self.pool.transaction(immediate=True) as cursor:
+            cursor.execute(UPSERT_CACHED_TEXT_SQL, (file_hash, content, time.time()))
+            cursor.execute(EVICT_TEXTS_SQL, (self.max_texts,))
+
+    def embed(self, texts: List[str], encode: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """(len(texts), dim) embeddings; only texts not in the cache are passed to `encode`, once each"""
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        keys = [passage_key(self.model_name, text) for text in texts]
+        unique_keys = list(dict.fromkeys(keys))
+        now = time.time()
+        found: Dict[str, np.ndarray] = {}
+        stale_keys = []
+        for key, blob, dim, last_used in self.pool.connection().execute(
+                SELECT_CACHED_EMBEDDINGS_SQL, (json.dumps(unique_keys),)):
+            found[key] = from_blob(blob, dim)
+            if now - last_used > self.touch_interval:
+                stale_keys.append(key)
+        missing = {key: text for key, text in zip(keys, texts) if key not in found}
+        if missing:
+            encoded = np.asarray(encode(list(missing.values())), dtype=np.float32)
+            found.update(zip(missing, encoded))
+        if missing or stale_keys:
+            self._write(missing, stale_keys, found, now)
+        with self._lock:
+            self.embedding_hits += len(keys) - len(missing)
+            self.embedding_misses += len(missing)
+        return np.stack([found[key] for key in keys])
+
+    def _write(self, missing: Dict[str, str], stale_keys: List[str], found: Dict[str, np.ndarray], now: float):
+        with self.pool.transaction(immediate=True) as cursor:
+            if stale_keys:
+                cursor.execute(TOUCH_CACHED_EMBEDDINGS_SQL, (now, json.dumps(stale_keys)))
+            if missing:
+                cursor.executemany(INSERT_CACHED_EMBEDDING_SQL, (
+                    (key, to_blob(found[key]), len(found[key]), now) for key in missing))
+                cursor.execute(EVICT_EMBEDDINGS_SQL, (self.max_embeddings,))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            texts = self.text_hits + self.text_misses
+            embeddings = self.embedding_hits + self.embedding_misses
+            return {
+                'text_hits': self.text_hits,
+                'text_misses': self.text_misses,
+                'text_hit_rate': self.text_hits / texts if texts else 0.0,
+                'embedding_hits': self.embedding_hits,
+                'embedding_misses': self.embedding_misses,
+                'embedding_hit_rate': self.embedding_hits / embeddings if embeddings else 0.0,
+            }
+
+
+class QueryEmbeddingCache:
+    """Bounded LRU of normalized query text -> query embedding, with a time to live.
+
+    Entries belong to the model object that encoded them: a call with a
+    different model (reloaded, or another backend) empties the cache
+    first, so a query is never answered with another model's vector.
+    `max_entries=0` disables caching. Returned arrays are read-only.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: Optional[float] = 3600.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, np.ndarray]]" = OrderedDict()
+        self._model = None
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _lookup(self, model, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            if model is not self._model:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self._model = model
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl_seconds is not None and self._clock() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def get_or_encode(self, query: str, model, encode: Optional[Callable[[str], np.ndarray]] = None) -> np.ndarray:
+        """Embedding of `query` from `model`, encoding only on a miss, with `encode` if given"""
+        key = normalize_text(query)
+        embedding = self._lookup(model, key)
+        if embedding is not None:
+            return embedding
+        # Encode outside the lock; two threads missing on the same query both encode
+        embedding = np.array((encode or model.encode)(query), dtype=np.float32)
+        embedding.setflags(write=False)
+        if self.max_entries <= 0:
+            return embedding
+        with self._lock:
+            if model is self._model:
+                self._entries[key] = (self._clock(), embedding)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return embedding
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'expirations': self.expirations,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'size': len(self._entries),
+            }
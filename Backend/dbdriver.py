@@ -1,70 +1,616 @@
+import asyncio
+import functools
+import json
 import sqlite3
-import pandas as pd
 import logging
-import pickle
 import numpy as np
 import os
-from typing import List, Dict, Optional, Tuple
-from datetime import datetime
-from sentence_transformers import SentenceTransformer
-import pdfplumber
+import random
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Iterable, Iterator, List, Dict, Optional, Tuple
+import analytics
+import embeddings
+from ann import IVFIndex, IVFParams
+from availability import OccupancyCalendar, parse_stay
+from content_cache import CONTENT_CACHE_DDL, ContentCache, QueryEmbeddingCache, file_digest
+from discounts import DiscountRules
+from excel_export import write_workbook
+from keyword_search import KEYWORD_SEARCH_DDL, fuse_scores, keyword_candidates
+from passages import split_passages
+from pricing import PricingEngine
+from records import BookedRoom, DailyStats, DiscountRule, PriceQuote, Room, RoomQuote, RoomStatus, RoomTypeSummary, RoomTypeTotals, rows_as
+from vectors import VectorIndex, from_blobs, migrate_pickled_embeddings, normalize_rows, to_blob
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Statements are kept as module-level constants so every call passes the exact
+# same SQL text and hits the per-connection prepared-statement cache.
+SELECT_AVAILABLE_ROOMS_SQL = '''
+    SELECT room_id, room_number, room_type, price_min, price_max
+    FROM rooms 
+    WHERE room_type = ? AND is_occupied = FALSE
+'''
+
+SELECT_ROOM_TYPES_SQL = '''
+    SELECT room_type, 
+           COUNT(*) as total_rooms,
+           SUM(CASE WHEN is_occupied = FALSE THEN 1 ELSE 0 END) as available_rooms,
+           MIN(price_min) as min_price,
+           MAX(price_max) as max_price
+    FROM rooms 
+    GROUP BY room_type
+'''
+
+SELECT_ROOM_FOR_BOOKING_SQL = '''
+    SELECT room_type, price_min, price_max, is_occupied
+    FROM rooms WHERE room_id = ?
+'''
+
+CLAIM_ROOM_SQL = '''
+    UPDATE rooms 
+    SET is_occupied = TRUE, 
+        guest_name = ?, 
+        check_in_date = ?, 
+        check_out_date = ?,
+        special_occasion = ?,
+        discount_percentage = ?
+    WHERE room_id = ? AND is_occupied = FALSE
+'''
+
+# Dated stays: the room is claimed only if no booking overlaps [check_in, check_out),
+# i.e. none starts before the stay ends and ends after it starts
+CLAIM_ROOM_FOR_DATES_SQL = '''
+    UPDATE rooms 
+    SET is_occupied = TRUE, 
+        guest_name = ?, 
+        check_in_date = ?, 
+        check_out_date = ?,
+        special_occasion = ?,
+        discount_percentage = ?
+    WHERE room_id = ? AND NOT EXISTS (
+        SELECT 1 FROM bookings
+        WHERE bookings.room_id = rooms.room_id AND bookings.check_in_date < ? AND bookings.check_out_date > ?
+    )
+'''
+
+INSERT_BOOKING_SQL = '''
+    INSERT INTO bookings (room_id, guest_name, check_in_date, check_out_date, 
+                        total_amount, discount_amount, special_occasion)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+
+SELECT_ROOMS_TO_CLAIM_SQL = '''
+    SELECT room_id, room_number, room_type, price_min, price_max, is_occupied
+    FROM rooms
+    WHERE room_type = ? AND is_occupied = FALSE
+    ORDER BY room_number
+    LIMIT ?
+'''
+
+SELECT_ROOMS_TO_CLAIM_FOR_DATES_SQL = '''
+    SELECT room_id, room_number, room_type, price_min, price_max, is_occupied
+    FROM rooms
+    WHERE room_type = ? AND NOT EXISTS (
+        SELECT 1 FROM bookings
+        WHERE bookings.room_id = rooms.room_id AND bookings.check_in_date < ? AND bookings.check_out_date > ?
+    )
+    ORDER BY room_number
+    LIMIT ?
+'''
+
+SELECT_ROOM_STATUS_SQL = '''
+    SELECT room_id, room_number, room_type, price_min, price_max, 
+           is_occupied, guest_name, check_in_date, check_out_date, 
+           special_occasion, discount_percentage
+    FROM rooms WHERE room_id = ?
+'''
+
+SELECT_ROOMS_VERSION_SQL = "SELECT version FROM data_versions WHERE name = 'rooms'"
+
+# Every change to a room's type, price band or occupancy bumps the 'rooms'
+# version, whichever process or tool made it. Caches compare against it.
+DATA_VERSION_DDL = [
+    '''
+    CREATE TABLE IF NOT EXISTS data_versions (
+        name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    )
+    ''',
+    "INSERT OR IGNORE INTO data_versions (name, version) VALUES ('rooms', 0)",
+    '''
+    CREATE TRIGGER IF NOT EXISTS rooms_version_on_insert AFTER INSERT ON rooms
+    BEGIN
+        UPDATE data_versions SET version = version + 1 WHERE name = 'rooms';
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS rooms_version_on_update
+    AFTER UPDATE OF room_type, price_min, price_max, is_occupied ON rooms
+    BEGIN
+        UPDATE data_versions SET version = version + 1 WHERE name = 'rooms';
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS rooms_version_on_delete AFTER DELETE ON rooms
+    BEGIN
+        UPDATE data_versions SET version = version + 1 WHERE name = 'rooms';
+    END
+    ''',
+    # 'room_set' changes when rooms are added, removed or re-described, and
+    # 'bookings_rewrite' when an existing booking is edited or deleted. New
+    # bookings are not counted; the occupancy calendar reads them by booking_id.
+    "INSERT OR IGNORE INTO data_versions (name, version) VALUES ('room_set', 0)",
+    "INSERT OR IGNORE INTO data_versions (name, version) VALUES ('bookings_rewrite', 0)",
+    '''
+    CREATE TRIGGER IF NOT EXISTS room_set_version_on_insert AFTER INSERT ON rooms
+    BEGIN
+        UPDATE data_versions SET version = version + 1 WHERE name = 'room_set';
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS room_set_version_on_update
+    AFTER UPDATE OF room_number, room_type, price_min, price_max ON rooms
+    BEGIN
+        UPDATE data_versions SET version = version + 1 WHERE name = 'room_set';
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS room_set_version_on_delete AFTER DELETE ON rooms
+    BEGIN
+        UPDATE data_versions SET version = version + 1 WHERE name = 'room_set';
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS bookings_rewrite_version_on_update
+    AFTER UPDATE OF room_id, check_in_date, check_out_date ON bookings
+    BEGIN
+        UPDATE data_versions SET version = version + 1 WHERE name = 'bookings_rewrite';
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS bookings_rewrite_version_on_delete AFTER DELETE ON bookings
+    BEGIN
+        UPDATE data_versions SET version = version + 1 WHERE name = 'bookings_rewrite';
+    END
+    ''',
+]
+
+# Versioned schema migrations. Entry N upgrades a database from
+# user_version N to N + 1; PRAGMA user_version records how far it has got.
+# Steps are SQL strings or callables taking the migration's cursor.
+SCHEMA_MIGRATIONS = [
+    # 1: secondary indexes
+    [
+        # Covers get_available_rooms_by_type (room_type, is_occupied) and the
+        # per-type GROUP BY aggregate without touching the table
+        '''
+        CREATE INDEX IF NOT EXISTS idx_rooms_type_occupied
+        ON rooms (room_type, is_occupied, price_min, price_max, room_number)
+        ''',
+        # Joins and per-room lookups from bookings to rooms
+        "CREATE INDEX IF NOT EXISTS idx_bookings_room_id ON bookings (room_id, check_in_date, check_out_date)",
+    ],
+    # 2: occasion discount rules (discounts.py), seeded with the percentages
+    # that used to be hard-coded, and a version row for the compiled matcher
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS discount_rules (
+            rule_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            keyword TEXT UNIQUE NOT NULL,
+            label TEXT NOT NULL,
+            discount_percentage REAL NOT NULL,
+            priority INTEGER NOT NULL,
+            active BOOLEAN DEFAULT TRUE
+        )
+        ''',
+        '''
+        INSERT OR IGNORE INTO discount_rules (keyword, label, discount_percentage, priority) VALUES
+            ('honeymoon', 'Honeymoon', 15, 1),
+            ('birthday', 'Birthday', 10, 2),
+            ('anniversary', 'Anniversary', 12, 3),
+            ('wedding', 'Wedding', 20, 4),
+            ('special', 'Special celebrations', 8, 5),
+            ('celebration', 'Special celebrations', 8, 5)
+        ''',
+        "INSERT OR IGNORE INTO data_versions (name, version) VALUES ('discount_rules', 0)",
+        '''
+        CREATE TRIGGER IF NOT EXISTS discount_rules_version_on_insert AFTER INSERT ON discount_rules
+        BEGIN
+            UPDATE data_versions SET version = version + 1 WHERE name = 'discount_rules';
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS discount_rules_version_on_update AFTER UPDATE ON discount_rules
+        BEGIN
+            UPDATE data_versions SET version = version + 1 WHERE name = 'discount_rules';
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS discount_rules_version_on_delete AFTER DELETE ON discount_rules
+        BEGIN
+            UPDATE data_versions SET version = version + 1 WHERE name = 'discount_rules';
+        END
+        ''',
+    ],
+    # 3: materialized daily and all-time booking aggregates (analytics.py),
+    # backfilled from existing bookings
+    analytics.ANALYTICS_DDL + [analytics.rebuild],
+]
+
+# Same scheme for meeting.db
+MEETING_SCHEMA_MIGRATIONS = [
+    # 1: float32 embedding BLOBs with their dimension (vectors.py) instead of pickles
+    [
+        "ALTER TABLE meeting_files ADD COLUMN embedding_dim INTEGER",
+        migrate_pickled_embeddings,
+    ],
+    # 2: version row for the in-memory vector index. New files are read by
+    # file_id; edits and deletes bump the version and force a rebuild.
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS data_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+        ''',
+        "INSERT OR IGNORE INTO data_versions (name, version) VALUES ('meeting_files_rewrite', 0)",
+        '''
+        CREATE TRIGGER IF NOT EXISTS meeting_files_version_on_update AFTER UPDATE ON meeting_files
+        BEGIN
+            UPDATE data_versions SET version = version + 1 WHERE name = 'meeting_files_rewrite';
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS meeting_files_version_on_delete AFTER DELETE ON meeting_files
+        BEGIN
+            UPDATE data_versions SET version = version + 1 WHERE name = 'meeting_files_rewrite';
+        END
+        ''',
+    ],
+    # 3: passages (passages.py), embedded one by one and indexed instead of
+    # whole files. Existing files are split and embedded on the first search;
+    # bumping the version drops any saved index keyed by file_id.
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS meeting_passages (
+            passage_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            file_id INTEGER NOT NULL REFERENCES meeting_files (file_id),
+            start_offset INTEGER NOT NULL,
+            end_offset INTEGER NOT NULL,
+            embedding BLOB NOT NULL,
+            embedding_dim INTEGER NOT NULL
+        )
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_meeting_passages_file_id ON meeting_passages (file_id)",
+        # Passages go with their file, and are re-split when its content changes
+        '''
+        CREATE TRIGGER IF NOT EXISTS meeting_files_delete_passages AFTER DELETE ON meeting_files
+        BEGIN
+            DELETE FROM meeting_passages WHERE file_id = OLD.file_id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS meeting_files_content_update_passages AFTER UPDATE OF content ON meeting_files
+        BEGIN
+            DELETE FROM meeting_passages WHERE file_id = OLD.file_id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS meeting_passages_version_on_update AFTER UPDATE ON meeting_passages
+        BEGIN
+            UPDATE data_versions SET version = version + 1 WHERE name = 'meeting_files_rewrite';
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS meeting_passages_version_on_delete AFTER DELETE ON meeting_passages
+        BEGIN
+            UPDATE data_versions SET version = version + 1 WHERE name = 'meeting_files_rewrite';
+        END
+        ''',
+        "UPDATE data_versions SET version = version + 1 WHERE name = 'meeting_files_rewrite'",
+    ],
+    # 4: content-addressed extracted-text and passage-embedding cache (content_cache.py)
+    CONTENT_CACHE_DDL,
+    # 5: FTS5 keyword index over meeting_files for hybrid search (keyword_search.py)
+    KEYWORD_SEARCH_DDL,
+]
+
+
+def apply_migrations(cursor, migrations: List[list], name: str):
+    """Apply the entries of `migrations` past the database's user_version"""
+    version = cursor.execute("PRAGMA user_version").fetchone()[0]
+    for target, statements in enumerate(migrations[version:], start=version + 1):
+        logger.info(f"Migrating {name} database schema to version {target}")
+        for statement in statements:
+            if callable(statement):
+                statement(cursor)
+            else:
+                cursor.execute(statement)
+        cursor.execute(f"PRAGMA user_version = {target}")
+
+# Retry policy for writes that hit SQLITE_BUSY even after the busy timeout:
+# exponential backoff with jitter, capped, for a fixed number of attempts.
+BUSY_RETRY_ATTEMPTS = 5
+BUSY_RETRY_BASE_DELAY = 0.01
+BUSY_RETRY_MAX_DELAY = 0.25
+
+
+def _is_busy_error(error: sqlite3.OperationalError) -> bool:
+    code = getattr(error, "sqlite_errorcode", None)
+    if code is not None:
+        return code & 0xFF in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+    return "locked" in str(error) or "busy" in str(error)
+
+
+class BookingError(Exception):
+    """A booking request that cannot be satisfied; the transaction is rolled back"""
+
+
+def retry_on_busy(fn, *args, **kwargs):
+    """Call `fn`, retrying with jittered exponential backoff while the database is busy"""
+    for attempt in range(BUSY_RETRY_ATTEMPTS):
+        try:
+            return fn(*args, **kwargs)
+        except sqlite3.OperationalError as e:
+            if not _is_busy_error(e) or attempt == BUSY_RETRY_ATTEMPTS - 1:
+                raise
+            delay = min(BUSY_RETRY_MAX_DELAY, BUSY_RETRY_BASE_DELAY * 2 ** attempt)
+            delay *= random.uniform(0.5, 1.0)
+            logger.warning(f"Database busy, retrying in {delay * 1000:.0f} ms (attempt {attempt + 1})")
+            time.sleep(delay)
+
+
+class _PooledConnection(sqlite3.Connection):
+    """sqlite3.Connection subclass so the pool can track connections weakly"""
+
+
+class ConnectionPool:
+    """Per-thread pool of long-lived SQLite connections.
+
+    Each thread gets its own connection, opened on first use and reused for
+    every later call, so the connect/close cost is paid once per thread rather
+    than once per query. Connections run in WAL mode with tuned pragmas and
+    autocommit; writes go through `transaction()`.
+    """
+
+    def __init__(self, db_path: str, synchronous: str = "NORMAL", cache_size_kb: int = 16384,
+                 mmap_size: int = 256 * 1024 * 1024, busy_timeout_ms: int = 5000,
+                 cached_statements: int = 256):
+        self.db_path = db_path
+        self.synchronous = synchronous
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._connections = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+            factory=_PooledConnection,
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        conn.execute(f"PRAGMA cache_size=-{self.cache_size_kb}")
+        conn.execute(f"PRAGMA mmap_size={self.mmap_size}")
+        conn.execute(f"PRAGMA busy_timeout={self.busy_timeout_ms}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """Return the calling thread's connection, opening it on first use"""
+        if os.getpid() != self._pid:
+            # SQLite connections must not cross a fork; start afresh in the child
+            self._local = threading.local()
+            self._connections = weakref.WeakSet()
+            self._pid = os.getpid()
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._open()
+            self._local.conn = conn
+            with self._lock:
+                self._connections.add(conn)
+            logger.debug(f"Opened pooled connection to {self.db_path} for thread {threading.get_ident()}")
+        return conn
+
+    @contextmanager
+    def transaction(self, immediate: bool = False) -> Iterator[sqlite3.Cursor]:
+        """Run the enclosed statements in one transaction on this thread's connection.
+
+        With `immediate=True` the write lock is taken up front (BEGIN IMMEDIATE),
+        so a read-then-write sequence cannot interleave with another writer.
+        """
+        conn = self.connection()
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+        try:
+            yield cursor
+            conn.commit()
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+
+    def close_all(self):
+        """Close every connection handed out by this pool"""
+        with self._lock:
+            connections = list(self._connections)
+            self._connections = weakref.WeakSet()
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+
+class InventoryCache:
+    """Write-through cache of the per-room-type aggregates from SELECT_ROOM_TYPES_SQL.
+
+    Entries are keyed by lower-cased room type, so a single type is an O(1)
+    dict lookup. Freshness is checked against the 'rooms' row of
+    data_versions, which triggers bump on every write from any process; a
+    mismatch reloads the whole table in one snapshot. Bookings made through
+    this HotelDatabase update the cache in place after commit.
+    """
+
+    def __init__(self, pool: ConnectionPool):
+        self.pool = pool
+        self._lock = threading.Lock()
+        self._by_type: Dict[str, RoomTypeSummary] = {}
+        self._version: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self.write_throughs = 0
+
+    def _reload(self):
+        with self.pool.transaction() as cursor:
+            version = cursor.execute(SELECT_ROOMS_VERSION_SQL).fetchone()[0]
+            rows = cursor.execute(SELECT_ROOM_TYPES_SQL).fetchall()
+        by_type = {row[0].lower(): RoomTypeSummary._make(row) for row in rows}
+        with self._lock:
+            if self._version is None or version >= self._version:
+                self._by_type = by_type
+                self._version = version
+
+    def _ensure_fresh(self):
+        version = self.pool.connection().execute(SELECT_ROOMS_VERSION_SQL).fetchone()[0]
+        with self._lock:
+            fresh = version == self._version
+            if fresh:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if not fresh:
+            self._reload()
+
+    def get(self, room_type: str) -> Optional[RoomTypeSummary]:
+        """Aggregates for one room type (case-insensitive), or None if unknown"""
+        self._ensure_fresh()
+        with self._lock:
+            return self._by_type.get(room_type.lower())
+
+    def all(self) -> List[RoomTypeSummary]:
+        """Aggregates for every room type"""
+        self._ensure_fresh()
+        with self._lock:
+            return list(self._by_type.values())
+
+    def record_booked(self, booked: Dict[str, int], version_after: int, claimed: Optional[int] = None):
+        """Apply a committed booking that occupied `booked[room_type]` more rooms per type.
+
+        `version_after` is the rooms version read inside the booking
+        transaction, and `claimed` the number of room rows it updated (by
+        default, the rooms it occupied). A dated claim on a room that was
+        already occupied bumps the version without freeing anything up. If
+        anything else wrote in between, the cache is simply marked stale and
+        reloaded on next use.
+        """
+        if claimed is None:
+            claimed = sum(booked.values())
+        with self._lock:
+            keys = [room_type.lower() for room_type in booked]
+            if all(key in self._by_type for key in keys) and self._version == version_after - claimed:
+                # Entries are immutable, so readers holding the old one are unaffected
+                for key, count in zip(keys, booked.values()):
+                    entry = self._by_type[key]
+                    self._by_type[key] = entry._replace(available_rooms=entry.available_rooms - count)
+                self._version = version_after
+                self.write_throughs += 1
+            else:
+                self._version = None
+
+    def invalidate(self):
+        with self._lock:
+            self._version = None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'write_throughs': self.write_throughs,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'version': self._version
+            }
+
+
 class HotelDatabase:
-    def __init__(self, db_path: str = "hotel.db"):
+    def __init__(self, db_path: str = "hotel.db", pool: Optional[ConnectionPool] = None):
         self.db_path = db_path
+        self.pool = pool or ConnectionPool(db_path)
+        self.inventory = InventoryCache(self.pool)
+        self.calendar = OccupancyCalendar(self.pool)
+        self.discounts = DiscountRules(self.pool)
+        self.pricing = PricingEngine(self.inventory, self.calendar, self.discounts.discount_for)
         self.init_database()
     
+    def close(self):
+        """Close all pooled connections"""
+        self.pool.close_all()
+    
     def init_database(self):
         """Initialize the database with tables and sample data"""
         logger.info("Initializing hotel database")
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Create rooms table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS rooms (
-                room_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                room_number INTEGER UNIQUE NOT NULL,
-                room_type TEXT NOT NULL,
-                price_min REAL NOT NULL,
-                price_max REAL NOT NULL,
-                is_occupied BOOLEAN DEFAULT FALSE,
-                guest_name TEXT,
-                check_in_date TEXT,
-                check_out_date TEXT,
-                special_occasion TEXT,
-                discount_percentage REAL DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Create bookings table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS bookings (
-                booking_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                room_id INTEGER,
-                guest_name TEXT NOT NULL,
-                check_in_date TEXT NOT NULL,
-                check_out_date TEXT NOT NULL,
-                total_amount REAL NOT NULL,
-                discount_amount REAL DEFAULT 0,
-                special_occasion TEXT,
-                booking_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (room_id) REFERENCES rooms (room_id)
-            )
-        ''')
-        
-        # Insert sample room data if table is empty
-        cursor.execute("SELECT COUNT(*) FROM rooms")
-        if cursor.fetchone()[0] == 0:
-            self._insert_sample_rooms(cursor)
+        # Take the write lock up front: two processes starting together would
+        # otherwise both read the schema and fail to upgrade to writers.
+        with self.pool.transaction(immediate=True) as cursor:
+            # Create rooms table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS rooms (
+                    room_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    room_number INTEGER UNIQUE NOT NULL,
+                    room_type TEXT NOT NULL,
+                    price_min REAL NOT NULL,
+                    price_max REAL NOT NULL,
+                    is_occupied BOOLEAN DEFAULT FALSE,
+                    guest_name TEXT,
+                    check_in_date TEXT,
+                    check_out_date TEXT,
+                    special_occasion TEXT,
+                    discount_percentage REAL DEFAULT 0,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Create bookings table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS bookings (
+                    booking_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    room_id INTEGER,
+                    guest_name TEXT NOT NULL,
+                    check_in_date TEXT NOT NULL,
+                    check_out_date TEXT NOT NULL,
+                    total_amount REAL NOT NULL,
+                    discount_amount REAL DEFAULT 0,
+                    special_occasion TEXT,
+                    booking_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (room_id) REFERENCES rooms (room_id)
+                )
+            ''')
+            
+            # Version counter and triggers used to invalidate the inventory cache
+            for statement in DATA_VERSION_DDL:
+                cursor.execute(statement)
+            
+            apply_migrations(cursor, SCHEMA_MIGRATIONS, "hotel")
+            
+            # Insert sample room data if table is empty
+            cursor.execute("SELECT COUNT(*) FROM rooms")
+            if cursor.fetchone()[0] == 0:
+                self._insert_sample_rooms(cursor)
         
-        conn.commit()
-        conn.close()
         logger.info("Database initialization completed")
     
     def _insert_sample_rooms(self, cursor):
@@ -93,302 +639,738 @@ class HotelDatabase:
         
         logger.info(f"Inserted {len(room_types) * 3} sample rooms")
     
-    def get_available_rooms_by_type(self, room_type: str) -> List[Dict]:
-        """Get all available rooms of a specific type"""
+    def get_available_rooms_by_type(self, room_type: str) -> List[Room]:
+        """Rooms of a type with is_occupied unset, i.e. no booking at all; for a stay use
+        get_available_rooms_for_dates, since any dated booking, however far off, sets is_occupied"""
         logger.info(f"Querying available {room_type} rooms")
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT room_id, room_number, room_type, price_min, price_max
-            FROM rooms 
-            WHERE room_type = ? AND is_occupied = FALSE
-        ''', (room_type,))
+        cursor = self.pool.connection().execute(SELECT_AVAILABLE_ROOMS_SQL, (room_type,))
+        rooms = rows_as(Room, cursor)
         
-        rooms = []
-        for row in cursor.fetchall():
-            rooms.append({
-                'room_id': row[0],
-                'room_number': row[1],
-                'room_type': row[2],
-                'price_min': row[3],
-                'price_max': row[4]
-            })
-        
-        conn.close()
         logger.info(f"Found {len(rooms)} available {room_type} rooms")
         return rooms
     
-    def get_all_room_types(self) -> List[Dict]:
+    def get_available_rooms_for_dates(self, room_type: str, check_in_date: str,
+                                      check_out_date: str) -> List[Room]:
+        """Get rooms of a type that are free for every night from check-in to check-out"""
+        logger.info(f"Querying {room_type} rooms free from {check_in_date} to {check_out_date}")
+        rooms = self.calendar.available_rooms(room_type, check_in_date, check_out_date)
+        logger.info(f"Found {len(rooms)} {room_type} rooms free for those dates")
+        return rooms
+    
+    def get_all_room_types(self) -> List[RoomTypeSummary]:
         """Get all available room types with counts and price ranges"""
         logger.info("Querying all room types")
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT room_type, 
-                   COUNT(*) as total_rooms,
-                   SUM(CASE WHEN is_occupied = FALSE THEN 1 ELSE 0 END) as available_rooms,
-                   MIN(price_min) as min_price,
-                   MAX(price_max) as max_price
-            FROM rooms 
-            GROUP BY room_type
-        ''')
-        
-        room_types = []
-        for row in cursor.fetchall():
-            room_types.append({
-                'room_type': row[0],
-                'total_rooms': row[1],
-                'available_rooms': row[2],
-                'min_price': row[3],
-                'max_price': row[4]
-            })
-        
-        conn.close()
+        room_types = self.inventory.all()
         logger.info(f"Found {len(room_types)} room types")
         return room_types
     
+    def get_room_type(self, room_type: str) -> Optional[RoomTypeSummary]:
+        """Get counts and price range for one room type (case-insensitive)"""
+        logger.info(f"Querying room type {room_type}")
+        return self.inventory.get(room_type)
+    
+    def quote_room_types(self, check_in_date: str = None, check_out_date: str = None,
+                         special_occasion: str = None) -> List[PriceQuote]:
+        """Current price of every room type, optionally for a stay and an occasion"""
+        return self.pricing.quote_types(check_in_date, check_out_date, special_occasion)
+    
+    def quote_room_type(self, room_type: str, check_in_date: str = None, check_out_date: str = None,
+                        special_occasion: str = None) -> Optional[PriceQuote]:
+        """Current price of one room type (case-insensitive), or None if unknown"""
+        return self.pricing.quote_type(room_type, check_in_date, check_out_date, special_occasion)
+    
+    def quote_rooms(self, check_in_date: str = None, check_out_date: str = None,
+                    special_occasion: str = None) -> List[RoomQuote]:
+        """Current price of every room"""
+        return self.pricing.quote_rooms(check_in_date, check_out_date, special_occasion)
+    
+    def _booking_demand(self, check_in_date: str, check_out_date: str) -> Dict[str, float]:
+        # Bookings have never validated their dates; price unusable ones on tonight's occupancy
+        try:
+            return self.pricing.demand(check_in_date, check_out_date)
+        except ValueError:
+            return self.pricing.demand()
+    
+    def get_inventory_stats(self) -> Dict:
+        """Hit/miss counters for the room-type inventory cache"""
+        return self.inventory.stats()
+    
     def book_room(self, room_id: int, guest_name: str, check_in_date: str, 
                   check_out_date: str, special_occasion: str = None) -> Tuple[bool, str, float]:
         """Book a room and return success status, message, and final price"""
         logger.info(f"Attempting to book room {room_id} for {guest_name}")
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
         
         try:
-            # Check if room is available
-            cursor.execute('''
-                SELECT room_type, price_min, price_max, is_occupied
-                FROM rooms WHERE room_id = ?
-            ''', (room_id,))
-            
+            return retry_on_busy(self._book_room_once, room_id, guest_name, check_in_date,
+                                 check_out_date, special_occasion)
+        except Exception as e:
+            logger.error(f"Error booking room: {str(e)}")
+            return False, f"Error booking room: {str(e)}", 0
+    
+    def _book_room_once(self, room_id: int, guest_name: str, check_in_date: str,
+                        check_out_date: str, special_occasion: str = None) -> Tuple[bool, str, float]:
+        # BEGIN IMMEDIATE serialises writers up front, and the UPDATE only
+        # claims the room if it is still free, so two sessions can never both
+        # book it. A dated stay is free when no booking overlaps it, which is
+        # what check_room_availability reports; without usable dates the room
+        # must not be occupied at all. Either way the claim sets is_occupied,
+        # which therefore means "has a booking", not "occupied tonight".
+        try:
+            stay = parse_stay(check_in_date, check_out_date)
+        except ValueError as e:
+            return False, str(e), 0
+        # The bitmap turns away known clashes without taking the write lock
+        if stay and not self.calendar.room_is_free(room_id, *stay):
+            return False, "Room is already booked for those dates", 0
+        demand = self._booking_demand(check_in_date, check_out_date)
+        with self.pool.transaction(immediate=True) as cursor:
+            cursor.execute(SELECT_ROOM_FOR_BOOKING_SQL, (room_id,))
             room_data = cursor.fetchone()
             if not room_data:
                 return False, "Room not found", 0
             
-            room_type, price_min, price_max, is_occupied = room_data
-            
-            if is_occupied:
-                return False, "Room is already occupied", 0
-            
-            # Calculate discount based on special occasion
-            discount_percentage = self._calculate_discount(special_occasion)
-            base_price = price_max  # Start with max price
-            discount_amount = base_price * (discount_percentage / 100)
-            final_price = base_price - discount_amount
-            
-            # Ensure final price is within bounds
-            if final_price < price_min:
-                final_price = price_min
-                discount_amount = base_price - final_price
-                discount_percentage = (discount_amount / base_price) * 100
+            room_type, price_min, price_max, was_occupied = room_data
+            _, final_price, discount_amount, discount_percentage = self.pricing.quote(
+                price_min, price_max, demand.get(room_type.lower(), 1.0), special_occasion
+            )
             
-            # Update room status
-            cursor.execute('''
-                UPDATE rooms 
-                SET is_occupied = TRUE, 
-                    guest_name = ?, 
-                    check_in_date = ?, 
-                    check_out_date = ?,
-                    special_occasion = ?,
-                    discount_percentage = ?
-                WHERE room_id = ?
-            ''', (guest_name, check_in_date, check_out_date, special_occasion, discount_percentage, room_id))
+            # Claim the room only if it is still free
+            claim = (guest_name, check_in_date, check_out_date, special_occasion, discount_percentage, room_id)
+            if stay:
+                cursor.execute(CLAIM_ROOM_FOR_DATES_SQL, claim + (check_out_date, check_in_date))
+            else:
+                cursor.execute(CLAIM_ROOM_SQL, claim)
+            if cursor.rowcount == 0:
+                return False, "Room is already booked for those dates" if stay else "Room is already occupied", 0
             
             # Create booking record
-            cursor.execute('''
-                INSERT INTO bookings (room_id, guest_name, check_in_date, check_out_date, 
-                                    total_amount, discount_amount, special_occasion)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (room_id, guest_name, check_in_date, check_out_date, final_price, discount_amount, special_occasion))
-            
-            conn.commit()
-            logger.info(f"Successfully booked room {room_id} for {guest_name} at ${final_price:.2f}")
-            
-            return True, f"Room {room_id} booked successfully! Final price: ${final_price:.2f}", final_price
-            
-        except Exception as e:
-            conn.rollback()
-            logger.error(f"Error booking room: {str(e)}")
-            return False, f"Error booking room: {str(e)}", 0
-        finally:
-            conn.close()
-    
-    def _calculate_discount(self, special_occasion: str) -> float:
-        """Calculate discount percentage based on special occasion"""
-        if not special_occasion:
-            return 0
+            cursor.execute(INSERT_BOOKING_SQL, (
+                room_id, guest_name, check_in_date, check_out_date, final_price, discount_amount, special_occasion
+            ))
+            booking_id = cursor.lastrowid
+            analytics.apply_bookings(cursor, booking_id, booking_id)
+            rooms_version = cursor.execute(SELECT_ROOMS_VERSION_SQL).fetchone()[0]
         
-        occasion_lower = special_occasion.lower()
-        if 'honeymoon' in occasion_lower:
-            return 15.0
-        elif 'birthday' in occasion_lower:
-            return 10.0
-        elif 'anniversary' in occasion_lower:
-            return 12.0
-        elif 'wedding' in occasion_lower:
-            return 20.0
-        elif 'special' in occasion_lower or 'celebration' in occasion_lower:
-            return 8.0
+        self.inventory.record_booked({room_type: 0 if was_occupied else 1}, rooms_version, claimed=1)
+        self.calendar.record_booking(booking_id, room_id, check_in_date, check_out_date)
+        logger.info(f"Successfully booked room {room_id} for {guest_name} at ${final_price:.2f}")
         
-        return 0
+        return True, f"Room {room_id} booked successfully! Final price: ${final_price:.2f}", final_price
     
-    def export_to_excel(self, filename: str = "hotel_bookings.xlsx"):
-        """Export all booking data to Excel file"""
-        logger.info(f"Exporting data to {filename}")
-        conn = sqlite3.connect(self.db_path)
+    def book_rooms(self, room_requests: Dict[str, int], guest_name: str, check_in_date: str,
+                   check_out_date: str, special_occasion: str = None) -> Tuple[bool, str, List[BookedRoom]]:
+        """Book several rooms of one or more types in a single all-or-nothing transaction.
+
+        `room_requests` maps room type to the number of rooms wanted. Returns
+        success status, message, and the booked rooms with their prices.
+        """
+        logger.info(f"Attempting group booking {room_requests} for {guest_name}")
         
-        # Export rooms data
-        rooms_df = pd.read_sql_query('''
-            SELECT room_number, room_type, price_min, price_max, is_occupied, 
-                   guest_name, check_in_date, check_out_date, special_occasion, 
-                   discount_percentage, created_at
-            FROM rooms
-        ''', conn)
+        try:
+            return retry_on_busy(self._book_rooms_once, room_requests, guest_name, check_in_date,
+                                 check_out_date, special_occasion)
+        except BookingError as e:
+            logger.info(f"Group booking for {guest_name} not possible: {e}")
+            return False, str(e), []
+        except Exception as e:
+            logger.error(f"Error booking rooms: {str(e)}")
+            return False, f"Error booking rooms: {str(e)}", []
+    
+    def _book_rooms_once(self, room_requests: Dict[str, int], guest_name: str, check_in_date: str,
+                         check_out_date: str, special_occasion: str = None) -> Tuple[bool, str, List[BookedRoom]]:
+        if not room_requests or any(count <= 0 for count in room_requests.values()):
+            raise BookingError("Each requested room type needs a quantity of at least 1")
         
-        # Export bookings data
-        bookings_df = pd.read_sql_query('''
-            SELECT b.booking_id, r.room_number, b.guest_name, b.check_in_date, 
-                   b.check_out_date, b.total_amount, b.discount_amount, 
-                   b.special_occasion, b.booking_date
-            FROM bookings b
-            JOIN rooms r ON b.room_id = r.room_id
-        ''', conn)
+        try:
+            stay = parse_stay(check_in_date, check_out_date)
+        except ValueError as e:
+            raise BookingError(str(e))
+        demand = self._booking_demand(check_in_date, check_out_date)
+        booked = []
+        # Rooms per type that go from free to occupied; a dated stay can claim an occupied room
+        newly_occupied = {}
+        with self.pool.transaction(immediate=True) as cursor:
+            # One rules lookup for the whole group, not one per room
+            discount = self.discounts.discount_for(special_occasion)
+            for room_type, count in room_requests.items():
+                if stay:
+                    rows = cursor.execute(SELECT_ROOMS_TO_CLAIM_FOR_DATES_SQL,
+                                          (room_type, check_out_date, check_in_date, count)).fetchall()
+                else:
+                    rows = cursor.execute(SELECT_ROOMS_TO_CLAIM_SQL, (room_type, count)).fetchall()
+                if len(rows) < count:
+                    raise BookingError(f"Only {len(rows)} {room_type} rooms available, {count} requested")
+                for room_id, room_number, actual_type, price_min, price_max, was_occupied in rows:
+                    newly_occupied[actual_type] = newly_occupied.get(actual_type, 0) + (not was_occupied)
+                    _, final_price, discount_amount, discount_percentage = self.pricing.quote(
+                        price_min, price_max, demand.get(actual_type.lower(), 1.0), discount_percentage=discount
+                    )
+                    booked.append(BookedRoom(
+                        room_id, room_number, actual_type, final_price, discount_amount, discount_percentage
+                    ))
+            
+            claims = [(guest_name, check_in_date, check_out_date, special_occasion, room.discount_percentage, room.room_id)
+                      for room in booked]
+            if stay:
+                cursor.executemany(CLAIM_ROOM_FOR_DATES_SQL, [claim + (check_out_date, check_in_date) for claim in claims])
+            else:
+                cursor.executemany(CLAIM_ROOM_SQL, claims)
+            if cursor.rowcount != len(booked):
+                raise BookingError("Some of the selected rooms were booked by someone else")
+            
+            cursor.executemany(INSERT_BOOKING_SQL, [
+                (room.room_id, guest_name, check_in_date, check_out_date,
+                 room.final_price, room.discount_amount, special_occasion)
+                for room in booked
+            ])
+            # AUTOINCREMENT ids inside one write transaction are consecutive
+            last_booking_id = cursor.execute("SELECT last_insert_rowid()").fetchone()[0]
+            analytics.apply_bookings(cursor, last_booking_id - len(booked) + 1, last_booking_id)
+            rooms_version = cursor.execute(SELECT_ROOMS_VERSION_SQL).fetchone()[0]
         
-        conn.close()
+        self.inventory.record_booked(newly_occupied, rooms_version, claimed=len(booked))
         
-        # Write to Excel with multiple sheets
-        with pd.ExcelWriter(filename, engine='openpyxl') as writer:
-            rooms_df.to_excel(writer, sheet_name='Rooms', index=False)
-            bookings_df.to_excel(writer, sheet_name='Bookings', index=False)
+        total_price = sum(room.final_price for room in booked)
+        logger.info(f"Successfully booked {len(booked)} rooms for {guest_name} at ${total_price:.2f}")
         
+        return True, f"{len(booked)} rooms booked successfully! Total price: ${total_price:.2f}", booked
+    
+    def get_daily_stats(self, start_date: str, end_date: str, room_type: str = None) -> List[DailyStats]:
+        """Room-nights booked, occupancy, revenue and discount per day and room type.
+
+        Read from the materialized daily table, so the cost depends on the
+        date range, not on the number of bookings.
+        """
+        total_rooms = {summary.room_type.lower(): summary.total_rooms for summary in self.inventory.all()}
+        return analytics.daily_stats(self.pool.connection(), start_date, end_date, total_rooms, room_type)
+    
+    def get_booking_totals(self) -> List[RoomTypeTotals]:
+        """All-time bookings, revenue and discount per room type"""
+        return analytics.totals(self.pool.connection())
+    
+    def rebuild_analytics(self):
+        """Recompute the analytics tables from the bookings table, e.g. after editing bookings by hand"""
+        with self.pool.transaction(immediate=True) as cursor:
+            analytics.rebuild(cursor)
+    
+    def get_discount_rules(self) -> List[DiscountRule]:
+        """Active occasion discount rules in priority order"""
+        return self.discounts.rules()
+    
+    def export_to_excel(self, filename: str = "hotel_bookings.xlsx"):
+        """Export all booking data to Excel file"""
+        logger.info(f"Exporting data to {filename}")
+        write_workbook(self.pool.connection(), filename)
         logger.info(f"Data exported successfully to {filename}")
     
-    def get_room_status(self, room_id: int) -> Optional[Dict]:
+    def get_room_status(self, room_id: int) -> Optional[RoomStatus]:
         """Get current status of a specific room"""
         logger.info(f"Querying status for room {room_id}")
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT room_id, room_number, room_type, price_min, price_max, 
-                   is_occupied, guest_name, check_in_date, check_out_date, 
-                   special_occasion, discount_percentage
-            FROM rooms WHERE room_id = ?
-        ''', (room_id,))
-        
-        row = cursor.fetchone()
-        conn.close()
-        
-        if row:
-            return {
-                'room_id': row[0],
-                'room_number': row[1],
-                'room_type': row[2],
-                'price_min': row[3],
-                'price_max': row[4],
-                'is_occupied': bool(row[5]),
-                'guest_name': row[6],
-                'check_in_date': row[7],
-                'check_out_date': row[8],
-                'special_occasion': row[9],
-                'discount_percentage': row[10]
-            }
-        
-        return None 
+        row = self.pool.connection().execute(SELECT_ROOM_STATUS_SQL, (room_id,)).fetchone()
+        return RoomStatus.from_row(row) if row else None
     
+class AsyncHotelDatabase:
+    """Awaitable facade over HotelDatabase for use from the agent's event loop.
+
+    Every call runs on a small, bounded thread pool, so a slow query or an
+    Excel export never blocks the loop that also drives STT, TTS and VAD.
+    Each worker thread gets its own pooled connection.
+    """
+
+    def __init__(self, db: HotelDatabase, max_workers: int = 4):
+        self.db = db
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hotel-db")
+
+    async def _run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+    async def get_available_rooms_by_type(self, room_type: str) -> List[Room]:
+        return await self._run(self.db.get_available_rooms_by_type, room_type)
+
+    async def get_available_rooms_for_dates(self, room_type: str, check_in_date: str,
+                                            check_out_date: str) -> List[Room]:
+        return await self._run(self.db.get_available_rooms_for_dates, room_type,
+                               check_in_date, check_out_date)
+
+    async def get_all_room_types(self) -> List[RoomTypeSummary]:
+        return await self._run(self.db.get_all_room_types)
+
+    async def book_room(self, room_id: int, guest_name: str, check_in_date: str,
+                        check_out_date: str, special_occasion: str = None) -> Tuple[bool, str, float]:
+        return await self._run(self.db.book_room, room_id, guest_name, check_in_date,
+                               check_out_date, special_occasion)
+
+    async def book_rooms(self, room_requests: Dict[str, int], guest_name: str, check_in_date: str,
+                         check_out_date: str, special_occasion: str = None) -> Tuple[bool, str, List[BookedRoom]]:
+        return await self._run(self.db.book_rooms, room_requests, guest_name, check_in_date,
+                               check_out_date, special_occasion)
+
+    async def get_room_type(self, room_type: str) -> Optional[RoomTypeSummary]:
+        return await self._run(self.db.get_room_type, room_type)
+
+    async def quote_room_types(self, check_in_date: str = None, check_out_date: str = None,
+                               special_occasion: str = None) -> List[PriceQuote]:
+        return await self._run(self.db.quote_room_types, check_in_date, check_out_date, special_occasion)
+
+    async def quote_room_type(self, room_type: str, check_in_date: str = None, check_out_date: str = None,
+                              special_occasion: str = None) -> Optional[PriceQuote]:
+        return await self._run(self.db.quote_room_type, room_type, check_in_date, check_out_date,
+                               special_occasion)
+
+    async def get_daily_stats(self, start_date: str, end_date: str, room_type: str = None) -> List[DailyStats]:
+        return await self._run(self.db.get_daily_stats, start_date, end_date, room_type)
+
+    async def get_booking_totals(self) -> List[RoomTypeTotals]:
+        return await self._run(self.db.get_booking_totals)
+
+    async def get_discount_rules(self) -> List[DiscountRule]:
+        return await self._run(self.db.get_discount_rules)
+
+    async def get_room_status(self, room_id: int) -> Optional[RoomStatus]:
+        return await self._run(self.db.get_room_status, room_id)
+
+    async def export_to_excel(self, filename: str = "hotel_bookings.xlsx"):
+        return await self._run(self.db.export_to_excel, filename)
+
+    def close(self):
+        """Wait for in-flight calls, then close the worker pool and its connections"""
+        self._executor.shutdown(wait=True)
+        self.db.close()
+
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+INSERT_MEETING_FILE_SQL = '''
+    INSERT INTO meeting_files (filename, content, embedding, embedding_dim) VALUES (?, ?, ?, ?)
+'''
+
+INSERT_MEETING_PASSAGE_SQL = '''
+    INSERT INTO meeting_passages (file_id, start_offset, end_offset, embedding, embedding_dim)
+    VALUES (?, ?, ?, ?, ?)
+'''
+
+SELECT_PASSAGE_IDS_SQL = "SELECT passage_id FROM meeting_passages WHERE file_id = ? ORDER BY passage_id"
+
+SELECT_FILE_IDS_BY_NAME_SQL = '''
+    SELECT filename, file_id
+    FROM meeting_files
+    WHERE filename IN (SELECT value FROM json_each(?))
+'''
+
+SELECT_PASSAGE_IDS_FOR_FILES_SQL = '''
+    SELECT passage_id
+    FROM meeting_passages
+    WHERE file_id IN (SELECT value FROM json_each(?))
+    ORDER BY passage_id
+'''
+
+SELECT_MEETING_EMBEDDINGS_SINCE_SQL = '''
+    SELECT passage_id, embedding, embedding_dim
+    FROM meeting_passages
+    WHERE passage_id > ?
+    ORDER BY passage_id
+'''
+
+# Ids are passed as one JSON array so the statement text never changes.
+# Only the passage's slice of the file content is returned.
+SELECT_MEETING_PASSAGES_BY_ID_SQL = '''
+    SELECT p.passage_id, f.filename, substr(f.content, p.start_offset + 1, p.end_offset - p.start_offset),
+           f.created_at, p.start_offset, p.end_offset
+    FROM meeting_passages p
+    JOIN meeting_files f ON f.file_id = p.file_id
+    WHERE p.passage_id IN (SELECT value FROM json_each(?))
+'''
+
+SELECT_PASSAGE_EMBEDDINGS_FOR_FILES_SQL = '''
+    SELECT passage_id, file_id, embedding, embedding_dim
+    FROM meeting_passages
+    WHERE file_id IN (SELECT value FROM json_each(?))
+'''
+
+SELECT_FILES_WITHOUT_PASSAGES_SQL = '''
+    SELECT file_id, content
+    FROM meeting_files f
+    WHERE NOT EXISTS (SELECT 1 FROM meeting_passages p WHERE p.file_id = f.file_id)
+'''
+
+SELECT_MEETING_VERSION_SQL = "SELECT version FROM data_versions WHERE name = 'meeting_files_rewrite'"
+
+
 class MeetingDatabase:
-    def __init__(self, db_path: str = "meeting.db"):
+    """Meeting transcripts and PDFs, searchable by meaning passage by passage.
+
+    Each file is split into overlapping passages of about `passage_chars`
+    characters (passages.py), embedded in batches and stored with their
+    offsets in `meeting_passages`; searches return the best passages with
+    their parent file. The file row keeps the mean of its passage
+    embeddings.
+
+    `index` holds every passage embedding in memory. It is loaded on the
+    first search, extended in place by `add_file` and by reading rows past
+    the last seen passage_id (so files added by other processes are picked
+    up), and rebuilt when the 'meeting_files_rewrite' version changes.
+
+    By default it is an exact `VectorIndex`. Passing `ann` switches to an
+    approximate `ann.IVFIndex` for large corpora; it is saved to
+    `index_path` after a full load and on `close()`, and reused on the next
+    start if the table has not been rewritten since.
+
+    `content_cache` remembers the text extracted from each PDF and the
+    embedding of each passage by content hash, so content seen before,
+    under any filename, is neither extracted nor encoded again.
+    `query_cache` keeps the embeddings of recent search queries for
+    `query_cache_ttl` seconds. With `query_batch_size` above 1, queries
+    that miss it are encoded through `query_batcher`
+    (embeddings.MicroBatcher): searches that arrive while an encode is
+    running share the next one, and a lone search is encoded at once.
+    `query_batch_wait_ms` lets a batch that already has company wait that
+    long for more.
+
+    `hybrid_search` combines the FTS5 keyword index over file names and
+    contents (keyword_search.py) with the embeddings.
+    """
+
+    def __init__(self, db_path: str = "meeting.db", model_name: str = embeddings.DEFAULT_MODEL,
+                 pool: Optional[ConnectionPool] = None, ann: Optional[IVFParams] = None,
+                 index_path: Optional[str] = None, passage_chars: int = 600, passage_overlap: int = 120,
+                 encode_batch_size: int = 32, cache_texts: int = 512, cache_embeddings: int = 50000,
+                 query_cache_size: int = 1024, query_cache_ttl: Optional[float] = 3600.0,
+                 query_batch_size: int = 1, query_batch_wait_ms: float = 0.0):
         self.db_path = db_path
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+        self.model_name = model_name
+        self.passage_chars = passage_chars
+        self.passage_overlap = passage_overlap
+        self.encode_batch_size = encode_batch_size
+        self.pool = pool or ConnectionPool(db_path)
+        self.content_cache = ContentCache(self.pool, model_name, cache_texts, cache_embeddings)
+        self.query_cache = QueryEmbeddingCache(query_cache_size, query_cache_ttl)
+        self.query_batcher = (embeddings.MicroBatcher(self._encode_queries, query_batch_size, query_batch_wait_ms)
+                              if query_batch_size > 1 else None)
+        self._embedding_model = None
+        self.ann = ann
+        self.index_path = index_path or f"{db_path}.ivf.npz"
+        self.index = IVFIndex(ann) if ann else VectorIndex()
+        self._index_lock = threading.Lock()
+        self._index_version: Optional[int] = None
+        self._high_water = 0
         self.init_database()
 
+    def close(self):
+        """Stop the query batcher, save the ANN index, if any, and close all pooled connections"""
+        if self.query_batcher:
+            self.query_batcher.close()
+        if self.ann and len(self.index):
+            self.save_index()
+        self.pool.close_all()
+
+    @property
+    def embedding_model(self):
+        """The process-wide encoder for `model_name` (embeddings.py), loaded on first use"""
+        if self._embedding_model is None:
+            self._embedding_model = embeddings.get_model(self.model_name)
+        return self._embedding_model
+
+    def warmup(self):
+        """Load the embedding model and run a first encode now rather than on the first search"""
+        self.embedding_model.encode("warm up")
+
+    def _encode_queries(self, queries: List[str]) -> np.ndarray:
+        return self.embedding_model.encode(queries, batch_size=len(queries))
+
+    def _query_embedding(self, query: str) -> np.ndarray:
+        return self.query_cache.get_or_encode(
+            query, self.embedding_model, self.query_batcher.encode if self.query_batcher else None)
+
     def init_database(self):
         logger.info("Initializing meeting database")
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS meeting_files (
-                file_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                filename TEXT UNIQUE NOT NULL,
-                content TEXT NOT NULL,
-                embedding BLOB NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        cursor.execute("SELECT COUNT(*) FROM meeting_files")
-        if cursor.fetchone()[0] == 0:
-            self._insert_sample_meetings(cursor)
-        conn.commit()
-        conn.close()
+        # One transaction, so an interrupted migration leaves the old format intact
+        with self.pool.transaction(immediate=True) as cursor:
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS meeting_files (
+                    file_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    filename TEXT UNIQUE NOT NULL,
+                    content TEXT NOT NULL,
+                    embedding BLOB NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            apply_migrations(cursor, MEETING_SCHEMA_MIGRATIONS, "meeting")
+            empty = cursor.execute("SELECT COUNT(*) FROM meeting_files").fetchone()[0] == 0
+        # After the migration commits: embedding writes to the cache in its own
+        # transaction, and add_files skips names another process inserted meanwhile
+        if empty:
+            self._insert_sample_meetings()
         logger.info("Meeting database initialization completed")
 
-    def _insert_sample_meetings(self, cursor):
+    def _insert_sample_meetings(self):
         logger.info("Inserting sample meeting transcripts")
         sample_meetings = [
             ("meeting_20250101.txt", "Discussed project timeline and deliverables."),
             ("meeting_20250215.txt", "Reviewed budget and resource allocation for Q2."),
             ("meeting_20250310.txt", "Analyzed customer feedback and upcoming product improvements."),
         ]
-        for filename, content in sample_meetings:
-            embedding = self.embedding_model.encode(content)
-            embedding_blob = pickle.dumps(embedding)
-            cursor.execute(
-                "INSERT INTO meeting_files (filename, content, embedding) VALUES (?, ?, ?)",
-                (filename, content, embedding_blob)
-            )
-        logger.info(f"Inserted {len(sample_meetings)} sample meeting transcripts")
+        added = self.add_files(sample_meetings)
+        logger.info(f"Inserted {len(added)} sample meeting transcripts")
 
-    def add_file(self, filename: str, content: str) -> bool:
-        embedding = self.embedding_model.encode(content)
-        embedding_blob = pickle.dumps(embedding)
+    def _embed_documents(self, contents: List[str]) -> List[Tuple[List[Tuple[int, int]], np.ndarray]]:
+        """Passage spans and passage embeddings per document; passages not in the cache are
+        encoded in batches across documents"""
+        spans = [split_passages(content, self.passage_chars, self.passage_overlap) for content in contents]
+        texts = [content[start:end] for content, doc_spans in zip(contents, spans) for start, end in doc_spans]
+        embeddings = self.content_cache.embed(
+            texts, lambda missing: self.embedding_model.encode(missing, batch_size=self.encode_batch_size))
+        embedded = []
+        offset = 0
+        for doc_spans in spans:
+            embedded.append((doc_spans, embeddings[offset:offset + len(doc_spans)]))
+            offset += len(doc_spans)
+        return embedded
+
+    def _insert_passages(self, cursor, passages: Iterable[Tuple[int, List[Tuple[int, int]], np.ndarray]]):
+        """Insert the (file_id, spans, embeddings) passages of any number of files with one executemany"""
+        cursor.executemany(INSERT_MEETING_PASSAGE_SQL, (
+            (file_id, start, end, to_blob(embedding), len(embedding))
+            for file_id, spans, embeddings in passages
+            for (start, end), embedding in zip(spans, embeddings)
+        ))
+
+    def _file_embedding(self, content: str, spans: List[Tuple[int, int]], embeddings: np.ndarray) -> np.ndarray:
+        if spans:
+            return normalize_rows(embeddings).mean(axis=0)
+        # Nothing but whitespace: no passages, but the row still needs an embedding
+        return self.embedding_model.encode(content)
+
+    def _insert_files(self, cursor, files: List[Tuple[str, str, List[Tuple[int, int]], np.ndarray]]) -> List[int]:
+        """Insert (filename, content, spans, embeddings) files and their passages with one
+        executemany each; returns the new passage_ids in insertion order"""
+        cursor.executemany(INSERT_MEETING_FILE_SQL, (
+            (filename, content, to_blob(embedding), len(embedding))
+            for filename, content, spans, embeddings in files
+            for embedding in [self._file_embedding(content, spans, embeddings)]
+        ))
+        names = json.dumps([filename for filename, _, _, _ in files])
+        file_ids = dict(cursor.execute(SELECT_FILE_IDS_BY_NAME_SQL, (names,)).fetchall())
+        self._insert_passages(cursor, ((file_ids[filename], spans, embeddings)
+                                       for filename, _, spans, embeddings in files))
+        return [row[0] for row in cursor.execute(SELECT_PASSAGE_IDS_FOR_FILES_SQL,
+                                                 (json.dumps(list(file_ids.values())),))]
+
+    def _backfill_passages(self, batch_files: int = 256):
+        """Split and embed files that have no passages yet: older databases and edited files"""
+        files = [(file_id, content) for file_id, content in
+                 self.pool.connection().execute(SELECT_FILES_WITHOUT_PASSAGES_SQL) if content.strip()]
+        if not files:
+            return
+        logger.info(f"Splitting {len(files)} meeting files into passages")
+        for start in range(0, len(files), batch_files):
+            batch = files[start:start + batch_files]
+            embedded = self._embed_documents([content for _, content in batch])
+            with self.pool.transaction(immediate=True) as cursor:
+                for (file_id, _), (spans, embeddings) in zip(batch, embedded):
+                    # Another process may have got here first
+                    if not cursor.execute(SELECT_PASSAGE_IDS_SQL, (file_id,)).fetchone():
+                        self._insert_passages(cursor, [(file_id, spans, embeddings)])
+
+    def _sync_index(self, dim: int):
+        """Bring the index up to date with meeting_passages for embeddings of length `dim`"""
+        conn = self.pool.connection()
+        with self._index_lock:
+            version = conn.execute(SELECT_MEETING_VERSION_SQL).fetchone()[0]
+            full_load = version != self._index_version or dim != self.index.dim
+            if full_load:
+                self._backfill_passages()
+                self.index.clear(dim)
+                self._index_version = version
+                self._high_water = 0
+                full_load = not self._load_saved_index(version, dim)
+            rows = conn.execute(SELECT_MEETING_EMBEDDINGS_SINCE_SQL, (self._high_water,)).fetchall()
+            if not rows:
+                return
+            # Rows from a model with a different output size are not comparable
+            matching = [(passage_id, blob) for passage_id, blob, embedding_dim in rows if embedding_dim == dim]
+            if matching:
+                passage_ids, blobs = zip(*matching)
+                self.index.add(passage_ids, from_blobs(blobs, dim))
+            self._high_water = rows[-1][0]
+            logger.info(f"Indexed {len(matching)} meeting passages ({len(self.index)} total)")
+            if full_load and self.ann:
+                self._save_index()
+
+    def _load_saved_index(self, version: int, dim: int) -> bool:
+        """Swap in the saved ANN index if it matches the table; call with _index_lock held"""
+        if not self.ann or not os.path.exists(self.index_path):
+            return False
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.execute(
-                    "INSERT INTO meeting_files (filename, content, embedding) VALUES (?, ?, ?)",
-                    (filename, content, embedding_blob)
-                )
-            logger.info(f"Added file '{filename}' successfully.")
-            return True
-        except sqlite3.IntegrityError:
-            logger.warning(f"File '{filename}' already exists in database.")
+            index, metadata = IVFIndex.load(self.index_path, self.ann)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable ANN index {self.index_path}: {e}")
             return False
+        if metadata.get("version") != version or index.dim != dim:
+            logger.info(f"Saved ANN index {self.index_path} is stale; rebuilding")
+            return False
+        self.index = index
+        self._high_water = metadata["high_water"]
+        return True
+
+    def _save_index(self):
+        self.index.save(self.index_path, version=self._index_version, high_water=self._high_water)
+
+    def save_index(self):
+        """Write the ANN index to `index_path`, so the next start can skip rebuilding it"""
+        if not self.ann:
+            raise ValueError("Only the ANN index is saved; construct MeetingDatabase with ann=IVFParams(...)")
+        with self._index_lock:
+            self._save_index()
+
+    def add_files(self, files: List[Tuple[str, str]]) -> List[str]:
+        """Add (filename, content) pairs in one go; returns the filenames added.
+
+        The passages of every file are encoded together in batched calls and
+        all rows are written in one transaction. Filenames already stored, or
+        repeated within `files`, are skipped.
+        """
+        stored = {row[0] for row in self.pool.connection().execute(
+            SELECT_FILE_IDS_BY_NAME_SQL, (json.dumps([filename for filename, _ in files]),))}
+        new_files: Dict[str, str] = {}
+        for filename, content in files:
+            if filename not in stored:
+                new_files.setdefault(filename, content)
+        if not new_files:
+            return []
+        embedded = self._embed_documents(list(new_files.values()))
+        with self.pool.transaction(immediate=True) as cursor:
+            # Another writer may have stored some of the names while we were encoding
+            stored = {row[0] for row in cursor.execute(SELECT_FILE_IDS_BY_NAME_SQL, (json.dumps(list(new_files)),))}
+            rows = [(filename, content) + doc for (filename, content), doc in zip(new_files.items(), embedded)
+                    if filename not in stored]
+            if not rows:
+                return []
+            passage_ids = self._insert_files(cursor, rows)
+        self._append_to_index(passage_ids, [embeddings for _, _, _, embeddings in rows])
+        return [filename for filename, _, _, _ in rows]
+
+    def _append_to_index(self, passage_ids: List[int], embeddings: List[np.ndarray]):
+        embeddings = [matrix for matrix in embeddings if len(matrix)]
+        if not passage_ids or not embeddings:
+            return
+        matrix = np.concatenate(embeddings)
+        with self._index_lock:
+            # Only append right after the last indexed row; otherwise another
+            # writer got in between and the next sync reads both in order.
+            if passage_ids[0] == self._high_water + 1 and self.index.dim == matrix.shape[1]:
+                self.index.add(passage_ids, matrix)
+                self._high_water = passage_ids[-1]
+
+    def add_file(self, filename: str, content: str) -> bool:
+        try:
+            added = self.add_files([(filename, content)])
         except Exception as e:
             logger.error(f"Error adding file '{filename}': {e}")
             return False
+        if not added:
+            logger.warning(f"File '{filename}' already exists in database.")
+            return False
+        logger.info(f"Added file '{filename}' successfully.")
+        return True
 
     def retrieve_file_content(self, filename: str) -> Optional[str]:
-        with sqlite3.connect(self.db_path) as conn:
-            cur = conn.execute("SELECT content FROM meeting_files WHERE filename = ?", (filename,))
-            row = cur.fetchone()
-            return row[0] if row else None
+        row = self.pool.connection().execute(
+            "SELECT content FROM meeting_files WHERE filename = ?", (filename,)
+        ).fetchone()
+        return row[0] if row else None
 
     def vector_search(self, query: str, top_k: int = 5) -> List[Dict]:
-        query_emb = self.embedding_model.encode(query)
+        """The `top_k` passages closest to `query`; "content" is the passage text.
+
+        With an IVF index (`ann=IVFParams(...)`) the result is approximate:
+        each query scores the `nprobe` clusters nearest to it, by default a
+        fifth of `nlist` and at least 16. In `benchmark.py ann` that keeps
+        recall@10 around 0.94 at 100k passages for a fifth of the exact
+        search's latency; a larger `nprobe` (or `nprobe_fraction`) buys
+        recall with latency, a smaller one the reverse.
+        """
+        query_emb = self._query_embedding(query)
+        self._sync_index(len(query_emb))
+        passage_ids, scores = self.index.search(query_emb, top_k)
+        return self._passage_results(passage_ids.tolist(), [{"similarity": score} for score in scores.tolist()])
+
+    def hybrid_search(self, query: str, top_k: int = 5, candidates: int = 50, prefilter: bool = False,
+                      keyword_weight: float = 0.5) -> List[Dict]:
+        """The `top_k` passages best matching `query` by keywords and by meaning together.
+
+        Every passage of the `candidates` best BM25 files is scored against
+        the query embedding. Without `prefilter` the `candidates` nearest
+        passages from the index join them, so a match by meaning alone can
+        still win; with it, only the keyword candidates are scored. Each
+        passage's score is `keyword_weight` times its file's normalized BM25
+        score plus the rest times its normalized similarity
+        (keyword_search.fuse_scores). Results are as for `vector_search`,
+        plus the fused "score" and the file's "keyword_rank" (None when it
+        did not match).
+        """
+        query_emb = self._query_embedding(query)
+        dim = len(query_emb)
+        # Also splits files edited since the last search, so the candidates have passages
+        self._sync_index(dim)
+        conn = self.pool.connection()
+        matches = keyword_candidates(conn, query, candidates)
+        file_ranks = {file_id: rank for rank, (file_id, _) in enumerate(matches)}
+        file_scores = dict(matches)
+        similarities: Dict[int, float] = {}
+        passage_files: Dict[int, int] = {}
+        if matches:
+            rows = [(passage_id, file_id, blob) for passage_id, file_id, blob, embedding_dim in conn.execute(
+                SELECT_PASSAGE_EMBEDDINGS_FOR_FILES_SQL, (json.dumps(list(file_scores)),)) if embedding_dim == dim]
+            if rows:
+                passage_ids, file_ids, blobs = zip(*rows)
+                scores = normalize_rows(from_blobs(blobs, dim)) @ normalize_rows(query_emb)[0]
+                similarities.update(zip(passage_ids, scores.tolist()))
+                passage_files.update(zip(passage_ids, file_ids))
+        if not prefilter:
+            passage_ids, scores = self.index.search(query_emb, candidates)
+            for passage_id, score in zip(passage_ids.tolist(), scores.tolist()):
+                similarities.setdefault(passage_id, score)
+        keyword_scores = {passage_id: file_scores[file_id] for passage_id, file_id in passage_files.items()}
+        fused = fuse_scores(keyword_scores, similarities, keyword_weight)[:top_k]
+        return self._passage_results([passage_id for passage_id, _ in fused], [
+            {"similarity": similarities[passage_id], "score": score,
+             "keyword_rank": file_ranks.get(passage_files.get(passage_id))}
+            for passage_id, score in fused
+        ])
+
+    def _passage_results(self, passage_ids: List[int], scores: List[Dict]) -> List[Dict]:
+        """Result dicts for `passage_ids` in order, each with its `scores` entry merged in"""
+        if not passage_ids:
+            return []
+        # Only the winning passages are read from the table
+        rows = {row[0]: row[1:] for row in self.pool.connection().execute(
+            SELECT_MEETING_PASSAGES_BY_ID_SQL, (json.dumps(passage_ids),))}
         results = []
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.execute("SELECT filename, content, embedding, created_at FROM meeting_files")
-            for filename, content, embedding_blob, created_at in cursor.fetchall():
-                embedding = pickle.loads(embedding_blob)
-                similarity = np.dot(query_emb, embedding) / (np.linalg.norm(query_emb) * np.linalg.norm(embedding))
-                results.append({
-                    "filename": filename,
-                    "content": content,
-                    "similarity": similarity,
-                    "created_at": created_at
-                })
-        results.sort(key=lambda x: x["similarity"], reverse=True)
-        return results[:top_k]
+        for passage_id, passage_scores in zip(passage_ids, scores):
+            if passage_id not in rows:
+                continue  # deleted since it was scored
+            filename, passage, created_at, start_offset, end_offset = rows[passage_id]
+            results.append({
+                "filename": filename,
+                "content": passage,
+                **passage_scores,
+                "created_at": created_at,
+                "start_offset": start_offset,
+                "end_offset": end_offset,
+            })
+        return results
 
     def truncate_files(self):
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.execute("DELETE FROM meeting_files")
-                conn.commit()
+            with self.pool.transaction(immediate=True) as cursor:
+                cursor.execute("DELETE FROM meeting_passages")
+                cursor.execute("DELETE FROM meeting_files")
+                version = cursor.execute(SELECT_MEETING_VERSION_SQL).fetchone()[0]
+            with self._index_lock:
+                self.index.clear(self.index.dim)
+                self._index_version = version
             logger.info("All meeting files truncated successfully.")
         except Exception as e:
             logger.error(f"Error truncating meeting files: {e}")
@@ -398,9 +1380,12 @@ class MeetingDatabase:
             logger.error(f"PDF file not found: {pdf_path}")
             return False
         try:
-            with pdfplumber.open(pdf_path) as pdf:
-                pages = [page.extract_text() or "" for page in pdf.pages]
-            full_text = "\n".join(pages).strip()
+            file_hash = file_digest(pdf_path)
+            full_text = self.content_cache.get_text(file_hash)
+            if full_text is None:
+                from ingest import extract_pdf_text
+                full_text = extract_pdf_text(pdf_path)
+                self.content_cache.put_text(file_hash, full_text)
             if not full_text:
                 logger.warning(f"No text extracted from PDF: {pdf_path}")
                 return False
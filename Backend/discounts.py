@@ -0,0 +1,115 @@
+"""
+Occasion discount rules.
+
+Rules live in the `discount_rules` table: a keyword, the label guests hear, a
+percentage and a priority. `DiscountRules` compiles the active rules into a
+`DiscountMatcher` and keeps it until the 'discount_rules' row of
+data_versions changes, so quotes never re-read the table. That version is
+checked at most once every `check_interval` seconds, so a rule edited by
+hand is picked up within that time, or at once after `invalidate()`;
+other lookups cost no more than the match itself. The agent's
+prompt text is rendered from the same rules by `prompts.discount_rules_info`.
+"""
+
+import logging
+import threading
+import time
+from typing import List, Optional
+
+from records import DiscountRule, rows_as
+
+logger = logging.getLogger(__name__)
+
+SELECT_DISCOUNT_RULES_SQL = '''
+    SELECT keyword, label, discount_percentage, priority
+    FROM discount_rules
+    WHERE active = TRUE
+    ORDER BY priority, rule_id
+'''
+
+SELECT_DISCOUNT_RULES_VERSION_SQL = "SELECT version FROM data_versions WHERE name = 'discount_rules'"
+
+
+class DiscountMatcher:
+    """The active rules compiled for matching free-form occasion text.
+
+    The text is lower-cased once and the keywords are checked in priority
+    order, stopping at the first hit, so "wedding anniversary" gets the
+    higher-priority rule whichever word comes first. Each check is a
+    substring search in C, which outruns a single regex alternation over
+    the same keywords on CPython (see `benchmark.py discounts`).
+    """
+
+    def __init__(self, rules: List[DiscountRule]):
+        self.rules = sorted(rules, key=lambda rule: rule.priority)
+        self._keywords = tuple((rule.keyword.lower(), rule) for rule in self.rules)
+
+    def match(self, occasion: Optional[str]) -> Optional[DiscountRule]:
+        """Highest-priority rule whose keyword appears in `occasion`, or None"""
+        if not occasion:
+            return None
+        text = occasion.lower()
+        for keyword, rule in self._keywords:
+            if keyword in text:
+                return rule
+        return None
+
+    def discount_percentage(self, occasion: Optional[str]) -> float:
+        rule = self.match(occasion)
+        return rule.discount_percentage if rule else 0
+
+
+class DiscountRules:
+    """Cached DiscountMatcher for the rules stored in the hotel database"""
+
+    def __init__(self, pool, check_interval: float = 5.0):
+        self.pool = pool
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._matcher: Optional[DiscountMatcher] = None
+        self._version: Optional[int] = None
+        self._checked_at = float("-inf")
+        self.compiles = 0
+
+    def _compile(self):
+        # No transaction of its own, since this can run inside a booking's.
+        # Reading the version first means a concurrent edit only costs an
+        # extra recompile at the next check, never a matcher stale past it.
+        conn = self.pool.connection()
+        version = conn.execute(SELECT_DISCOUNT_RULES_VERSION_SQL).fetchone()[0]
+        rules = rows_as(DiscountRule, conn.execute(SELECT_DISCOUNT_RULES_SQL))
+        matcher = DiscountMatcher(rules)
+        with self._lock:
+            self._matcher = matcher
+            self._version = version
+            self._checked_at = time.monotonic()
+            self.compiles += 1
+        logger.info(f"Compiled {len(rules)} discount rules (version {version})")
+        return matcher
+
+    def matcher(self) -> DiscountMatcher:
+        """The compiled matcher, recompiled if the rules changed when last checked"""
+        now = time.monotonic()
+        # Lock-free fast path: each attribute read is atomic, and _compile
+        # publishes the matcher before the time it was checked
+        if now - self._checked_at < self.check_interval:
+            return self._matcher
+        version = self.pool.connection().execute(SELECT_DISCOUNT_RULES_VERSION_SQL).fetchone()[0]
+        with self._lock:
+            if version == self._version:
+                self._checked_at = now
+                return self._matcher
+        return self._compile()
+
+    def invalidate(self):
+        """Check the version on the next lookup, e.g. right after editing the rules"""
+        with self._lock:
+            self._checked_at = float("-inf")
+
+    def rules(self) -> List[DiscountRule]:
+        """Active rules in priority order"""
+        return list(self.matcher().rules)
+
+    def discount_for(self, special_occasion: Optional[str]) -> float:
+        """Discount percentage for a free-form occasion, 0 if no rule matches"""
+        return self.matcher().discount_percentage(special_occasion)
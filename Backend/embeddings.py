@@ -0,0 +1,309 @@
+"""
+Process-wide registry of embedding models.
+
+Every `MeetingDatabase` used to build its own SentenceTransformer, so a
+process with several of them (the agent, a server, a CLI, benchmarks)
+held several copies of the same weights. `get_model(name)` loads each
+model once per process and hands every caller the same `SharedEncoder`;
+`warmup(name)` does the load and a first encode ahead of time, e.g. in a
+worker's prewarm hook, so the first search does not pay for it.
+
+A model is named by a spec, `[backend:]name`. Without a backend it is a
+SentenceTransformer name or path, run by PyTorch; `onnx:<dir>` and
+`onnx-int8:<dir>` run a model exported by onnx_encoder.py with ONNX
+Runtime, in float32 or int8. Other backends plug in through `BACKENDS`.
+The default spec comes from the EMBEDDING_MODEL environment variable.
+
+`SharedEncoder.encode` may be called from any thread. Calls on one model
+are serialized: the Hugging Face fast tokenizers are not safe to share
+between threads, and PyTorch already spreads a single call over the CPU
+cores. `stats()` reports, per model, how long it took to load, how much
+resident memory the load added, and how much encoding it has done.
+
+`MicroBatcher` sits in front of an encoder for callers that each have one
+text, such as concurrent searches: it gathers them for a few milliseconds
+or up to a batch size and runs one batched encode for all of them.
+"""
+
+import asyncio
+import logging
+import os
+import queue
+import resource
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = os.getenv("EMBEDDING_MODEL", 'all-MiniLM-L6-v2')
+
+
+def resident_memory_mb() -> float:
+    """Current resident set size of this process in MiB (peak RSS where /proc is unavailable)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is bytes on macOS, KiB elsewhere
+        return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+def load_sentence_transformer(name: str):
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(name)
+
+
+def load_onnx(model_dir: str, quantized: bool = False):
+    from onnx_encoder import OnnxEncoder
+    return OnnxEncoder(model_dir, quantized)
+
+
+# backend -> loader taking the rest of the spec; each loader returns an object with
+# SentenceTransformer's `encode(sentences, batch_size=...)`
+BACKENDS: Dict[str, Callable[[str], object]] = {
+    'torch': load_sentence_transformer,
+    'onnx': load_onnx,
+    'onnx-int8': lambda model_dir: load_onnx(model_dir, quantized=True),
+}
+
+
+def parse_spec(spec: str) -> Tuple[str, str]:
+    """(backend, name) of a model spec; a spec without a known backend prefix is a torch model"""
+    backend, separator, name = spec.partition(":")
+    if separator and backend in BACKENDS:
+        return backend, name
+    return 'torch', spec
+
+
+def load_model(spec: str):
+    backend, name = parse_spec(spec)
+    return BACKENDS[backend](name)
+
+
+class SharedEncoder:
+    """One loaded model, shared by every caller in the process; `encode` is thread-safe"""
+
+    def __init__(self, name: str, model, load_ms: float, load_rss_mb: float):
+        self.name = name
+        self.model = model
+        self.load_ms = load_ms
+        self.load_rss_mb = load_rss_mb
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.texts = 0
+        self.encode_ms = 0.0
+
+    def encode(self, sentences, **kwargs):
+        with self._lock:
+            began = time.perf_counter()
+            embeddings = self.model.encode(sentences, **kwargs)
+            self.encode_ms += (time.perf_counter() - began) * 1000
+            self.calls += 1
+            self.texts += 1 if isinstance(sentences, str) else len(sentences)
+        return embeddings
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'backend': parse_spec(self.name)[0],
+                'load_ms': self.load_ms,
+                'load_rss_mb': self.load_rss_mb,
+                'encode_calls': self.calls,
+                'encoded_texts': self.texts,
+                'encode_ms': self.encode_ms,
+            }
+
+
+class ModelRegistry:
+    """Loads each named model once, on first `get` or at `warmup`, and shares it"""
+
+    def __init__(self, loader: Callable[[str], object] = load_model):
+        self.loader = loader
+        self._lock = threading.Lock()
+        self._models: Dict[str, SharedEncoder] = {}
+        self._loading: Dict[str, threading.Lock] = {}
+
+    def get(self, name: str = DEFAULT_MODEL) -> SharedEncoder:
+        model = self._models.get(name)
+        if model is not None:
+            return model
+        with self._lock:
+            name_lock = self._loading.setdefault(name, threading.Lock())
+        # Per-name lock: a second caller waits for the load in progress, other models load in parallel
+        with name_lock:
+            model = self._models.get(name)
+            if model is None:
+                rss_before = resident_memory_mb()
+                began = time.perf_counter()
+                logger.info(f"Loading embedding model {name}")
+                loaded = self.loader(name)
+                load_ms = (time.perf_counter() - began) * 1000
+                model = SharedEncoder(name, loaded, load_ms, resident_memory_mb() - rss_before)
+                logger.info(f"Loaded embedding model {name} in {load_ms:.0f} ms "
+                            f"(+{model.load_rss_mb:.0f} MiB resident)")
+                with self._lock:
+                    self._models[name] = model
+        return model
+
+    def warmup(self, name: str = DEFAULT_MODEL) -> SharedEncoder:
+        """Load `name` if needed and run one encode, so the first real call is not the slow one"""
+        model = self.get(name)
+        model.encode("warm up")
+        return model
+
+    def loaded(self, name: str) -> bool:
+        return name in self._models
+
+    def stats(self) -> Dict:
+        with self._lock:
+            models = dict(self._models)
+        return {
+            'rss_mb': resident_memory_mb(),
+            'models': {name: model.stats() for name, model in models.items()},
+        }
+
+
+class MicroBatcher:
+    """Coalesces single-text encodes from many threads or tasks into batched `encode_batch` calls.
+
+    A background thread takes the oldest waiting text plus whatever else
+    is already queued, up to `max_batch_size`, encodes the distinct texts
+    in one call, and resolves each caller's future with its row. A lone
+    text meeting an idle encoder and an empty queue goes out straight
+    away. When others are already waiting, the batch keeps gathering until
+    `max_wait_ms` after its first text arrived (default 0: take only what
+    is queued), so concurrent callers can share a fuller encode.
+    `stats()` reports the batch sizes, how many batches were full, and
+    queue-wait percentiles.
+    """
+
+    def __init__(self, encode_batch: Callable[[List[str]], object], max_batch_size: int = 16,
+                 max_wait_ms: float = 0.0, latency_window: int = 1024):
+        self.encode_batch = encode_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._queue: "queue.SimpleQueue[Optional[Tuple[str, Future, float]]]" = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self.requests = 0
+        self.batches = 0
+        self.batched_requests = 0
+        self.full_batches = 0
+        self.encoded_texts = 0
+        self.errors = 0
+        self.encode_ms = 0.0
+        self._waits_ms: Deque[float] = deque(maxlen=latency_window)
+
+    def submit(self, text: str) -> Future:
+        """Future for the embedding of `text`"""
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("MicroBatcher is closed")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="encode-batcher", daemon=True)
+                self._thread.start()
+            self.requests += 1
+            self._queue.put((text, future, time.perf_counter()))
+        return future
+
+    def encode(self, text: str):
+        return self.submit(text).result()
+
+    async def encode_async(self, text: str):
+        return await asyncio.wrap_future(self.submit(text))
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch, deadline, closing = [first], first[2] + self.max_wait_ms / 1000, False
+            while len(batch) < self.max_batch_size:
+                # Wait for more only once a second caller shows there is concurrency
+                timeout = deadline - time.perf_counter() if len(batch) > 1 else 0
+                try:
+                    item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    closing = True
+                    break
+                batch.append(item)
+            self._encode(batch)
+            if closing:
+                return
+
+    def _encode(self, batch: List[Tuple[str, Future, float]]):
+        began = time.perf_counter()
+        # Callers that cancelled while queued are dropped
+        batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        texts = list(dict.fromkeys(text for text, _, _ in batch))
+        try:
+            rows = dict(zip(texts, self.encode_batch(texts)))
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+        for text, future, _ in batch:
+            future.set_result(rows[text])
+        with self._lock:
+            self.batches += 1
+            self.batched_requests += len(batch)
+            self.full_batches += len(batch) >= self.max_batch_size
+            self.encoded_texts += len(texts)
+            self.encode_ms += (time.perf_counter() - began) * 1000
+            self._waits_ms.extend((began - enqueued) * 1000 for _, _, enqueued in batch)
+
+    def close(self):
+        """Encode what is queued, then stop the batching thread"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            waits = sorted(self._waits_ms)
+            return {
+                'requests': self.requests,
+                'batches': self.batches,
+                'mean_batch_size': self.batched_requests / self.batches if self.batches else 0.0,
+                'full_batches': self.full_batches,
+                'partial_batches': self.batches - self.full_batches,
+                'encoded_texts': self.encoded_texts,
+                'errors': self.errors,
+                'encode_ms': self.encode_ms,
+                'wait_p50_ms': waits[len(waits) // 2] if waits else 0.0,
+                'wait_p99_ms': waits[min(len(waits) - 1, int(len(waits) * 0.99))] if waits else 0.0,
+            }
+
+
+registry = ModelRegistry()
+
+
+def get_model(name: str = DEFAULT_MODEL) -> SharedEncoder:
+    """The process-wide encoder for `name`, loaded on first use"""
+    return registry.get(name)
+
+
+def warmup(name: str = DEFAULT_MODEL) -> SharedEncoder:
+    return registry.warmup(name)
+
+
+def stats() -> Dict:
+    return registry.stats()
@@ -0,0 +1,267 @@
+"""
+Excel export of the hotel database for non-technical staff.
+
+`write_workbook` streams the rooms and bookings tables straight from SQLite
+into a write-only openpyxl workbook, so memory stays flat however many rows
+there are. `ExcelExporter` runs exports on a background thread and coalesces
+bursts of bookings into a single write, keeping exports out of the voice turn.
+"""
+
+import atexit
+import csv
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+EXPORT_ROOMS_SQL = '''
+    SELECT room_number, room_type, price_min, price_max, is_occupied,
+           guest_name, check_in_date, check_out_date, special_occasion,
+           discount_percentage, created_at
+    FROM rooms
+'''
+
+EXPORT_BOOKINGS_SQL = '''
+    SELECT b.booking_id, r.room_number, b.guest_name, b.check_in_date,
+           b.check_out_date, b.total_amount, b.discount_amount,
+           b.special_occasion, b.booking_date
+    FROM bookings b
+    JOIN rooms r ON b.room_id = r.room_id
+    WHERE b.booking_id > ?
+    ORDER BY b.booking_id
+'''
+
+
+def _append_rows(sheet, cursor: sqlite3.Cursor):
+    sheet.append([column[0] for column in cursor.description])
+    for row in cursor:
+        sheet.append(row)
+
+
+def write_workbook(conn: sqlite3.Connection, filename: str):
+    """Stream the Rooms and Bookings sheets into `filename`, replacing it atomically.
+
+    Both sheets are read in one transaction, so they come from the same
+    snapshot: a booking committed mid-export shows up in both or neither.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    own_transaction = not conn.in_transaction
+    if own_transaction:
+        conn.execute("BEGIN")
+    try:
+        _append_rows(workbook.create_sheet("Rooms"), conn.execute(EXPORT_ROOMS_SQL))
+        _append_rows(workbook.create_sheet("Bookings"), conn.execute(EXPORT_BOOKINGS_SQL, (0,)))
+    finally:
+        # Read-only, so committing and rolling back are the same; end it before the slow save
+        if own_transaction:
+            conn.rollback()
+
+    # Write next to the target and swap it in, so staff never open a half-written file.
+    # Each export gets its own temp file, so concurrent exports cannot clobber each other.
+    fd, tmp_path = tempfile.mkstemp(suffix=".tmp", prefix=os.path.basename(filename) + ".",
+                                    dir=os.path.dirname(os.path.abspath(filename)))
+    os.close(fd)
+    try:
+        workbook.save(tmp_path)
+        os.replace(tmp_path, filename)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _high_water_path(ledger_path: str) -> str:
+    return ledger_path + ".last_id"
+
+
+def _read_high_water(ledger_path: str) -> int:
+    """booking_id of the last row in the ledger, from the sidecar file `append_bookings` keeps"""
+    try:
+        with open(_high_water_path(ledger_path)) as f:
+            return int(f.read().strip() or 0)
+    except FileNotFoundError:
+        pass
+    if not os.path.exists(ledger_path):
+        return 0
+    # A ledger written before the sidecar existed: parse it once. The csv
+    # module copes with quoted fields spanning lines, which a scan of the
+    # file's last line does not.
+    last_id = 0
+    with open(ledger_path, newline="", encoding="utf-8") as f:
+        for row in csv.reader(f):
+            if row and row[0].isdigit():
+                last_id = int(row[0])
+    return last_id
+
+
+def _write_high_water(ledger_path: str, booking_id: int):
+    path = _high_water_path(ledger_path)
+    with open(path + ".tmp", "w") as f:
+        f.write(str(booking_id))
+    os.replace(path + ".tmp", path)
+
+
+def append_bookings(conn: sqlite3.Connection, path: str, after_booking_id: Optional[int] = None) -> int:
+    """Append bookings newer than `after_booking_id` to a CSV ledger and return the new high-water mark.
+
+    Only new rows are read and written, so the cost of each call depends on
+    how many bookings arrived since the last one, not on the size of history.
+    The high-water mark is also kept in a sidecar file next to the ledger
+    (`<path>.last_id`), which is where it is read from when not given. It is
+    written after the rows, so a crash in between repeats rows rather than
+    losing them.
+    """
+    if after_booking_id is None:
+        after_booking_id = _read_high_water(path)
+    cursor = conn.execute(EXPORT_BOOKINGS_SQL, (after_booking_id,))
+    write_header = not os.path.exists(path) or os.path.getsize(path) == 0
+    last_id = after_booking_id
+    with open(path, "a", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        if write_header:
+            writer.writerow([column[0] for column in cursor.description])
+        for row in cursor:
+            writer.writerow(row)
+            last_id = row[0]
+    if last_id != after_booking_id:
+        _write_high_water(path, last_id)
+    return last_id
+
+
+class ExcelExporter:
+    """Debounced background exporter.
+
+    `request_export()` is cheap and never blocks. The worker thread waits
+    until requests have been quiet for `debounce_seconds` (but never longer
+    than `max_delay_seconds` after the first one) and then runs one export
+    for the whole burst.
+
+    In "full" mode each export rewrites the workbook with `write_workbook`.
+    In "append" mode only new bookings are appended to a CSV ledger next to
+    the workbook, so the export cost does not grow with booking history.
+    The workbook itself is then rewritten at most every
+    `workbook_interval_seconds`, and at `close()`, if bookings were
+    appended since it was last written.
+    """
+
+    def __init__(self, db, filename: str = "hotel_bookings.xlsx", mode: str = "full",
+                 debounce_seconds: float = 2.0, max_delay_seconds: float = 10.0,
+                 workbook_interval_seconds: float = 300.0):
+        if mode not in ("full", "append"):
+            raise ValueError(f"Unknown export mode '{mode}'")
+        self.db = db
+        self.filename = filename
+        self.mode = mode
+        self.ledger_path = os.path.splitext(filename)[0] + "_bookings.csv"
+        self.debounce_seconds = debounce_seconds
+        self.max_delay_seconds = max_delay_seconds
+        self.workbook_interval_seconds = workbook_interval_seconds
+        self.exports = 0
+        self.workbook_writes = 0
+        self.requests = 0
+        self._ledger_high_water: Optional[int] = None
+        self._workbook_stale = False
+        self._workbook_written_at = float("-inf")
+        self._cond = threading.Condition()
+        self._first_request: Optional[float] = None
+        self._last_request: Optional[float] = None
+        self._exporting = False
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="excel-export", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def request_export(self):
+        """Schedule an export; bursts of calls are coalesced into one write"""
+        with self._cond:
+            now = time.monotonic()
+            if self._first_request is None:
+                self._first_request = now
+            self._last_request = now
+            self.requests += 1
+            self._cond.notify()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Run any pending export now and wait for it; returns False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            if self._first_request is not None:
+                self._first_request = self._last_request = float("-inf")
+                self._cond.notify_all()
+            while self._first_request is not None or self._exporting:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self):
+        """Flush pending work and stop the worker thread"""
+        if self._closed:
+            return
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def _due_in(self) -> Optional[float]:
+        if self._first_request is None:
+            return None
+        now = time.monotonic()
+        return max(0.0, min(self._last_request + self.debounce_seconds,
+                            self._first_request + self.max_delay_seconds) - now)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed:
+                    due_in = self._due_in()
+                    if due_in == 0:
+                        break
+                    self._cond.wait(due_in)
+                if self._closed:
+                    break
+                self._first_request = self._last_request = None
+                self._exporting = True
+            try:
+                self._export()
+            except Exception as e:
+                logger.error(f"Background export failed: {e}")
+            finally:
+                with self._cond:
+                    self._exporting = False
+                    self._cond.notify_all()
+        if self._workbook_stale:
+            try:
+                self._write_workbook()
+            except Exception as e:
+                logger.error(f"Final workbook export failed: {e}")
+
+    def _write_workbook(self):
+        start = time.perf_counter()
+        write_workbook(self.db.pool.connection(), self.filename)
+        self._workbook_stale = False
+        self._workbook_written_at = time.monotonic()
+        self.workbook_writes += 1
+        logger.info(f"Exported to {self.filename} in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    def _export(self):
+        if self.mode == "full":
+            self._write_workbook()
+        else:
+            start = time.perf_counter()
+            high_water = append_bookings(self.db.pool.connection(), self.ledger_path, self._ledger_high_water)
+            self._workbook_stale |= high_water != self._ledger_high_water
+            self._ledger_high_water = high_water
+            logger.info(f"Exported to {self.ledger_path} in {(time.perf_counter() - start) * 1000:.1f} ms")
+            if self._workbook_stale and \
+                    time.monotonic() - self._workbook_written_at >= self.workbook_interval_seconds:
+                self._write_workbook()
+        self.exports += 1
@@ -19,7 +19,10 @@ except ImportError:
 import jwt
 
 # Import your agent class
-from agent import HotelReceptionistAgent
+from agent import agent_ready, get_agent
+import embeddings
+from api import get_db
+from records import as_dicts
 
 app = Flask(__name__)
 CORS(app, resources={r"/api/*": {"origins": "*"}})
@@ -28,18 +31,18 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 
 load_dotenv(dotenv_path=".env")
 
-# Create single global agent instance
-print("Initializing HotelReceptionistAgent...")
-try:
-    agent_instance = HotelReceptionistAgent()
-    print(" Agent initialized successfully!")
-except Exception as e:
-    print(f" Failed to initialize agent: {e}")
-    agent_instance = None
+def load_agent():
+    """Return the shared agent (built on first call), or None if it failed to initialize"""
+    try:
+        return get_agent()
+    except Exception as e:
+        print(f" Failed to initialize agent: {e}")
+        return None
 
 @app.route('/api/agent', methods=['POST'])
 def agent_endpoint():
     """Chat endpoint for AI agent"""
+    agent_instance = load_agent()
     if agent_instance is None:
         return jsonify({'response': 'Agent initialization failed. Please check server logs.'}), 500
     
@@ -103,14 +106,36 @@ def generate_livekit_token():
         logger.error(f" Error generating token: {e}", exc_info=True)
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/analytics/daily', methods=['GET'])
+def daily_analytics():
+    """Daily occupancy, revenue and discount per room type, plus all-time totals"""
+    today = datetime.date.today()
+    start = request.args.get('start', today.isoformat())
+    end = request.args.get('end', (today + datetime.timedelta(days=13)).isoformat())
+    try:
+        datetime.date.fromisoformat(start)
+        datetime.date.fromisoformat(end)
+    except ValueError:
+        return jsonify({"error": "start and end must be YYYY-MM-DD dates"}), 400
+    
+    db = get_db().db
+    return jsonify({
+        "start": start,
+        "end": end,
+        "days": as_dicts(db.get_daily_stats(start, end, request.args.get('room_type'))),
+        "totals": as_dicts(db.get_booking_totals())
+    })
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    agent_status = "initialized" if agent_instance else "not initialized"
+    agent_status = "initialized" if agent_ready() else "not initialized"
     return jsonify({
         "status": "ok",
         "message": "Flask server is running",
         "agent_status": agent_status,
+        "embedding_models": embeddings.stats(),
+        "query_batcher": get_agent().meeting_db.query_batcher.stats() if agent_ready() else None,
         "port": 5000
     })
 
@@ -123,7 +148,8 @@ def test_endpoint():
             "health": "GET /health",
             "test": "GET /test",
             "agent": "POST /api/agent",
-            "livekit_token": "POST /api/livekit-token"
+            "livekit_token": "POST /api/livekit-token",
+            "analytics": "GET /api/analytics/daily?start=YYYY-MM-DD&end=YYYY-MM-DD&room_type="
         }
     })
 
@@ -139,6 +165,7 @@ if __name__ == "__main__":
     print("   GET  /test               - Test endpoint")
     print("   POST /api/agent          - Chat with AI agent")
     print("   POST /api/livekit-token  - Get LiveKit token")
+    print("   GET  /api/analytics/daily - Daily occupancy and revenue")
     print("=" * 70)
     print(" :")
     print("   - Frontend should connect to: http://localhost:5000")
@@ -146,4 +173,11 @@ if __name__ == "__main__":
     print("   - Press Ctrl+C to stop the server")
     print("=" * 70)
     
+    # Build the agent once at startup instead of on the first request
+    print("Initializing HotelReceptionistAgent...")
+    agent_instance = load_agent()
+    if agent_instance is not None:
+        agent_instance.meeting_db.warmup()
+        print(" Agent initialized successfully!")
+    
     app.run(host='0.0.0.0', port=5000, debug=True)
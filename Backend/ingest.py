@@ -0,0 +1,282 @@
+"""
+Bulk ingestion of meeting transcripts and PDFs into meeting.db.
+
+    python ingest.py transcripts/ "exports/**/*.pdf" --workers 4
+
+Arguments may be files, directories (searched recursively for .pdf, .txt
+and .md files) or glob patterns. PDF text is extracted with pdfminer.six
+(the engine under pdfplumber, without pdfplumber's per-character objects,
+which made extraction several times slower). With more than one worker and
+at least `MIN_POOL_PAGES` pages to extract, PDFs are split a few pages per
+task over a process pool, so a single long PDF still spreads over every
+worker; otherwise each PDF is extracted whole in this process, where a
+pool would cost more to start than it saves. Text files are read directly. Documents stream in input order into
+`MeetingDatabase.add_files` in batches, which encodes all of a batch's
+passages in batched `encode` calls and writes them in one transaction.
+Progress is logged after every batch in documents per second.
+
+PDFs whose bytes were ingested before skip extraction, and passages seen
+before skip encoding (content_cache.py), so re-running over the same
+directory mostly costs hashing.
+"""
+
+import argparse
+import glob
+import logging
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from itertools import starmap
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from content_cache import file_digest
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT_EXTENSIONS = (".pdf", ".txt", ".md")
+
+# Below this many PDF pages, starting worker processes costs more than extracting in-process
+MIN_POOL_PAGES = 32
+
+
+class IngestReport(NamedTuple):
+    documents: int
+    added: int
+    skipped: int
+    failed: int
+    characters: int
+    seconds: float
+
+    @property
+    def docs_per_s(self) -> float:
+        return self.documents / self.seconds if self.seconds else 0.0
+
+
+def find_documents(patterns: Iterable[str]) -> List[str]:
+    """Absolute paths of the documents named by files, directories or glob patterns, without repeats"""
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for root, dirs, files in os.walk(pattern):
+                dirs.sort()
+                paths.extend(os.path.join(root, name) for name in sorted(files)
+                             if name.lower().endswith(DOCUMENT_EXTENSIONS))
+        elif glob.has_magic(pattern):
+            paths.extend(sorted(glob.glob(pattern, recursive=True)))
+        else:
+            paths.append(pattern)
+    return list(dict.fromkeys(os.path.abspath(path) for path in paths))
+
+
+def count_pdf_pages(path: str) -> int:
+    """Number of pages, read from the page tree without parsing any page's content"""
+    from pdfminer.pdfpage import PDFPage
+    with open(path, "rb") as f:
+        return sum(1 for _ in PDFPage.get_pages(f))
+
+
+def extract_pdf_pages(path: str, first: int = 0, last: Optional[int] = None) -> str:
+    """Text of pages [first, last) of a PDF (0-based), or of every page when `last` is None"""
+    from pdfminer.high_level import extract_text
+    return extract_text(path, page_numbers=range(first, last) if last is not None else None)
+
+
+def extract_pdf_text(path: str) -> str:
+    """All of a PDF's text, extracted in this process"""
+    return extract_pdf_pages(path).strip()
+
+
+# Extraction tasks return (result, error) rather than raising, so one bad
+# file is reported and skipped instead of ending the run.
+
+def _extract_pages(path: str, first: int, last: Optional[int], error: Optional[str],
+                   final: bool) -> Tuple[Optional[str], Optional[str], bool]:
+    if error:
+        return None, error, final
+    try:
+        return extract_pdf_pages(path, first, last), None, final
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}", final
+
+
+def _ordered(executor: Executor, fn: Callable, tasks: Iterable[tuple], window: int) -> Iterator:
+    """fn(*task) for every task, in task order, with at most `window` tasks in flight"""
+    in_flight = deque()
+    for task in tasks:
+        in_flight.append(executor.submit(fn, *task))
+        if len(in_flight) >= window:
+            yield in_flight.popleft().result()
+    while in_flight:
+        yield in_flight.popleft().result()
+
+
+def _page_counts(pdfs: List[str]) -> Dict[str, Tuple[int, Optional[str]]]:
+    counts = {}
+    for path in pdfs:
+        try:
+            counts[path] = count_pdf_pages(path), None
+        except Exception as e:
+            counts[path] = 0, f"{type(e).__name__}: {e}"
+    return counts
+
+
+def extract_documents(paths: List[str], workers: int = 1, pages_per_task: int = 8, window: int = 16,
+                      cache=None) -> Iterator[Tuple[str, Optional[str], Optional[str]]]:
+    """(path, text, error) for every path, in order.
+
+    PDFs are extracted over a pool of `workers` processes, `pages_per_task`
+    pages at a time, only when there are at least MIN_POOL_PAGES pages in
+    all; otherwise each is extracted whole in this process.
+
+    With a `content_cache.ContentCache`, PDFs whose bytes were seen before
+    take their text from the cache, and new extractions are added to it.
+    """
+    hashes, cached = {}, {}
+    for path in paths:
+        if cache and path.lower().endswith(".pdf"):
+            try:
+                hashes[path] = file_digest(path)
+            except OSError:
+                continue  # the extraction task reports it
+            text = cache.get_text(hashes[path])
+            if text is not None:
+                cached[path] = text
+    pdfs = [path for path in paths if path.lower().endswith(".pdf") and path not in cached]
+
+    # Page counts come from the page trees, a few milliseconds per file, and decide
+    # whether a pool pays off; short PDFs become a single whole-file task
+    counts = _page_counts(pdfs) if workers > 1 else {}
+    executor = None
+    if sum(count for count, _ in counts.values()) >= MIN_POOL_PAGES:
+        executor = ProcessPoolExecutor(workers)
+        logger.info(f"Extracting {len(pdfs)} PDFs with {workers} worker processes")
+
+    def page_tasks():
+        for path in pdfs:
+            if executor is None:
+                yield path, 0, None, None, True
+                continue
+            count, error = counts[path]
+            # An empty or unreadable PDF still gets one task, so it is reported in its place
+            starts = range(0, max(count, 1), pages_per_task)
+            for first in starts:
+                yield path, first, min(first + pages_per_task, count), error, first == starts[-1]
+
+    if executor:
+        chunks = _ordered(executor, _extract_pages, page_tasks(), window)
+    else:
+        chunks = starmap(_extract_pages, page_tasks())
+    try:
+        yield from _in_order(paths, cached, hashes, chunks, cache)
+    finally:
+        if executor:
+            executor.shutdown(cancel_futures=True)
+
+
+def _in_order(paths: List[str], cached: Dict[str, str], hashes: Dict[str, str], chunks: Iterator,
+              cache) -> Iterator[Tuple[str, Optional[str], Optional[str]]]:
+    for path in paths:
+        if path in cached:
+            yield path, cached[path], None
+            continue
+        if not path.lower().endswith(".pdf"):
+            try:
+                with open(path, encoding="utf-8", errors="replace") as f:
+                    yield path, f.read(), None
+            except OSError as e:
+                yield path, None, f"{type(e).__name__}: {e}"
+            continue
+        # Chunks come back in task order, so the next ones are this PDF's
+        texts, error, final = [], None, False
+        while not final:
+            text, chunk_error, final = next(chunks)
+            error = error or chunk_error
+            texts.append(text)
+        if error:
+            yield path, None, error
+            continue
+        text = "\n".join(texts).strip()
+        if path in hashes:
+            cache.put_text(hashes[path], text)
+        yield path, text, None
+
+
+def ingest_paths(db, patterns: Iterable[str], workers: Optional[int] = None, batch_docs: int = 64,
+                 pages_per_task: int = 8) -> IngestReport:
+    """Add every document named by `patterns` to `db` (a MeetingDatabase), `batch_docs` at a time.
+
+    Files are stored under their base name, like `ingest_pdf_file`; names
+    already in the database are skipped. Unreadable files are logged and
+    counted as failed, and the rest of the run continues.
+    """
+    began = time.perf_counter()
+    paths = find_documents(patterns)
+    # Extraction is CPU-bound, so processes beyond the core count only add overhead
+    workers = min(workers or os.cpu_count() or 1, os.cpu_count() or 1)
+    cache = db.content_cache
+    counts = {"documents": 0, "added": 0, "skipped": 0, "failed": 0, "characters": 0}
+    batch: List[Tuple[str, str]] = []
+    logger.info(f"Ingesting {len(paths)} documents")
+
+    def flush():
+        if not batch:
+            return
+        try:
+            added = db.add_files(batch)
+        except Exception as e:
+            logger.error(f"Error adding {len(batch)} documents: {e}")
+            counts["failed"] += len(batch)
+        else:
+            counts["added"] += len(added)
+            counts["skipped"] += len(batch) - len(added)
+            counts["characters"] += sum(len(content) for _, content in batch)
+        counts["documents"] += len(batch)
+        batch.clear()
+        elapsed = time.perf_counter() - began
+        logger.info(f"Ingested {counts['documents']}/{len(paths)} documents "
+                    f"({counts['documents'] / elapsed:.1f} docs/s)")
+
+    # A pool keeps extracting up to `window` tasks ahead while a batch is encoded
+    for path, text, error in extract_documents(paths, workers, pages_per_task, 4 * workers, cache):
+        if error or not (text and text.strip()):
+            if error:
+                logger.error(f"Could not read {path}: {error}")
+                counts["failed"] += 1
+            else:
+                logger.warning(f"No text in {path}")
+                counts["skipped"] += 1
+            counts["documents"] += 1
+            continue
+        batch.append((os.path.basename(path), text))
+        if len(batch) >= batch_docs:
+            flush()
+    flush()
+    return IngestReport(seconds=time.perf_counter() - began, **counts)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="Files, directories or glob patterns to ingest")
+    parser.add_argument("--db", default="meeting.db", help="Meeting database to add the documents to")
+    parser.add_argument("--workers", type=int, default=None, help="PDF extraction processes (default and maximum: CPU count)")
+    parser.add_argument("--batch-docs", type=int, default=64, help="Documents encoded and written per transaction")
+    parser.add_argument("--pages-per-task", type=int, default=8, help="PDF pages extracted per worker task")
+    parser.add_argument("--encode-batch-size", type=int, default=32, help="Passages per encode call")
+    args = parser.parse_args(argv)
+
+    from dbdriver import MeetingDatabase
+    db = MeetingDatabase(args.db, encode_batch_size=args.encode_batch_size)
+    try:
+        report = ingest_paths(db, args.paths, args.workers, args.batch_docs, args.pages_per_task)
+    finally:
+        db.close()
+    print(f"{report.documents} documents in {report.seconds:.1f} s ({report.docs_per_s:.1f} docs/s): "
+          f"{report.added} added, {report.skipped} skipped, {report.failed} failed, "
+          f"{report.characters} characters")
+    return 1 if report.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""
+Keyword search over meeting files, for hybrid retrieval.
+
+`meeting_files_fts` is an FTS5 index over the filename and content of
+`meeting_files`. It is an external-content table, so the text is stored
+once, in `meeting_files`, and triggers keep the index in step with every
+insert, update and delete from any process.
+
+`MeetingDatabase.hybrid_search` takes the best BM25 matches as candidates,
+scores their passages against the query embedding, and fuses the keyword
+and embedding rankings by a weighted sum of their normalized scores.
+Keyword-shaped queries ("budget Q2", a project code, an exact filename)
+then find what cosine similarity alone misses, and with prefiltering only
+the candidates' passages are scored.
+"""
+
+import re
+import sqlite3
+from typing import Dict, List, Optional, Tuple
+
+KEYWORD_SEARCH_DDL = [
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS meeting_files_fts USING fts5 (
+        filename, content, content='meeting_files', content_rowid='file_id'
+    )
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS meeting_files_fts_on_insert AFTER INSERT ON meeting_files
+    BEGIN
+        INSERT INTO meeting_files_fts (rowid, filename, content) VALUES (NEW.file_id, NEW.filename, NEW.content);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS meeting_files_fts_on_delete AFTER DELETE ON meeting_files
+    BEGIN
+        INSERT INTO meeting_files_fts (meeting_files_fts, rowid, filename, content)
+        VALUES ('delete', OLD.file_id, OLD.filename, OLD.content);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS meeting_files_fts_on_update AFTER UPDATE OF filename, content ON meeting_files
+    BEGIN
+        INSERT INTO meeting_files_fts (meeting_files_fts, rowid, filename, content)
+        VALUES ('delete', OLD.file_id, OLD.filename, OLD.content);
+        INSERT INTO meeting_files_fts (rowid, filename, content) VALUES (NEW.file_id, NEW.filename, NEW.content);
+    END
+    ''',
+    # Index the files that existed before the table
+    "INSERT INTO meeting_files_fts (meeting_files_fts) VALUES ('rebuild')",
+]
+
+# A filename match weighs as much as five content matches. bm25() is lower
+# for better matches, so it is negated into a score where higher is better.
+SELECT_KEYWORD_CANDIDATES_SQL = '''
+    SELECT rowid, -bm25(meeting_files_fts, 5.0, 1.0) AS score
+    FROM meeting_files_fts
+    WHERE meeting_files_fts MATCH ?
+    ORDER BY score DESC
+    LIMIT ?
+'''
+
+TERM = re.compile(r"\w+")
+
+
+def fts_query(text: str, operator: str = "OR", max_terms: int = 32) -> Optional[str]:
+    """FTS5 query joining the words of `text` with `operator`, each quoted so user input is never FTS syntax"""
+    terms = list(dict.fromkeys(term.lower() for term in TERM.findall(text)))[:max_terms]
+    return f" {operator} ".join(f'"{term}"' for term in terms) if terms else None
+
+
+def keyword_candidates(conn: sqlite3.Connection, text: str, limit: int) -> List[Tuple[int, float]]:
+    """(file_id, BM25 score) of the `limit` best matches for `text`, best first.
+
+    Files containing every word are tried first; only if there are none is
+    any word enough. Besides ranking what the user asked for first, this
+    keeps the common case cheap: with OR, a word like "status" that is in
+    every file makes FTS5 score the whole table.
+    """
+    for operator in ("AND", "OR"):
+        query = fts_query(text, operator)
+        if query is None:
+            return []
+        rows = conn.execute(SELECT_KEYWORD_CANDIDATES_SQL, (query, limit)).fetchall()
+        if rows:
+            return rows
+    return []
+
+
+def fuse_scores(keyword_scores: Dict[int, float], similarities: Dict[int, float],
+                keyword_weight: float = 0.5) -> List[Tuple[int, float]]:
+    """(id, fused score) best first, for every id in `similarities`.
+
+    BM25 scores are divided by the best one and similarities are rescaled
+    to [0, 1] over the ids scored, so the two are comparable whatever the
+    query; ids without a keyword score get 0 for it. Fusing scores rather
+    than ranks keeps a decisive keyword hit (a project code, a filename)
+    on top even when the embedding cannot tell the candidates apart.
+    """
+    if not similarities:
+        return []
+    best_keyword = max(keyword_scores.values(), default=0.0)
+    low, high = min(similarities.values()), max(similarities.values())
+    fused = []
+    for item, similarity in similarities.items():
+        keyword = keyword_scores.get(item, 0.0) / best_keyword if best_keyword > 0 else 0.0
+        semantic = (similarity - low) / (high - low) if high > low else 1.0
+        fused.append((item, keyword_weight * keyword + (1 - keyword_weight) * semantic))
+    fused.sort(key=lambda pair: pair[1], reverse=True)
+    return fused
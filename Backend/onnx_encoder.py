@@ -0,0 +1,157 @@
+"""
+ONNX Runtime backend for the meeting-search embedding model.
+
+    python onnx_encoder.py all-MiniLM-L6-v2 models/all-MiniLM-L6-v2-onnx
+
+exports the SentenceTransformer's transformer to `model.onnx`, writes an
+int8 dynamically quantized copy to `model.int8.onnx`, and saves the fast
+tokenizer and the pooling settings next to them. `OnnxEncoder` runs either
+graph on the CPU with onnxruntime and the `tokenizers` library only:
+tokenize, run the graph, mean-pool over the attention mask and normalize,
+as the SentenceTransformer pipeline does. Loading needs neither torch nor
+sentence-transformers; exporting needs both, plus `onnx`.
+
+Select it with a model spec (embeddings.py), e.g.
+`MeetingDatabase(model_name="onnx-int8:models/all-MiniLM-L6-v2-onnx")` or
+`EMBEDDING_MODEL=onnx-int8:models/all-MiniLM-L6-v2-onnx`.
+`python benchmark.py encoder-parity` checks that its embeddings agree with
+the original model's, and `encoder-throughput` compares sentences per second.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+from typing import List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CONFIG_FILE = "encoder.json"
+TOKENIZER_FILE = "tokenizer.json"
+MODEL_FILE = "model.onnx"
+QUANTIZED_MODEL_FILE = "model.int8.onnx"
+
+
+class OnnxEncoder:
+    """Drop-in for SentenceTransformer.encode over a directory written by `export`"""
+
+    def __init__(self, model_dir: str, quantized: bool = False, threads: Optional[int] = None):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        model_file = os.path.join(model_dir, QUANTIZED_MODEL_FILE if quantized else MODEL_FILE)
+        if not os.path.exists(model_file):
+            raise FileNotFoundError(f"No {os.path.basename(model_file)} in {model_dir}; "
+                                    f"export one with `python onnx_encoder.py <model> {model_dir}`")
+        with open(os.path.join(model_dir, CONFIG_FILE)) as f:
+            self.config = json.load(f)
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(self.config["max_length"])
+        self.tokenizer.enable_padding(pad_id=self.config["pad_id"], pad_token=self.config["pad_token"])
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(model_file, options, providers=["CPUExecutionProvider"])
+        self.input_names = {graph_input.name for graph_input in self.session.get_inputs()}
+        self.model_file = model_file
+
+    def _encode_batch(self, sentences: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(sentences)
+        ids = np.array([encoding.ids for encoding in encodings], dtype=np.int64)
+        mask = np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+        feeds = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.array([encoding.type_ids for encoding in encodings], dtype=np.int64)
+        hidden = self.session.run(None, {name: feeds[name] for name in self.input_names})[0]
+        # Mean over real tokens only, as sentence-transformers' Pooling does
+        weights = mask[:, :, None].astype(np.float32)
+        pooled = (hidden * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+        if self.config["normalize"]:
+            pooled /= np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+        return pooled.astype(np.float32)
+
+    def encode(self, sentences, batch_size: int = 32, **kwargs) -> np.ndarray:
+        """(len(sentences), dim) float32 embeddings, or (dim,) for a single string"""
+        if isinstance(sentences, str):
+            return self._encode_batch([sentences])[0]
+        sentences = list(sentences)
+        if not sentences:
+            return np.zeros((0, self.config["dim"]), dtype=np.float32)
+        # Batch sentences of similar length together so little of each batch is padding
+        order = sorted(range(len(sentences)), key=lambda i: len(sentences[i]))
+        embeddings = np.empty((len(sentences), self.config["dim"]), dtype=np.float32)
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            embeddings[batch] = self._encode_batch([sentences[i] for i in batch])
+        return embeddings
+
+
+def export(model_name: str, model_dir: str, quantize: bool = True, opset: int = 17) -> str:
+    """Write `model_name`'s ONNX graph, int8 copy, tokenizer and settings to `model_dir`"""
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name, device="cpu")
+    transformer, pooling = model[0], model[1]
+    # Matched by name: the module classes moved between sentence-transformers releases
+    pooling_config = pooling.get_config_dict() if type(pooling).__name__ == "Pooling" else {}
+    if not (pooling_config.get("pooling_mode") == "mean" or pooling_config.get("pooling_mode_mean_tokens")):
+        raise ValueError(f"{model_name} does not mean-pool; only mean pooling is supported")
+    tokenizer = transformer.tokenizer
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids")
+                   if name in tokenizer.model_input_names]
+
+    class LastHiddenState(torch.nn.Module):
+        def __init__(self, auto_model):
+            super().__init__()
+            self.auto_model = auto_model
+
+        def forward(self, *inputs):
+            return self.auto_model(**dict(zip(input_names, inputs))).last_hidden_state
+
+    os.makedirs(model_dir, exist_ok=True)
+    sample = tokenizer(["an example sentence", "another"], padding=True, return_tensors="pt")
+    model_file = os.path.join(model_dir, MODEL_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            LastHiddenState(transformer.auto_model.eval()), tuple(sample[name] for name in input_names),
+            model_file, input_names=input_names, output_names=["last_hidden_state"],
+            dynamic_axes={name: {0: "batch", 1: "tokens"} for name in input_names + ["last_hidden_state"]},
+            opset_version=opset, dynamo=False)
+    tokenizer.backend_tokenizer.save(os.path.join(model_dir, TOKENIZER_FILE))
+    with open(os.path.join(model_dir, CONFIG_FILE), "w") as f:
+        json.dump({
+            "model": model_name,
+            "dim": len(model.encode("dimension")),
+            "max_length": model.max_seq_length,
+            "normalize": any(type(module).__name__ == "Normalize" for module in model),
+            "pad_id": tokenizer.pad_token_id,
+            "pad_token": tokenizer.pad_token,
+        }, f, indent=2)
+    logger.info(f"Exported {model_name} to {model_file}")
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantized_file = os.path.join(model_dir, QUANTIZED_MODEL_FILE)
+        quantize_dynamic(model_file, quantized_file, weight_type=QuantType.QInt8)
+        logger.info(f"Wrote int8 model to {quantized_file}")
+    return model_dir
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("model", help="SentenceTransformer model name or path")
+    parser.add_argument("model_dir", help="Directory to write the ONNX models to")
+    parser.add_argument("--no-quantize", action="store_true", help="Skip the int8 copy")
+    parser.add_argument("--opset", type=int, default=17)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    export(args.model, args.model_dir, quantize=not args.no_quantize, opset=args.opset)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+"""
+Splitting meeting files into passages for search.
+
+The embedding model only reads the first few hundred tokens of its input,
+so a long transcript or PDF embedded as one vector is mostly invisible to
+search. `split_passages` cuts a document into overlapping character spans
+small enough to be embedded whole; `MeetingDatabase` stores the spans as
+offsets into the file's content and indexes one embedding per passage.
+"""
+
+import re
+from typing import List, Tuple
+
+# Where a passage may end: after sentence punctuation or at a line break
+SENTENCE_BREAK = re.compile(r"[.!?][\"')\]]*\s|\n")
+WORD_BREAK = re.compile(r"\s")
+
+
+def _last_break(pattern: re.Pattern, text: str, lo: int, hi: int) -> int:
+    """End of the last match of `pattern` in text[lo:hi], or -1"""
+    end = -1
+    for match in pattern.finditer(text, lo, hi):
+        end = match.end()
+    return end
+
+
+def split_passages(text: str, max_chars: int = 600, overlap_chars: int = 120) -> List[Tuple[int, int]]:
+    """[start, end) spans covering `text`, each at most `max_chars` long.
+
+    A passage ends at the last sentence break in its second half, else at
+    the last whitespace, else mid-word. The next passage starts about
+    `overlap_chars` before that end, moved forward to a word start, so a
+    sentence cut at a boundary is still whole in one of the two passages.
+    """
+    if overlap_chars >= max_chars // 2:
+        raise ValueError(f"overlap_chars ({overlap_chars}) must be under half of max_chars ({max_chars})")
+    spans = []
+    length = len(text)
+    start = 0
+    while True:
+        while start < length and text[start].isspace():
+            start += 1
+        if start >= length:
+            return spans
+        end = min(start + max_chars, length)
+        if end < length:
+            half = start + max_chars // 2
+            cut = _last_break(SENTENCE_BREAK, text, half, end)
+            if cut < 0:
+                cut = _last_break(WORD_BREAK, text, half, end)
+            if cut > 0:
+                end = cut
+        trimmed = end
+        while trimmed > start and text[trimmed - 1].isspace():
+            trimmed -= 1
+        spans.append((start, trimmed))
+        if end >= length:
+            return spans
+        next_start = max(end - overlap_chars, start + 1)
+        # Begin on a word: skip forward past the partial word, unless that runs past the end
+        space = WORD_BREAK.search(text, next_start, end)
+        start = space.end() if space and text[next_start - 1:next_start].strip() else next_start
@@ -0,0 +1,144 @@
+"""
+Occupancy- and lead-time-aware room pricing.
+
+Every price sits inside the room's [price_min, price_max] band. A demand
+score between 0 and 1 picks the base price in the upper part of the band: it
+rises as the room type fills up and as check-in gets closer. The occasion
+discount is then taken off that base price, never going below price_min, so
+the lower part of the band is what occasion discounts can reach. `quote_prices` does the
+arithmetic on NumPy arrays, so quoting every room in the hotel is a handful
+of vector operations instead of a query and a Python loop per room.
+"""
+
+import logging
+from datetime import date
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from availability import parse_stay
+from records import PriceQuote, RoomQuote, rows_as
+
+logger = logging.getLogger(__name__)
+
+
+class PricingPolicy(NamedTuple):
+    """Weights of the demand score; a full type checked into today prices at price_max.
+
+    `band_floor` is the lowest point of the band (0 = price_min, 1 = price_max)
+    that demand alone can push the base price down to.
+    """
+    occupancy_weight: float = 0.6
+    lead_weight: float = 0.4
+    lead_window_days: int = 30
+    band_floor: float = 0.5
+
+    def demand(self, occupancy, lead_days) -> np.ndarray:
+        urgency = np.clip(1.0 - np.asarray(lead_days, dtype=np.float64) / self.lead_window_days, 0.0, 1.0)
+        occupancy = np.asarray(occupancy, dtype=np.float64)
+        return np.clip(self.occupancy_weight * occupancy + self.lead_weight * urgency, 0.0, 1.0)
+
+    def band_position(self, demand) -> np.ndarray:
+        return self.band_floor + (1.0 - self.band_floor) * np.asarray(demand, dtype=np.float64)
+
+
+def quote_prices(price_min, price_max, band_position, discount_percentage) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Base price, final price, discount amount and effective discount percentage, element-wise"""
+    price_min = np.asarray(price_min, dtype=np.float64)
+    price_max = np.asarray(price_max, dtype=np.float64)
+    discount_percentage = np.asarray(discount_percentage, dtype=np.float64)
+    # Quotes are in whole cents
+    base_price = np.round(price_min + (price_max - price_min) * band_position, 2)
+    discounted = base_price * (1.0 - discount_percentage / 100.0)
+    final_price = np.round(np.maximum(discounted, price_min), 2)
+    discount_amount = np.round(base_price - final_price, 2)
+    # Where the floor kicked in, report the discount actually given
+    clamped = discounted < price_min
+    effective = np.divide(discount_amount * 100.0, base_price,
+                          out=np.zeros_like(base_price), where=base_price > 0)
+    return base_price, final_price, discount_amount, np.where(clamped, effective, discount_percentage)
+
+
+class PricingEngine:
+    """Quotes for room types, single rooms or the whole inventory.
+
+    Undated quotes use today's occupancy from the InventoryCache and price
+    as a same-day stay. Dated quotes use the share of room-nights already
+    booked over the stay from the OccupancyCalendar and the days until
+    check-in. Both sources are cached, so a quote costs no more than their
+    version checks.
+    """
+
+    def __init__(self, inventory, calendar, discount: Callable[[Optional[str]], float],
+                 policy: Optional[PricingPolicy] = None):
+        self.inventory = inventory
+        self.calendar = calendar
+        self.discount = discount
+        self.policy = policy or PricingPolicy()
+
+    def demand(self, check_in_date: str = None, check_out_date: str = None) -> Dict[str, float]:
+        """Demand score per lower-cased room type, for a stay or (without dates) for tonight"""
+        if check_in_date is None and check_out_date is None:
+            summaries = self.inventory.all()
+            keys = [summary.room_type.lower() for summary in summaries]
+            occupancy = [1.0 - summary.available_rooms / summary.total_rooms for summary in summaries]
+            lead_days = 0
+        else:
+            stay = parse_stay(check_in_date, check_out_date)
+            if stay is None:
+                raise ValueError(f"Invalid stay {check_in_date} to {check_out_date}; use YYYY-MM-DD with check-out after check-in")
+            by_type = self.calendar.type_occupancy(*stay)
+            keys = list(by_type)
+            occupancy = list(by_type.values())
+            lead_days = (stay[0] - date.today()).days
+        return dict(zip(keys, self.policy.demand(occupancy, lead_days).tolist()))
+
+    def quote(self, price_min: float, price_max: float, demand: float, special_occasion: str = None,
+              discount_percentage: Optional[float] = None) -> Tuple[float, float, float, float]:
+        """Base price, final price, discount amount and discount percentage for one room.
+
+        Callers quoting several rooms for one occasion pass the
+        `discount_percentage` they looked up once instead of the occasion.
+        """
+        if discount_percentage is None:
+            discount_percentage = self.discount(special_occasion)
+        base_price, final_price, discount_amount, discount_percentage = quote_prices(
+            price_min, price_max, self.policy.band_position(demand), discount_percentage
+        )
+        return base_price.item(), final_price.item(), discount_amount.item(), discount_percentage.item()
+
+    def quote_types(self, check_in_date: str = None, check_out_date: str = None,
+                    special_occasion: str = None) -> List[PriceQuote]:
+        """One quote per room type, on the type's full price band"""
+        demand_by_type = self.demand(check_in_date, check_out_date)
+        summaries = self.inventory.all()
+        demand = np.array([demand_by_type.get(summary.room_type.lower(), 1.0) for summary in summaries])
+        prices = quote_prices([summary.min_price for summary in summaries],
+                              [summary.max_price for summary in summaries],
+                              self.policy.band_position(demand), self.discount(special_occasion))
+        return rows_as(PriceQuote, zip(
+            [summary.room_type for summary in summaries], demand.tolist(), *(column.tolist() for column in prices)
+        ))
+
+    def quote_type(self, room_type: str, check_in_date: str = None, check_out_date: str = None,
+                   special_occasion: str = None) -> Optional[PriceQuote]:
+        """Quote for one room type (case-insensitive), or None if unknown"""
+        key = room_type.lower()
+        for quote in self.quote_types(check_in_date, check_out_date, special_occasion):
+            if quote.room_type.lower() == key:
+                return quote
+        return None
+
+    def quote_rooms(self, check_in_date: str = None, check_out_date: str = None,
+                    special_occasion: str = None) -> List[RoomQuote]:
+        """One quote per room in the hotel, occupied or not"""
+        demand_by_type = self.demand(check_in_date, check_out_date)
+        rooms = self.calendar.room_arrays()
+        type_demand = np.array([demand_by_type.get(key, 1.0) for key in rooms.type_keys])
+        prices = quote_prices(rooms.price_min, rooms.price_max, self.policy.band_position(type_demand)[rooms.type_index],
+                              self.discount(special_occasion))
+        return rows_as(RoomQuote, zip(
+            rooms.room_ids.tolist(), rooms.room_numbers.tolist(),
+            np.array(rooms.type_names, dtype=object)[rooms.type_index].tolist(),
+            *(column.tolist() for column in prices)
+        ))
@@ -15,7 +15,9 @@ Your personality:
 Always greet guests warmly and ask how you can help them today.
 """
 MEETING_PROMPT="""You can record meetings when I say something which is related to starting a Meeting or a direct command 'Start a meeting'. Once you start recording ,do not interrupt until I explicitly say something which means to end a meeting. Upon hearing the command 'End Meeting'or related to stopping the meeting, stop recording immediately  and use your 'convert_to_pdf' tool."""
-# Room types and pricing information
+# Room types and pricing information. The discount lines are filled in from
+# the discount_rules table by room_types_info(), so the agent quotes exactly
+# the percentages the pricing engine applies.
 ROOM_TYPES_INFO = """
 Our hotel offers the following room types:
 
@@ -41,8 +43,7 @@ Our hotel offers the following room types:
 
 6. Honeymoon Suite - $200-$300 per night
    - Romantic atmosphere
-   - Special amenities for couples
-   - 15% discount for honeymoon bookings
+   - Special amenities for couples{honeymoon_discount}
 
 7. Deluxe Suite - $250-$400 per night
    - Premium accommodations
@@ -53,15 +54,30 @@ Our hotel offers the following room types:
    - Best amenities and service
 
 Special Occasion Discounts:
-- Honeymoon: 15% discount
-- Birthday: 10% discount
-- Anniversary: 12% discount
-- Wedding: 20% discount
-- Special celebrations: 8% discount
+{discount_rules}
 
 Remember: Always mention the maximum price first, but be willing to negotiate within the price range based on special occasions.
 do not give any discount other than the ones mentioned above. until and unless the user asks for a special occasion discount."""
 
+
+def discount_rules_info(rules) -> str:
+    """One line per discount label, in priority order"""
+    lines = []
+    for rule in rules:
+        line = f"- {rule.label}: {rule.discount_percentage:g}% discount"
+        if line not in lines:
+            lines.append(line)
+    return "\n".join(lines)
+
+
+def room_types_info(rules) -> str:
+    """ROOM_TYPES_INFO with the discount lines rendered from `rules` (discounts.DiscountRule)"""
+    honeymoon = next((rule for rule in rules if rule.keyword.lower() == "honeymoon"), None)
+    return ROOM_TYPES_INFO.format(
+        honeymoon_discount=f"\n   - {honeymoon.discount_percentage:g}% discount for honeymoon bookings" if honeymoon else "",
+        discount_rules=discount_rules_info(rules),
+    )
+
 # Reservation flow prompts
 RESERVATION_START_PROMPT = """
 I'd be happy to help you make a reservation! 
@@ -0,0 +1,118 @@
+"""
+Typed row records for the hotel database.
+
+Queries build these named tuples straight from cursor rows with `rows_as`,
+so listing thousands of rooms allocates one compact tuple per row instead
+of a dict with string keys. They are immutable and can be shared between
+callers. The function tools in api.py return them as they are: the agent
+framework hands a tool's result to the model as `str()`, and a record's
+repr already names every field, so converting each row to a dict first
+would only cost time. Convert them with `as_dicts` / `_asdict()` where
+the response really is JSON, as in flask_server.py.
+"""
+
+from functools import partial
+from typing import Dict, Iterable, List, NamedTuple, Optional, Type, TypeVar
+
+R = TypeVar("R", bound=tuple)
+
+
+class Room(NamedTuple):
+    room_id: int
+    room_number: int
+    room_type: str
+    price_min: float
+    price_max: float
+
+
+class RoomTypeSummary(NamedTuple):
+    room_type: str
+    total_rooms: int
+    available_rooms: int
+    min_price: float
+    max_price: float
+
+
+class RoomStatus(NamedTuple):
+    room_id: int
+    room_number: int
+    room_type: str
+    price_min: float
+    price_max: float
+    is_occupied: bool
+    guest_name: Optional[str]
+    check_in_date: Optional[str]
+    check_out_date: Optional[str]
+    special_occasion: Optional[str]
+    discount_percentage: float
+
+    @classmethod
+    def from_row(cls, row: tuple) -> "RoomStatus":
+        # SQLite stores the BOOLEAN column as 0/1
+        return cls._make(row[:5] + (bool(row[5]),) + row[6:])
+
+
+class BookedRoom(NamedTuple):
+    room_id: int
+    room_number: int
+    room_type: str
+    final_price: float
+    discount_amount: float
+    discount_percentage: float
+
+
+class PriceQuote(NamedTuple):
+    room_type: str
+    demand: float
+    base_price: float
+    final_price: float
+    discount_amount: float
+    discount_percentage: float
+
+
+class RoomQuote(NamedTuple):
+    room_id: int
+    room_number: int
+    room_type: str
+    base_price: float
+    final_price: float
+    discount_amount: float
+    discount_percentage: float
+
+
+class DiscountRule(NamedTuple):
+    keyword: str
+    label: str
+    discount_percentage: float
+    priority: int
+
+
+class DailyStats(NamedTuple):
+    stay_date: str
+    room_type: str
+    rooms_booked: int
+    total_rooms: int
+    occupancy_rate: float
+    revenue: float
+    discount: float
+
+
+class RoomTypeTotals(NamedTuple):
+    room_type: str
+    bookings: int
+    revenue: float
+    discount: float
+
+
+def rows_as(record: Type[R], rows: Iterable[tuple]) -> List[R]:
+    """Build one record per row.
+
+    Calls tuple.__new__ directly instead of `_make`, which skips a Python
+    frame and the length check per row; the SELECT fixes the column count.
+    """
+    return list(map(partial(tuple.__new__, record), rows))
+
+
+def as_dicts(records: Iterable[NamedTuple]) -> List[Dict]:
+    """Records as dicts, for JSON responses"""
+    return [record._asdict() for record in records]
@@ -1,6 +1,6 @@
 import asyncio
 from livekit import agents
-from agent import entrypoint
+from agent import entrypoint, prewarm
 import os
 from dotenv import load_dotenv
 import logging
@@ -46,6 +46,7 @@ if __name__ == "__main__":
         agents.cli.run_app(
             agents.WorkerOptions(
                 entrypoint_fnc=entrypoint,
+                prewarm_fnc=prewarm,
                 request_fnc=request_fnc,
                 api_key=os.getenv("LIVEKIT_API_KEY"),
                 api_secret=os.getenv("LIVEKIT_API_SECRET"),
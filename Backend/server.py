@@ -15,7 +15,7 @@ except ImportError:
     VideoGrants = None
 
 import jwt
-from agent import HotelReceptionistAgent
+from agent import get_agent
 
 app = Flask(__name__)
 CORS(app, resources={r"/api/*": {"origins": "*"}})
@@ -24,9 +24,6 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 
 load_dotenv()
 
-# Initialize agent
-agent_instance = HotelReceptionistAgent()
-
 @app.route('/api/agent', methods=['POST'])
 def agent_endpoint():
     """Chat endpoint"""
@@ -37,7 +34,7 @@ def agent_endpoint():
     try:
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
-        response = loop.run_until_complete(agent_instance.handle_user_message(user_message))
+        response = loop.run_until_complete(get_agent().handle_user_message(user_message))
         loop.close()
         return jsonify({'response': response})
     except Exception as e:
@@ -108,4 +105,6 @@ if __name__ == "__main__":
     print(f"🔗 LiveKit URL: {os.getenv('LIVEKIT_URL', 'Not set')}")
     print(f"🔑 API Key: {os.getenv('LIVEKIT_API_KEY', 'Not set')[:10]}...")
     print("=" * 70)
+    # Initialize agent at startup; requests reuse the same instance
+    get_agent().meeting_db.warmup()
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
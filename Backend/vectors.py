@@ -0,0 +1,151 @@
+"""
+Embedding storage and in-memory search index for the meeting database.
+
+Embeddings are stored as the raw bytes of a little-endian float32 vector,
+with the vector length in the row's `embedding_dim` column. Decoding is
+`np.frombuffer` over the BLOB, a read-only view with no copy and no
+unpickling, so loading a row costs the same as reading its bytes.
+
+Databases written before this format held `pickle.dumps(ndarray)` BLOBs;
+`migrate_pickled_embeddings` converts them once, and reads them with an
+unpickler that only accepts the NumPy array constructors.
+
+`VectorIndex` keeps the embeddings resident, normalized to unit length, so
+a search is one matrix-vector product instead of a table scan.
+"""
+
+import io
+import logging
+import pickle
+import sqlite3
+import threading
+from typing import Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_DTYPE = np.dtype("<f4")
+
+
+def to_blob(embedding) -> bytes:
+    """Raw little-endian float32 bytes of a 1-d embedding"""
+    return np.ascontiguousarray(embedding, dtype=EMBEDDING_DTYPE).reshape(-1).tobytes()
+
+
+def from_blob(blob: bytes, dim: int) -> np.ndarray:
+    """Read-only float32 view of a stored embedding"""
+    return np.frombuffer(blob, dtype=EMBEDDING_DTYPE, count=dim)
+
+
+def from_blobs(blobs: Iterable[bytes], dim: int) -> np.ndarray:
+    """Stack stored embeddings of length `dim` into one read-only (rows, dim) matrix"""
+    return np.frombuffer(b"".join(blobs), dtype=EMBEDDING_DTYPE).reshape(-1, dim)
+
+
+class _LegacyEmbeddingUnpickler(pickle.Unpickler):
+    # What pickle.dumps(ndarray) refers to, under NumPy 1.x and 2.x module names
+    ALLOWED = {
+        ("numpy", "ndarray"),
+        ("numpy", "dtype"),
+        ("numpy.core.multiarray", "_reconstruct"),
+        ("numpy._core.multiarray", "_reconstruct"),
+    }
+
+    def find_class(self, module, name):
+        if (module, name) not in self.ALLOWED:
+            raise pickle.UnpicklingError(f"Refusing to load {module}.{name} from a pickled embedding")
+        return super().find_class(module, name)
+
+
+def load_legacy_blob(blob: bytes) -> np.ndarray:
+    """Decode a pickled ndarray embedding without running arbitrary pickle code"""
+    embedding = _LegacyEmbeddingUnpickler(io.BytesIO(blob)).load()
+    if not isinstance(embedding, np.ndarray):
+        raise pickle.UnpicklingError(f"Pickled embedding is a {type(embedding).__name__}, not an ndarray")
+    return embedding
+
+
+def migrate_pickled_embeddings(cursor: sqlite3.Cursor):
+    """Rewrite every pickled embedding in meeting_files as float32 bytes with its dimension"""
+    rows = cursor.execute("SELECT file_id, embedding FROM meeting_files").fetchall()
+    converted = []
+    for file_id, blob in rows:
+        embedding = load_legacy_blob(blob).reshape(-1)
+        converted.append((to_blob(embedding), embedding.shape[0], file_id))
+    cursor.executemany("UPDATE meeting_files SET embedding = ?, embedding_dim = ? WHERE file_id = ?", converted)
+    logger.info(f"Converted {len(converted)} pickled embeddings to float32")
+
+
+def normalize_rows(embeddings) -> np.ndarray:
+    """float32 copy of `embeddings` with every row scaled to unit length (zero rows stay zero)"""
+    matrix = np.array(embeddings, dtype=np.float32, ndmin=2)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+class VectorIndex:
+    """Exact cosine-similarity search over pre-normalized float32 rows.
+
+    Rows are stored in one matrix with spare capacity, so adding a file
+    appends a row and only reallocates when the capacity doubles. A search
+    scores every row with a single matrix-vector product and picks the top
+    k with `argpartition`, sorting only those k. Searches work on a
+    snapshot of the rows taken under the lock, so they can run while
+    another thread adds rows.
+    """
+
+    def __init__(self, dim: Optional[int] = None):
+        self._lock = threading.Lock()
+        self.clear(dim)
+
+    def clear(self, dim: Optional[int] = None):
+        """Drop every row; `dim` fixes the embedding length of the rows to come"""
+        with self._lock:
+            self.dim = dim
+            self._ids = np.zeros(0, dtype=np.int64)
+            self._matrix = np.zeros((0, dim or 0), dtype=np.float32)
+            self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, ids: Sequence[int], embeddings):
+        """Append rows; `embeddings` holds one vector of length `dim` per id"""
+        if len(ids) == 0:
+            return
+        rows = normalize_rows(embeddings)
+        with self._lock:
+            if self.dim is None:
+                self.dim = rows.shape[1]
+                self._matrix = np.zeros((0, self.dim), dtype=np.float32)
+            if rows.shape != (len(ids), self.dim):
+                raise ValueError(f"Expected {len(ids)} embeddings of length {self.dim}, got shape {rows.shape}")
+            end = self._size + len(ids)
+            if end > len(self._ids):
+                capacity = max(end, 2 * len(self._ids), 64)
+                matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+                matrix[:self._size] = self._matrix[:self._size]
+                row_ids = np.zeros(capacity, dtype=np.int64)
+                row_ids[:self._size] = self._ids[:self._size]
+                self._matrix, self._ids = matrix, row_ids
+            self._matrix[self._size:end] = rows
+            self._ids[self._size:end] = ids
+            self._size = end
+
+    def rows(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Copies of the ids and normalized rows, in insertion order"""
+        with self._lock:
+            return self._ids[:self._size].copy(), self._matrix[:self._size].copy()
+
+    def search(self, query, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Ids and cosine similarities of the `top_k` rows closest to `query`, best first"""
+        with self._lock:
+            matrix, ids, size = self._matrix, self._ids, self._size
+        k = min(top_k, size)
+        if k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        scores = matrix[:size] @ normalize_rows(query)[0]
+        best = np.argpartition(-scores, k - 1)[:k] if k < size else np.arange(size)
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return ids[best], scores[best]